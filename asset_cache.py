@@ -0,0 +1,172 @@
+# RandomGenerate/SPI_v2/asset_cache.py
+"""
+預先縮放的遊戲圖片磁碟快取。
+
+HdmiGameEngine 每次啟動都要解碼 PNG 再 smoothscale 成數種高度，在 Raspberry Pi 上相當耗時。
+ScaledAssetCache 把縮放後的像素 (RGBA) 存到快取資料夾，檔名包含:
+    來源檔內容的雜湊、目標解析度、縮放倍率與目標高度
+下次啟動直接讀取原始像素並 convert_alpha()，不需要解碼與縮放；
+來源檔或解析度改變時檔名不同，自動重新建立並刪除同一來源、同一解析度的舊檔。
+render scale 改變時會產生其他解析度的檔案，因此每次寫入後再依最近使用時間 (讀取時更新檔案的修改時間)
+只保留最新的 max_files 個快取檔 (LRU)，不論解析度。
+"""
+import hashlib
+import os
+import struct
+import time
+
+import pygame
+
+CACHE_FILE_EXTENSION = '.rgba'
+DEFAULT_MAX_FILES = 48 # 單人與對戰各約 4 個檔案 / 解析度，約可保留 6 種解析度
+_HEADER = struct.Struct('<4sII') # magic, 寬, 高
+_MAGIC = b'SPIA'
+
+
+class ScaledAssetCache:
+    """依來源雜湊、解析度與縮放倍率快取縮放後的 Surface。"""
+
+    def __init__(self, cache_dir=None, max_files=DEFAULT_MAX_FILES):
+        """
+        參數:
+            cache_dir (str, optional): 快取資料夾；None 表示不寫入磁碟 (每次都解碼並縮放)。
+            max_files (int): 資料夾中最多保留的快取檔數 (最久未使用的先刪除)。
+        """
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        if cache_dir:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+            except OSError as e:
+                print(f"ScaledAssetCache 警告: 無法建立快取資料夾 '{cache_dir}': {e}。將不使用磁碟快取。")
+                self.cache_dir = None
+        self.hits = 0
+        self.misses = 0
+        self.load_time_sec = 0.0
+
+    def load_scaled(self, source_path, target_heights, resolution, scale_factor):
+        """
+        載入 source_path 並依長寬比縮放成每個目標高度。
+
+        參數:
+            source_path (str): 原始圖片路徑。
+            target_heights (list): 目標高度 (像素) 列表。
+            resolution (tuple): 螢幕解析度 (寬, 高)，作為快取鍵的一部分。
+            scale_factor (float): 縮放倍率，作為快取鍵的一部分。
+        回傳:
+            list: 與 target_heights 對應、已轉為顯示格式的 Surface。
+        例外:
+            讀取或解碼來源圖片失敗時拋出 pygame.error / OSError，由呼叫端決定替代圖片。
+        """
+        start = time.perf_counter()
+        source_hash = self._hash_file(source_path)
+        paths = [self._cache_path(source_path, source_hash, resolution, scale_factor, h) for h in target_heights]
+
+        surfaces = [self._read_cached(path) for path in paths]
+        if all(surface is not None for surface in surfaces):
+            self.hits += len(surfaces)
+            self._touch(paths)
+        else:
+            original = pygame.image.load(source_path).convert_alpha()
+            orig_w, orig_h = original.get_size()
+            surfaces = []
+            for target_h, path in zip(target_heights, paths):
+                target_w = int(orig_w * (target_h / orig_h))
+                surface = pygame.transform.smoothscale(original, (target_w, target_h))
+                surfaces.append(surface)
+                self._write_cached(path, surface)
+            self.misses += len(surfaces)
+            self._prune_stale(source_path, resolution, scale_factor, keep=paths)
+            self._prune_least_recent(keep=paths)
+
+        self.load_time_sec += time.perf_counter() - start
+        return surfaces
+
+    def _hash_file(self, path):
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                digest.update(block)
+        return digest.hexdigest()[:16]
+
+    def _cache_prefix(self, source_path, resolution, scale_factor):
+        stem = os.path.splitext(os.path.basename(source_path))[0]
+        return f"{stem}-{resolution[0]}x{resolution[1]}-x{scale_factor:g}-"
+
+    def _cache_path(self, source_path, source_hash, resolution, scale_factor, target_h):
+        if not self.cache_dir:
+            return None
+        name = f"{self._cache_prefix(source_path, resolution, scale_factor)}{source_hash}-h{target_h}{CACHE_FILE_EXTENSION}"
+        return os.path.join(self.cache_dir, name)
+
+    def _read_cached(self, path):
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            magic, width, height = _HEADER.unpack_from(data)
+            pixels = data[_HEADER.size:]
+            if magic != _MAGIC or len(pixels) != width * height * 4:
+                print(f"ScaledAssetCache 警告: 快取檔 '{path}' 格式不符，將重新建立。")
+                return None
+            return pygame.image.frombuffer(pixels, (width, height), 'RGBA').convert_alpha()
+        except (OSError, struct.error, ValueError, pygame.error) as e:
+            print(f"ScaledAssetCache 警告: 無法讀取快取檔 '{path}': {e}")
+            return None
+
+    def _write_cached(self, path, surface):
+        if not path:
+            return
+        temp_path = path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, surface.get_width(), surface.get_height()))
+                f.write(pygame.image.tobytes(surface, 'RGBA'))
+            os.replace(temp_path, path) # 寫完才換名，避免斷電留下不完整的快取檔
+        except OSError as e:
+            print(f"ScaledAssetCache 警告: 無法寫入快取檔 '{path}': {e}")
+
+    def _prune_stale(self, source_path, resolution, scale_factor, keep):
+        """刪除同一來源、解析度與倍率但雜湊或高度不同的舊快取檔。"""
+        if not self.cache_dir:
+            return
+        prefix = self._cache_prefix(source_path, resolution, scale_factor)
+        keep_names = {os.path.basename(path) for path in keep}
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix) and name.endswith(CACHE_FILE_EXTENSION) and name not in keep_names:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    def _touch(self, paths):
+        """更新命中檔案的修改時間，作為 LRU 的最近使用時間。"""
+        for path in paths:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    def _prune_least_recent(self, keep):
+        """所有來源與解析度合計超過 max_files 個快取檔時，刪除最久未使用的 (keep 中的檔案除外)。"""
+        if not self.cache_dir or not self.max_files:
+            return
+        keep_names = {os.path.basename(path) for path in keep}
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(CACHE_FILE_EXTENSION) and name not in keep_names:
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+        excess = len(entries) + len(keep_names) - self.max_files
+        for _mtime, path in sorted(entries)[:max(0, excess)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get_stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'load_time_ms': self.load_time_sec * 1000}
@@ -0,0 +1,15 @@
+# RandomGenerate/SPI_v2/classic_mode.py
+"""
+單人跳躍躲避遊戲 (原本的遊戲)。資源由 HdmiGameEngine 初始化時載入，setup 不需要額外工作。
+"""
+from game_modes import GameMode
+
+GAME_MODE = {'name': 'classic', 'title': '單人跳躍', 'class': 'ClassicGameMode', 'order': 10,
+             'description': '拍擊跳過障礙物，情緒歸零即過關'}
+
+
+class ClassicGameMode(GameMode):
+    """開始前序列 → GameScene → 結束畫面。"""
+
+    def start(self, engine, initial_mileage):
+        engine.start_game(initial_mileage)
@@ -0,0 +1,159 @@
+# RandomGenerate/SPI_v2/collision_masks.py
+"""
+玩家與障礙物的逐像素碰撞遮罩。
+
+player.png 的四角是背景 (沒有實體)，只用矩形判斷會在 "看起來沒碰到" 時結束遊戲。
+每個縮放後的圖片在載入時以 pygame.mask 建立一次遮罩 (CollisionMaskCache 依圖片與尺寸快取，
+各局與 render scale 切換回同一尺寸時共用)，交給 GameGeometry；
+GameSimulation 仍先做矩形判斷，只有矩形重疊時才計算遮罩的重疊，
+因此每步多出的成本只發生在障礙物經過玩家的那幾幀。
+
+遮罩也會寫進重播檔，無頭重播不需要載入圖片就能得到相同的碰撞結果。
+"""
+import struct
+import time
+
+import pygame
+
+MASK_ALPHA_THRESHOLD = 127 # alpha 高於此值的像素視為實體
+BACKGROUND_TOLERANCE = 24  # 沒有 alpha 的圖片，與角落顏色相差在此範圍內的相連區域視為背景
+_MASK_SIZE = struct.Struct('<II')
+
+
+def build_collision_mask(surface, threshold=MASK_ALPHA_THRESHOLD, background_tolerance=BACKGROUND_TOLERANCE):
+    """
+    由 Surface 建立遮罩。有透明像素時以 alpha 判斷；
+    完全不透明但四個角落顏色相同時 (例如白底的 player.png)，把與角落相連、顏色相近的區域視為背景；
+    其餘 (例如整張都是圖案的 obstacle.png) 得到全滿的遮罩，與畫面上看到的矩形一致。
+    """
+    mask = pygame.mask.from_surface(surface, threshold)
+    width, height = surface.get_size()
+    if mask.count() < width * height:
+        return mask
+    corners = [(0, 0), (width - 1, 0), (0, height - 1), (width - 1, height - 1)]
+    corner_color = surface.get_at(corners[0])
+    if any(max(abs(a - b) for a, b in zip(surface.get_at(corner)[:3], corner_color[:3])) > background_tolerance
+           for corner in corners[1:]):
+        return mask
+    similar = pygame.mask.from_threshold(surface, corner_color, (background_tolerance,) * 3 + (255,))
+    for corner in corners:
+        if mask.get_at(corner): # 尚未被前一個角落的背景區域清除
+            mask.erase(similar.connected_component(corner), (0, 0))
+    return mask
+
+
+def mask_to_bytes(mask):
+    """遮罩序列化為 (寬, 高) + 每像素一個位元組 (0 / 255)，由呼叫端壓縮。"""
+    width, height = mask.get_size()
+    pixels = pygame.image.tobytes(mask.to_surface(setcolor=(255, 255, 255, 255), unsetcolor=(0, 0, 0, 0)), 'RGBA')
+    return _MASK_SIZE.pack(width, height) + pixels[3::4]
+
+
+def mask_from_bytes(data, offset=0):
+    """mask_to_bytes 的反向；回傳 (遮罩, 下一筆資料的位移)。不需要顯示模式。"""
+    width, height = _MASK_SIZE.unpack_from(data, offset)
+    offset += _MASK_SIZE.size
+    rgba = bytearray(width * height * 4)
+    rgba[3::4] = data[offset:offset + width * height]
+    surface = pygame.image.frombuffer(bytes(rgba), (width, height), 'RGBA')
+    return pygame.mask.from_surface(surface, MASK_ALPHA_THRESHOLD), offset + width * height
+
+
+class CollisionMaskCache:
+    """依 (圖片來源, 尺寸) 快取遮罩，避免每局或每次重建資源時重新計算。"""
+
+    def __init__(self):
+        self._masks = {}
+        self.hits = 0
+        self.misses = 0
+        self.build_time_sec = 0.0
+
+    def mask_for(self, source, surface):
+        key = (source, surface.get_size())
+        mask = self._masks.get(key)
+        if mask is not None:
+            self.hits += 1
+            return mask
+        start = time.perf_counter()
+        mask = self._masks[key] = build_collision_mask(surface)
+        self.build_time_sec += time.perf_counter() - start
+        self.misses += 1
+        return mask
+
+    def get_stats(self):
+        return {'masks': len(self._masks), 'hits': self.hits, 'misses': self.misses,
+                'build_time_ms': self.build_time_sec * 1000}
+
+
+def benchmark_collision(screen_size=(800, 600), player_img_path='player.png', obstacle_img_path='obstacle.png',
+                        repeats=20):
+    """
+    比較每步碰撞判斷 (GameSimulation._sweep_obstacles) 在只用矩形與矩形 + 遮罩時的成本。
+
+    讓一個障礙物以 1 px 為單位從玩家右側移到左側，玩家在跳躍弧線的各個高度，
+    涵蓋 "遠離"、"矩形重疊但像素未重疊"、"像素重疊" 三種情況。
+    回傳:
+        dict: {'rect_us', 'mask_us', 'far_rect_us', 'far_mask_us': 每步微秒,
+               'rect_hits', 'mask_hits': 判定碰撞的狀態數, 'states': 狀態總數, 'mask_build_ms'}
+    """
+    from game_simulation import GameGeometry, GameSimulation
+
+    if not pygame.display.get_init():
+        pygame.display.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+    rect_geometry = GameGeometry.for_screen(*screen_size)
+    cache = CollisionMaskCache()
+    player = pygame.transform.smoothscale(pygame.image.load(player_img_path).convert_alpha(),
+                                          (rect_geometry.player_w, rect_geometry.player_h))
+    obstacles = {key: pygame.transform.smoothscale(pygame.image.load(obstacle_img_path).convert_alpha(), size)
+                 for key, size in rect_geometry.obstacle_sizes.items()}
+    player_mask = cache.mask_for(player_img_path, player)
+    obstacle_masks = {key: cache.mask_for(obstacle_img_path, image) for key, image in obstacles.items()}
+    mask_geometry = GameGeometry.for_screen(*screen_size)
+    mask_geometry.player_mask = player_mask
+    mask_geometry.obstacle_masks = obstacle_masks
+
+    g = rect_geometry
+    player_tops = [g.ground_y - g.player_h - lift for lift in range(0, int(g.player_h * 1.5), 4)]
+    key = g.obstacle_height_keys[-1]
+    obstacle_w = g.obstacle_sizes[key][0]
+    near_xs = range(g.player_x - obstacle_w, g.player_x + g.player_w + 2)
+    far_xs = range(g.screen_width - 200, g.screen_width)
+
+    def run(geometry, xs):
+        sim = GameSimulation(geometry, 10 ** 9)
+        sim.obstacles.clear()
+        sim.obstacles.push(0, *geometry.obstacle_sizes[key], key)
+        pool = sim.obstacles
+        hits = 0
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for player_top in player_tops:
+                sim.player_top = player_top
+                for x in xs:
+                    pool.world_x[pool.head] = x
+                    hits += sim._sweep_obstacles()
+        elapsed = time.perf_counter() - start
+        states = repeats * len(player_tops) * len(xs)
+        return elapsed / states * 1e6, hits // repeats, states // repeats
+
+    rect_us, rect_hits, states = run(rect_geometry, near_xs)
+    mask_us, mask_hits, _ = run(mask_geometry, near_xs)
+    far_rect_us, _, _ = run(rect_geometry, far_xs)
+    far_mask_us, _, _ = run(mask_geometry, far_xs)
+    return {'rect_us': rect_us, 'mask_us': mask_us, 'far_rect_us': far_rect_us, 'far_mask_us': far_mask_us,
+            'rect_hits': rect_hits, 'mask_hits': mask_hits, 'states': states,
+            'mask_build_ms': cache.get_stats()['build_time_ms']}
+
+
+if __name__ == '__main__':
+    import os
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    for size in ((800, 600), (1280, 720), (1920, 1080)):
+        report = benchmark_collision(size)
+        print(f"{size[0]}x{size[1]}: 遮罩建立 {report['mask_build_ms']:.2f} ms")
+        print(f"  玩家附近 (每步 µs): 矩形 {report['rect_us']:.2f} / 矩形 + 遮罩 {report['mask_us']:.2f}；"
+              f"{report['states']} 個狀態中判定碰撞 矩形 {report['rect_hits']} / 遮罩 {report['mask_hits']}")
+        print(f"  障礙物遠離 (每步 µs): 矩形 {report['far_rect_us']:.2f} / 矩形 + 遮罩 {report['far_mask_us']:.2f}")
+    pygame.quit()
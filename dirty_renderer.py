@@ -0,0 +1,102 @@
+# RandomGenerate/SPI_v2/dirty_renderer.py
+"""
+Dirty-rectangle 繪圖：只重畫有變動的區域，並以 pygame.display.update(rects) 送出。
+(畫在內部縮放 Surface 上時，改由 render_scaler.ScaledDisplay 提供相同的 flip/update 介面。)
+
+每一幀的流程:
+    renderer.begin_frame()         # 把上一幀畫過的區域還原成背景
+    renderer.draw(image, rect)     # 繪製本幀的精靈 / 文字，並記錄區域
+    renderer.present()             # 合併上一幀與本幀區域後更新到螢幕
+"""
+import pygame
+
+
+class DirtyRectRenderer:
+    """以預先繪製的背景為底，追蹤每幀變動區域的繪圖器。"""
+
+    def __init__(self, screen, background, display=pygame.display):
+        """
+        參數:
+            screen (pygame.Surface): 繪圖用的 Surface。
+            background (pygame.Surface): 與螢幕同尺寸的靜態背景。
+            display: 提供 flip() 與 update(rects) 的送出介面，預設為 pygame.display。
+        """
+        self.screen = screen
+        self.display = display
+        self.background = background
+        self.screen_rect = screen.get_rect()
+        self.previous_rects = []
+        self.current_rects = []
+        self.needs_full_redraw = True
+        self.last_frame_pixels = 0
+        self.total_pixels = 0
+        self.frames = 0
+
+    def set_background(self, background):
+        """更換背景 (例如解析度改變) 並在下一幀整張重畫。"""
+        self.background = background
+        self.invalidate()
+
+    def invalidate(self):
+        """要求下一幀整張重畫 (例如畫面曾被其他流程覆蓋)。"""
+        self.needs_full_redraw = True
+        self.previous_rects = []
+
+    def reset_stats(self):
+        self.last_frame_pixels = 0
+        self.total_pixels = 0
+        self.frames = 0
+
+    def begin_frame(self):
+        """還原上一幀畫過的區域；需要整張重畫時直接貼上整個背景。"""
+        self.current_rects = []
+        if self.needs_full_redraw:
+            self.screen.blit(self.background, (0, 0))
+            return
+        for rect in self.previous_rects:
+            self.screen.blit(self.background, rect, rect)
+
+    def draw(self, image, position):
+        """繪製一個 Surface 並記錄其區域。position 可為 Rect 或 (x, y)。"""
+        drawn_rect = self.screen.blit(image, position)
+        self.current_rects.append(drawn_rect)
+        return drawn_rect
+
+    def mark_dirty(self, rect):
+        """記錄直接畫在 screen 上 (非經由 draw) 的區域。"""
+        self.current_rects.append(pygame.Rect(rect))
+
+    def present(self):
+        """送出本幀的變動區域，回傳本幀推送的像素數。"""
+        if self.needs_full_redraw:
+            self.display.flip()
+            pixels = self.screen_rect.width * self.screen_rect.height
+            self.needs_full_redraw = False
+        else:
+            dirty = _merge_rects(self.previous_rects + self.current_rects, self.screen_rect)
+            if dirty:
+                self.display.update(dirty)
+            pixels = sum(r.width * r.height for r in dirty)
+        self.previous_rects = self.current_rects
+        self.last_frame_pixels = pixels
+        self.total_pixels += pixels
+        self.frames += 1
+        return pixels
+
+    def average_pixels_per_frame(self):
+        return self.total_pixels / self.frames if self.frames else 0.0
+
+
+def _merge_rects(rects, clip_rect):
+    """裁切到螢幕範圍並合併互相重疊的區域，避免重複推送同一塊像素。"""
+    merged = []
+    for rect in rects:
+        rect = rect.clip(clip_rect)
+        if rect.width <= 0 or rect.height <= 0:
+            continue
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
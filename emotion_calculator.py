@@ -1,24 +1,47 @@
 # RandomGenerate/SPI_v2/emotion_calculator.py
+from force_calibration import ForceCalibration
 
 class EmotionCalculator:
     """根據輸入電壓計算【負面情緒指數】的類別。"""
 
-    def __init__(self, min_voltage_threshold=0.01, max_emotion_value=1000):
+    def __init__(self, min_voltage_threshold=0.01, max_emotion_value=1000, force_calibration_path=None,
+                 voltage_gain=5.0, exponent=2.0, scale=100.0):
         """
         初始化情緒計算器。
 
         參數:
             min_voltage_threshold (float): 低於此電壓值時，情緒指數視為 0。
             max_emotion_value (int): 情緒指數的上限值。
+            force_calibration_path (str, optional): force_calibration.py 產生的係數表路徑。
+                啟動時載入一次，之後只做多項式求值。
+            voltage_gain, exponent, scale (float): 公式 ((voltage * gain) ** exponent) * scale 的參數，
+                預設值即原始公式；主要供 scoring_evaluator.py 比較候選公式使用。
         """
         self.min_voltage_threshold = min_voltage_threshold
         self.max_emotion_value = max_emotion_value
+        self.voltage_gain = voltage_gain
+        self.exponent = exponent
+        self.scale = scale
+        self.force_calibration = ForceCalibration.load(force_calibration_path)
+        if self.force_calibration:
+            print(f"EmotionCalculator: 已載入力量校正係數表 {force_calibration_path}")
+
+    def estimate_force_kg(self, voltage, channel_name=None):
+        """
+        以校正係數表將扣除基線後的峰值電壓 (SensorHandler.last_channel_strike_peaks) 換算為力量 (kg)。
+
+        回傳:
+            float 或 None: 未載入係數表時回傳 None。
+        """
+        if self.force_calibration is None:
+            return None
+        return self.force_calibration.voltage_to_force_kg(voltage, channel_name)
 
     def calculate_negative_emotion_index(self, voltage):
         """
         根據輸入電壓計算負面情緒指數。
         沿用 VoltageSensing_a3.py 中的原始公式，並套用閾值和上限。
-        公式: emo = ((voltage * 5) ** 2) * 100
+        公式: emo = ((voltage * 5) ** 2) * 100 (係數可由建構參數調整)
 
         參數:
             voltage (float): 從感測器讀取到的最高電壓值。
@@ -31,7 +54,7 @@ class EmotionCalculator:
             return 0
         
         # 原始公式計算
-        raw_emotion_value = ((voltage * 5) ** 2) * 100
+        raw_emotion_value = ((voltage * self.voltage_gain) ** self.exponent) * self.scale
         
         # 套用上限
         calculated_emotion_index = min(raw_emotion_value, self.max_emotion_value)
@@ -0,0 +1,212 @@
+# RandomGenerate/SPI_v2/force_calibration.py
+"""
+力量校正工具：由標註過參考力量的拍擊波形，擬合各通道「電壓 → 力量 (kg)」模型。
+
+擬合流程:
+1. 讀取 trace 目錄 (格式見 sensor_trace.py)，只使用有 reference_force_kg 標註的檔案。
+2. 每個 trace 計算各通道「扣除基線後的峰值電壓」，峰值最高的通道視為被擊中的通道。
+3. 依通道分組，以 numpy 最小平方法一次擬合多項式係數。
+4. 將係數表寫成小型 JSON 檔，執行時由 ForceCalibration 讀取，只需做多項式求值，無擬合成本。
+
+命令列用法:
+    python force_calibration.py <trace目錄> [輸出檔] [多項式次數]
+"""
+import json
+import os
+import statistics
+import time
+import numpy as np
+
+from sensor_trace import list_trace_files, load_trace
+
+CALIBRATION_TABLE_VERSION = 1
+DEFAULT_POLY_DEGREE = 2
+BASELINE_FRACTION = 0.1 # 以每個 trace 前 10% 的取樣中位數作為基線
+
+
+def extract_strike_features(trace):
+    """
+    計算單一 trace 各通道扣除基線後的峰值電壓。
+
+    回傳:
+        np.ndarray: 形狀為 (通道數,) 的峰值陣列。
+    """
+    voltages = trace.voltages
+    n_samples = voltages.shape[1]
+    if n_samples == 0:
+        return np.zeros(voltages.shape[0], dtype=np.float64)
+    baseline_len = max(1, int(n_samples * BASELINE_FRACTION))
+    baseline = np.median(voltages[:, :baseline_len], axis=1)
+    return np.maximum(voltages.max(axis=1) - baseline, 0.0).astype(np.float64)
+
+
+def baseline_subtracted_peak(voltages):
+    """
+    單一通道取樣序列 (依時間順序) 的扣除基線峰值，定義與 extract_strike_features 相同；
+    供測量時以純 Python 計算，換算力量時與擬合使用同樣的特徵。
+    """
+    if not voltages:
+        return 0.0
+    baseline_len = max(1, int(len(voltages) * BASELINE_FRACTION))
+    baseline = statistics.median(voltages[:baseline_len])
+    return max(max(voltages) - baseline, 0.0)
+
+
+def load_labelled_strikes(trace_dir):
+    """
+    讀取目錄中所有已標註力量的 trace，組成擬合用的矩陣。
+
+    回傳:
+        tuple: (channel_names, peaks (N, 通道數), forces (N,))；沒有可用資料時 peaks 為空陣列。
+    """
+    channel_names = None
+    peak_rows = []
+    forces = []
+    skipped = 0
+    for path in list_trace_files(trace_dir):
+        trace = load_trace(path)
+        if trace.reference_force_kg is None:
+            skipped += 1
+            continue
+        if channel_names is None:
+            channel_names = trace.channel_names
+        elif trace.channel_names != channel_names:
+            print(f"ForceCalibration 警告: {path} 的通道設定與其他檔案不同，已略過。")
+            skipped += 1
+            continue
+        peak_rows.append(extract_strike_features(trace))
+        forces.append(trace.reference_force_kg)
+    if skipped:
+        print(f"ForceCalibration: 略過 {skipped} 個未標註或格式不符的 trace。")
+    if not peak_rows:
+        return [], np.zeros((0, 0)), np.zeros(0)
+    return channel_names, np.vstack(peak_rows), np.asarray(forces, dtype=np.float64)
+
+
+def _fit_polynomial(voltages, forces, degree):
+    """以最小平方法擬合 force = poly(voltage)，回傳 (係數 (高次在前), RMS 誤差)。"""
+    design = np.vander(voltages, degree + 1)
+    coeffs, _residuals, _rank, _sv = np.linalg.lstsq(design, forces, rcond=None)
+    rms_error = float(np.sqrt(np.mean((design @ coeffs - forces) ** 2)))
+    return coeffs, rms_error
+
+
+def fit_force_calibration(channel_names, peaks, forces, degree=DEFAULT_POLY_DEGREE):
+    """
+    依被擊中的通道分組擬合係數表。
+
+    參數:
+        channel_names (list[str]): 通道名稱。
+        peaks (np.ndarray): (N, 通道數) 峰值電壓。
+        forces (np.ndarray): (N,) 參考力量 (kg)。
+        degree (int): 多項式次數。
+
+    回傳:
+        dict: 可直接寫成 JSON 的係數表。
+    """
+    struck_channel = peaks.argmax(axis=1)
+    struck_peak = peaks[np.arange(peaks.shape[0]), struck_channel]
+
+    table = {
+        'version': CALIBRATION_TABLE_VERSION,
+        'degree': degree,
+        'channels': {},
+        'default': None
+    }
+    min_strikes = degree + 1
+
+    for index, name in enumerate(channel_names):
+        mask = struck_channel == index
+        n_strikes = int(mask.sum())
+        if n_strikes < min_strikes:
+            print(f"ForceCalibration 警告: 通道 {name} 只有 {n_strikes} 筆拍擊 (至少需要 {min_strikes})，將使用共用模型。")
+            continue
+        coeffs, rms_error = _fit_polynomial(struck_peak[mask], forces[mask], degree)
+        table['channels'][name] = {
+            'coeffs': [round(float(c), 6) for c in coeffs],
+            'n_strikes': n_strikes,
+            'rms_error_kg': round(rms_error, 3),
+            'voltage_range': [round(float(struck_peak[mask].min()), 4), round(float(struck_peak[mask].max()), 4)]
+        }
+
+    if struck_peak.size >= min_strikes:
+        coeffs, rms_error = _fit_polynomial(struck_peak, forces, degree)
+        table['default'] = {
+            'coeffs': [round(float(c), 6) for c in coeffs],
+            'n_strikes': int(struck_peak.size),
+            'rms_error_kg': round(rms_error, 3),
+            'voltage_range': [round(float(struck_peak.min()), 4), round(float(struck_peak.max()), 4)]
+        }
+    return table
+
+
+def save_calibration_table(path, table):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False, indent=2)
+
+
+class ForceCalibration:
+    """執行時使用的電壓 → 力量轉換器，只做多項式求值 (求值本身不使用 numpy，但本模組匯入時仍需要 numpy)。"""
+
+    def __init__(self, table):
+        self.degree = table.get('degree', DEFAULT_POLY_DEGREE)
+        self.channel_coeffs = {name: entry['coeffs'] for name, entry in table.get('channels', {}).items()}
+        default_entry = table.get('default')
+        self.default_coeffs = default_entry['coeffs'] if default_entry else None
+
+    @classmethod
+    def load(cls, path):
+        """
+        從 JSON 係數表建立 ForceCalibration。
+        檔案不存在或格式錯誤時回傳 None。
+        """
+        if not path or not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                table = json.load(f)
+            if table.get('version') != CALIBRATION_TABLE_VERSION:
+                print(f"ForceCalibration 警告: 係數表版本不符 ({table.get('version')})，忽略 {path}。")
+                return None
+            return cls(table)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"ForceCalibration 錯誤: 無法讀取係數表 {path}: {e}")
+            return None
+
+    def voltage_to_force_kg(self, voltage, channel_name=None):
+        """將 (扣除基線後的) 峰值電壓轉換為力量 (kg)，結果不小於 0。"""
+        coeffs = self.channel_coeffs.get(channel_name, self.default_coeffs)
+        if coeffs is None:
+            return 0.0
+        force = 0.0
+        for c in coeffs: # Horner 法
+            force = force * voltage + c
+        return max(0.0, force)
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print("用法: python force_calibration.py <trace目錄> [輸出檔 (預設 force_calibration.json)] [多項式次數]")
+        sys.exit(1)
+
+    trace_dir = sys.argv[1]
+    output_path = sys.argv[2] if len(sys.argv) > 2 else 'force_calibration.json'
+    poly_degree = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_POLY_DEGREE
+
+    t0 = time.perf_counter()
+    names, peak_matrix, force_values = load_labelled_strikes(trace_dir)
+    t1 = time.perf_counter()
+    if peak_matrix.size == 0:
+        print(f"在 {trace_dir} 中找不到已標註力量的 trace。")
+        sys.exit(1)
+
+    calibration_table = fit_force_calibration(names, peak_matrix, force_values, degree=poly_degree)
+    t2 = time.perf_counter()
+    save_calibration_table(output_path, calibration_table)
+
+    print(f"讀取 {len(force_values)} 筆拍擊耗時 {t1 - t0:.2f}s，擬合耗時 {(t2 - t1) * 1000:.1f}ms。")
+    for ch_name, entry in calibration_table['channels'].items():
+        print(f"  通道 {ch_name}: {entry['n_strikes']} 筆, RMS 誤差 {entry['rms_error_kg']} kg, 係數 {entry['coeffs']}")
+    print(f"係數表已寫入 {output_path}")
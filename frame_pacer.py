@@ -0,0 +1,268 @@
+# RandomGenerate/SPI_v2/frame_pacer.py
+"""
+精確的幀間隔控制與自適應目標幀率。
+
+pygame.time.Clock.tick 以 SDL_Delay 等待，Linux 上的睡眠粒度與排程延遲會讓每幀間隔忽長忽短；
+幀工作時間超過預算時它也不會有任何反應。FramePacer 取代 clock.tick:
+    - 以絕對期限 (deadline) 排程，睡眠到期限前 spin 毫秒，剩下的時間以 perf_counter 輪詢 (spin)；
+      spin 期間以 sleep(0) 讓出 GIL，拍擊輪詢執行緒不會被卡住。spin 的長度依實際的睡眠超時自動調整
+    - 落後超過一幀時不追趕，從現在重新起算
+    - 記錄每幀實際間隔與目標間隔的差 (jitter)，get_stats() 提供給 FrameProfiler.extra_stats
+    - adaptive 時每 window_frames 幀檢查一次工作時間 (不含等待):
+      超過預算的幀比例高於 miss_ratio 就降一級 (例如 60 → 50 → 30)；
+      連續 recover_windows 個窗口在上一級的預算內都有足夠餘裕才升回一級，避免在兩級之間來回切換
+
+與 RenderScaleGovernor 的分工: 降低 render scale 是主要的調整手段 (每局開始前套用)，其預算固定為最高幀率，
+不跟隨這裡的降級 (否則降低幀率會放寬預算，倍率永遠不會下降)；自適應幀率只在局內救急，
+每局開始時 restart() 回到最高幀率，以新的倍率重新判斷。
+"""
+import time
+
+from frame_profiler import RingBuffer
+
+FPS_LEVELS = (60, 50, 30) # 自適應時依序嘗試的目標幀率
+
+
+class FramePacer:
+    """每幀結束時呼叫 wait(work_ms)，等到下一幀的期限為止。"""
+
+    LATE_FRAME_FACTOR = 1.5 # 實際間隔超過目標間隔的 1.5 倍視為延遲幀
+    TIGHT_FRAME_ALLOWANCE = 0.02 # 判斷有餘裕時容許的超出比例
+
+    def __init__(self, max_fps=60, levels=FPS_LEVELS, adaptive=False, window_frames=90, miss_ratio=0.2,
+                 headroom_ratio=0.8, recover_windows=3, min_spin_ms=0.5, max_spin_ms=3.0, capacity=600,
+                 on_target_change=None):
+        """
+        參數:
+            max_fps (int): 最高目標幀率；0 表示不等待。
+            levels (tuple): 自適應時可用的目標幀率 (只使用不高於 max_fps 的)。
+            adaptive (bool): 依工作時間自動升降目標幀率。
+            window_frames (int): 每次檢查的幀數。
+            miss_ratio (float): 窗口內超過預算的幀比例高於此值時降一級。
+            headroom_ratio (float): 工作時間都在上一級預算的此比例內，才算有餘裕。
+            recover_windows (int): 連續幾個有餘裕的窗口後升一級。
+            min_spin_ms, max_spin_ms (float): 期限前改以輪詢等待的時間範圍。
+            capacity (int): 保留最近幾幀的間隔供統計。
+            on_target_change (callable, optional): 目標幀率改變時以新的幀率呼叫 (例如更新分析器的預算)。
+        """
+        self.base_levels = tuple(sorted(set(levels), reverse=True))
+        self.adaptive = adaptive
+        self.window_frames = window_frames
+        self.miss_ratio = miss_ratio
+        self.headroom_ratio = headroom_ratio
+        self.recover_windows = recover_windows
+        self.min_spin_sec = min_spin_ms / 1000.0
+        self.max_spin_sec = max_spin_ms / 1000.0
+        self.spin_sec = self.min_spin_sec
+        self.on_target_change = on_target_change
+        self.intervals = RingBuffer(capacity) # 實際幀間隔 (ms)
+        self.jitter = RingBuffer(capacity)    # |實際間隔 - 目標間隔| (ms)
+        self.changes = [] # 自適應調整記錄
+        self.set_max_fps(max_fps)
+
+    def set_max_fps(self, max_fps):
+        """設定最高目標幀率 (0 表示不等待) 並從最高一級開始。"""
+        self.max_fps = max_fps
+        self.levels = (max_fps,) + tuple(level for level in self.base_levels if level < max_fps) if max_fps else (0,)
+        self.level_index = 0
+        self._apply_target(max_fps)
+        self.reset()
+
+    def reset(self):
+        """清除期限與統計 (例如暫停一段時間後)。"""
+        self._deadline = None
+        self._last_end = None
+        self._window_count = 0
+        self._window_misses = 0
+        self._window_tight = 0
+        self._headroom_windows = 0
+        self.frames = 0
+        self.late_frames = 0
+        self.spin_time_sec = 0.0
+        self.max_sleep_overshoot_ms = 0.0
+        self.intervals = RingBuffer(self.intervals.capacity)
+        self.jitter = RingBuffer(self.jitter.capacity)
+
+    def restart(self):
+        """新的一局開始時呼叫：回到最高目標幀率，清除期限、統計與調整記錄。"""
+        changed = self.level_index != 0
+        self.level_index = 0
+        self._apply_target(self.levels[0])
+        self.changes = []
+        self.reset()
+        if changed and self.on_target_change:
+            self.on_target_change(self.target_fps)
+
+    def _apply_target(self, target_fps):
+        self.target_fps = target_fps
+        self.interval_sec = 1.0 / target_fps if target_fps else 0.0
+        self.frame_budget_ms = self.interval_sec * 1000
+
+    def wait(self, work_ms):
+        """
+        幀的工作完成後呼叫 (work_ms 為本幀不含等待的工作時間)：睡眠 + 輪詢到下一幀的期限。
+        回傳:
+            float: 等待的時間 (ms)。
+        """
+        perf_counter = time.perf_counter
+        now = perf_counter()
+        if self.adaptive and len(self.levels) > 1:
+            self._record_work(work_ms)
+        if not self.target_fps:
+            self._record_interval(now)
+            return 0.0
+        deadline = self._deadline if self._deadline is not None else now
+        remaining = deadline - now
+        if remaining > self.spin_sec:
+            wake_at = deadline - self.spin_sec
+            time.sleep(wake_at - now)
+            self._record_overshoot(perf_counter() - wake_at)
+        spin_start = perf_counter()
+        while perf_counter() < deadline:
+            time.sleep(0) # 讓出 GIL
+        end = perf_counter()
+        if end > spin_start:
+            self.spin_time_sec += end - spin_start
+        if end - deadline > self.interval_sec: # 落後超過一幀：不追趕
+            deadline = end
+        self._deadline = deadline + self.interval_sec
+        self._record_interval(end)
+        return (end - now) * 1000
+
+    def _record_overshoot(self, overshoot_sec):
+        """睡眠比預期晚醒的時間；spin 長度取最近超時的約 1.5 倍 (逐漸回落)。"""
+        overshoot_ms = overshoot_sec * 1000
+        if overshoot_ms > self.max_sleep_overshoot_ms:
+            self.max_sleep_overshoot_ms = overshoot_ms
+        wanted = min(self.max_spin_sec, max(self.min_spin_sec, overshoot_sec * 1.5))
+        self.spin_sec = wanted if wanted > self.spin_sec else self.spin_sec * 0.98 + wanted * 0.02
+
+    def _record_interval(self, end):
+        if self._last_end is not None:
+            interval_ms = (end - self._last_end) * 1000
+            self.intervals.append(interval_ms)
+            if self.target_fps:
+                self.jitter.append(abs(interval_ms - self.frame_budget_ms))
+                if interval_ms > self.frame_budget_ms * self.LATE_FRAME_FACTOR:
+                    self.late_frames += 1
+        self._last_end = end
+        self.frames += 1
+
+    def _record_work(self, work_ms):
+        self._window_count += 1
+        if work_ms > self.frame_budget_ms:
+            self._window_misses += 1
+        if self.level_index > 0 and work_ms > 1000.0 / self.levels[self.level_index - 1] * self.headroom_ratio:
+            self._window_tight += 1
+        if self._window_count < self.window_frames:
+            return
+        miss_ratio = self._window_misses / self._window_count
+        # 偶爾一兩幀 (例如 GC) 超過不影響；其餘的幀都要在上一級預算的 headroom_ratio 內
+        has_headroom = self.level_index > 0 and self._window_tight <= self._window_count * self.TIGHT_FRAME_ALLOWANCE
+        self._window_count = self._window_misses = self._window_tight = 0
+        if miss_ratio > self.miss_ratio and self.level_index < len(self.levels) - 1:
+            self._change_level(self.level_index + 1, f"{miss_ratio * 100:.0f}% 的幀超過 {self.frame_budget_ms:.1f} ms 預算")
+        elif has_headroom:
+            self._headroom_windows += 1
+            if self._headroom_windows >= self.recover_windows:
+                self._change_level(self.level_index - 1, f"連續 {self._headroom_windows} 個窗口有餘裕")
+        else:
+            self._headroom_windows = 0
+
+    def _change_level(self, level_index, reason):
+        previous = self.target_fps
+        self.level_index = level_index
+        self._apply_target(self.levels[level_index])
+        self._headroom_windows = 0
+        self._deadline = None # 從下一幀重新起算
+        self.changes.append({'frame': self.frames, 'from_fps': previous, 'to_fps': self.target_fps, 'reason': reason})
+        print(f"FramePacer: {reason}，目標幀率 {previous} → {self.target_fps} FPS。")
+        if self.on_target_change:
+            self.on_target_change(self.target_fps)
+
+    def get_stats(self):
+        """幀間隔與 jitter 的統計 (ms)，寫入 FrameProfiler.extra_stats。"""
+        intervals = self.intervals.percentiles((50, 95, 99))
+        jitter = self.jitter.percentiles((50, 95, 99))
+        return {
+            'target_fps': self.target_fps,
+            'max_fps': self.max_fps,
+            'frames': self.frames,
+            'late_frames': self.late_frames,
+            'interval_ms': {f'p{p}': round(v, 3) for p, v in intervals.items()},
+            'jitter_ms': {f'p{p}': round(v, 3) for p, v in jitter.items()},
+            'spin_ms_per_frame': round(self.spin_time_sec / self.frames * 1000, 3) if self.frames else 0.0,
+            'max_sleep_overshoot_ms': round(self.max_sleep_overshoot_ms, 3),
+            'changes': list(self.changes)
+        }
+
+
+def _busy_work(duration_ms):
+    end = time.perf_counter() + duration_ms / 1000.0
+    while time.perf_counter() < end:
+        pass
+
+
+def benchmark_pacing(frames=300, fps=60, work_ms=6.0):
+    """
+    比較 pygame.time.Clock.tick 與 FramePacer 的幀間隔 jitter (每幀先做 work_ms 的忙碌工作)。
+    回傳:
+        dict: {'clock': {'p50', 'p95', 'p99', 'max'}, 'pacer': {...}} (|間隔 - 目標| 的 ms)
+    """
+    import pygame
+    results = {}
+    clock = pygame.time.Clock()
+    target_ms = 1000.0 / fps
+    samples = []
+    last = time.perf_counter()
+    for _ in range(frames):
+        _busy_work(work_ms)
+        clock.tick(fps)
+        now = time.perf_counter()
+        samples.append(abs((now - last) * 1000 - target_ms))
+        last = now
+    results['clock'] = _jitter_summary(samples[1:])
+
+    pacer = FramePacer(fps)
+    samples = []
+    last = time.perf_counter()
+    for _ in range(frames):
+        start = time.perf_counter()
+        _busy_work(work_ms)
+        pacer.wait((time.perf_counter() - start) * 1000)
+        now = time.perf_counter()
+        samples.append(abs((now - last) * 1000 - target_ms))
+        last = now
+    results['pacer'] = _jitter_summary(samples[1:])
+    results['pacer_spin_ms_per_frame'] = pacer.get_stats()['spin_ms_per_frame']
+    return results
+
+
+def _jitter_summary(samples):
+    ordered = sorted(samples)
+    summary = {f'p{p}': ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in (50, 95, 99)}
+    summary['max'] = ordered[-1]
+    return summary
+
+
+def demo_adaptive(work_schedule=((120, 8.0), (240, 24.0), (480, 5.0)), max_fps=60):
+    """依 (幀數, 每幀工作 ms) 的順序模擬負載變化，回傳自適應調整記錄。"""
+    pacer = FramePacer(max_fps, adaptive=True, window_frames=60)
+    for frame_count, work_ms in work_schedule:
+        for _ in range(frame_count):
+            start = time.perf_counter()
+            _busy_work(work_ms)
+            pacer.wait((time.perf_counter() - start) * 1000)
+    return pacer.get_stats()['changes']
+
+
+if __name__ == '__main__':
+    report = benchmark_pacing()
+    print("幀間隔 jitter (|實際 - 16.67 ms|，ms):")
+    for name in ('clock', 'pacer'):
+        values = report[name]
+        print(f"  {name:<6} p50 {values['p50']:.3f} / p95 {values['p95']:.3f} / p99 {values['p99']:.3f} / 最大 {values['max']:.3f}")
+    print(f"  FramePacer 每幀輪詢 {report['pacer_spin_ms_per_frame']:.3f} ms")
+    print("\n自適應目標幀率 (工作 8 ms → 24 ms → 5 ms):")
+    for change in demo_adaptive():
+        print(f"  第 {change['frame']} 幀: {change['from_fps']} → {change['to_fps']} FPS ({change['reason']})")
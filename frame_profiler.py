@@ -0,0 +1,298 @@
+# RandomGenerate/SPI_v2/frame_profiler.py
+"""
+HdmiGameEngine 的逐階段幀時間分析器。
+
+每一幀依序呼叫:
+    profiler.begin_frame('game')      # 以畫面 (scene) 名稱分開統計
+    ...事件處理...
+    profiler.mark('event_pump')       # 記錄上一個標記到現在的時間
+    ...
+    profiler.end_frame()
+
+時間以 time.perf_counter 量測並寫入預先配置、固定大小的環形緩衝區 (array)，
+每幀只有數次 perf_counter 呼叫與陣列寫入，不會配置新物件；
+百分位數只在更新疊加層或輸出報告時才計算。
+"""
+import glob
+import json
+import os
+import time
+from array import array
+
+import pygame
+
+PHASES = ('event_pump', 'input', 'simulation', 'background', 'sprites', 'particles', 'hud', 'capture', 'present', 'tick_wait')
+OVERLAY_PHASE = 'overlay' # 疊加層本身的繪製時間，單獨列出以便評估分析器的成本
+
+
+class RingBuffer:
+    """固定容量的 float 環形緩衝區。"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.values = array('d', [0.0]) * capacity
+        self.index = 0
+        self.count = 0
+
+    def append(self, value):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def snapshot(self):
+        """由舊到新的內容 (會配置新 list，只在統計時使用)。"""
+        if self.count < self.capacity:
+            return list(self.values[:self.count])
+        return list(self.values[self.index:]) + list(self.values[:self.index])
+
+    def percentiles(self, percents=(50, 95, 99)):
+        ordered = sorted(self.snapshot())
+        if not ordered:
+            return {p: 0.0 for p in percents}
+        return {p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in percents}
+
+
+class SceneTimings:
+    """一個畫面的各階段緩衝區、整幀時間與掉幀計數。"""
+
+    def __init__(self, capacity):
+        self.phases = {phase: RingBuffer(capacity) for phase in PHASES + (OVERLAY_PHASE,)}
+        self.frame = RingBuffer(capacity)
+        self.frames = 0
+        self.dropped_frames = 0
+
+
+class FrameProfiler:
+    """以環形緩衝區記錄每幀各階段耗時 (ms)，並提供疊加層與檔案輸出。"""
+
+    DROPPED_FRAME_FACTOR = 1.5 # 整幀時間超過目標間隔的 1.5 倍視為掉幀
+    OVERLAY_REFRESH_MS = 500   # 疊加層文字更新間隔，避免每幀排序與 font.render
+    OVERLAY_COLOR = (20, 90, 20)
+    OVERLAY_BACKGROUND = (255, 255, 255, 200)
+
+    def __init__(self, enabled=True, capacity=600, target_fps=60):
+        """
+        參數:
+            enabled (bool): False 時所有記錄呼叫立即返回。
+            capacity (int): 每個階段保留的最近幀數。
+            target_fps (int): 用於判斷掉幀的目標幀率。
+        """
+        self.enabled = enabled
+        self.capacity = capacity
+        self.frame_budget_ms = 1000.0 / target_fps
+        self.overlay_visible = False
+        self.scenes = {}
+        self._current = None
+        self._reset_pending = False # 幀進行中呼叫 reset() 時延到下一次 begin_frame 才清除
+        self._frame_start = 0.0
+        self._last_mark = 0.0
+        self._overlay_surface = None
+        self._overlay_updated_at = 0.0
+        self.extra_stats = {} # 其他元件 (例如幀率控制器) 附加到報告的統計
+        # 記錄成本只在初始化時量測一次，報告時直接使用 (不在局與局之間造成停頓)
+        self.overhead_us_per_frame = self.measure_overhead(2000) if enabled else 0.0
+
+    def set_target_fps(self, target_fps):
+        self.frame_budget_ms = 1000.0 / target_fps
+
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        self._overlay_surface = None
+        return self.overlay_visible
+
+    def begin_frame(self, scene='game'):
+        if not self.enabled:
+            return
+        if self._reset_pending:
+            self._clear()
+        timings = self.scenes.get(scene)
+        if timings is None:
+            timings = self.scenes[scene] = SceneTimings(self.capacity)
+        self._current = timings
+        self._frame_start = self._last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        """記錄從上一個標記 (或 begin_frame) 到現在的時間為 phase 的耗時。"""
+        if not self.enabled or self._current is None:
+            return
+        now = time.perf_counter()
+        self._current.phases[phase].append((now - self._last_mark) * 1000)
+        self._last_mark = now
+
+    def skip(self):
+        """略過上一個標記到現在的時間 (不屬於任何階段，例如被其他流程阻塞)。"""
+        if self.enabled:
+            self._last_mark = time.perf_counter()
+
+    def end_frame(self):
+        if not self.enabled or self._current is None:
+            return
+        timings = self._current
+        frame_ms = (time.perf_counter() - self._frame_start) * 1000
+        timings.frame.append(frame_ms)
+        timings.frames += 1
+        if frame_ms > self.frame_budget_ms * self.DROPPED_FRAME_FACTOR:
+            timings.dropped_frames += 1
+        self._current = None
+
+    def summary(self, scene=None):
+        """回傳 {畫面: {'frames', 'dropped_frames', 'frame_ms': {p50,p95,p99}, 'phases': {階段: {p50,p95,p99}}}}。"""
+        scenes = [scene] if scene else list(self.scenes)
+        report = {}
+        for name in scenes:
+            timings = self.scenes.get(name)
+            if timings is None:
+                continue
+            report[name] = {
+                'frames': timings.frames,
+                'dropped_frames': timings.dropped_frames,
+                'frame_ms': _percentile_dict(timings.frame),
+                'phases': {phase: _percentile_dict(buffer) for phase, buffer in timings.phases.items() if buffer.count}
+            }
+        return report
+
+    def overlay_surface(self, font, scene='game'):
+        """
+        回傳 scene 的 p50/p95/p99 與掉幀數疊加層 Surface (未顯示時回傳 None)。
+        文字每 OVERLAY_REFRESH_MS 才重新繪製一次，其餘幀回傳同一個快取的 Surface。
+        """
+        if not self.enabled or not self.overlay_visible:
+            return None
+        now = time.perf_counter()
+        if self._overlay_surface is None or (now - self._overlay_updated_at) * 1000 >= self.OVERLAY_REFRESH_MS:
+            self._overlay_surface = self._render_overlay(font, scene)
+            self._overlay_updated_at = now
+        return self._overlay_surface
+
+    def overlay_position(self, target_width, overlay):
+        """疊加層預設放在右上角，不遮住 HUD。"""
+        return (target_width - overlay.get_width() - 10, 10)
+
+    def draw_overlay(self, surface, font, scene='game', position=None):
+        """在 surface 上畫出疊加層，回傳畫到的 Rect (未顯示時回傳 None)。疊加層的成本記在 'overlay' 階段。"""
+        start = time.perf_counter()
+        overlay = self.overlay_surface(font, scene)
+        if overlay is None:
+            return None
+        if position is None:
+            position = self.overlay_position(surface.get_width(), overlay)
+        rect = surface.blit(overlay, position)
+        self.mark_overlay(start)
+        return rect
+
+    def mark_overlay(self, start):
+        """把從 start 到現在的時間記為疊加層成本，且不計入下一個階段。"""
+        if self._current is not None:
+            now = time.perf_counter()
+            self._current.phases[OVERLAY_PHASE].append((now - start) * 1000)
+            self._last_mark = now
+
+    def _render_overlay(self, font, scene):
+        timings = self.scenes.get(scene)
+        lines = [f"{scene}  p50 / p95 / p99 ms"]
+        if timings is not None:
+            frame = timings.frame.percentiles()
+            lines.append(f"frame {frame[50]:5.2f} {frame[95]:5.2f} {frame[99]:5.2f}  dropped {timings.dropped_frames}/{timings.frames}")
+            for phase, buffer in timings.phases.items():
+                if buffer.count:
+                    values = buffer.percentiles()
+                    lines.append(f"{phase:<11}{values[50]:5.2f} {values[95]:5.2f} {values[99]:5.2f}")
+        rendered = [font.render(line, True, self.OVERLAY_COLOR) for line in lines]
+        line_h = font.get_linesize()
+        overlay = pygame.Surface((max(r.get_width() for r in rendered) + 12, line_h * len(rendered) + 8), pygame.SRCALPHA)
+        overlay.fill(self.OVERLAY_BACKGROUND)
+        for i, line_surface in enumerate(rendered):
+            overlay.blit(line_surface, (6, 4 + i * line_h))
+        return overlay
+
+    def measure_overhead(self, iterations=20000):
+        """
+        量測每幀記錄成本 (begin_frame + 所有階段 mark + end_frame)，回傳每幀微秒數。
+        使用獨立的畫面名稱，不影響實際統計。
+        """
+        was_enabled = self.enabled
+        self.enabled = True
+        start = time.perf_counter()
+        for _ in range(iterations):
+            self.begin_frame('_overhead')
+            for phase in PHASES:
+                self.mark(phase)
+            self.end_frame()
+        per_frame_us = (time.perf_counter() - start) / iterations * 1e6
+        del self.scenes['_overhead']
+        self.enabled = was_enabled
+        return per_frame_us
+
+    def dump(self, directory, prefix='frame_profile', keep_files=None):
+        """把各畫面的統計與原始樣本寫成 JSON，回傳檔案路徑；keep_files 指定時只保留最新的幾個同名前綴檔案。"""
+        if not self.enabled or not self.scenes:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = timestamped_path(directory, prefix)
+        samples = {name: {'frame': timings.frame.snapshot(),
+                          'phases': {phase: buffer.snapshot() for phase, buffer in timings.phases.items() if buffer.count}}
+                   for name, timings in self.scenes.items()}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'frame_budget_ms': self.frame_budget_ms,
+                       'overhead_us_per_frame': round(self.overhead_us_per_frame, 2),
+                       'summary': self.summary(),
+                       'extra': self.extra_stats,
+                       'samples': samples}, f, indent=1)
+        if keep_files:
+            prune_old_files(directory, f"{prefix}_*.json", keep_files)
+        return path
+
+    def reset(self):
+        """
+        清除所有畫面的統計與附加統計 (例如每局開始時)。
+        在一幀的 begin_frame / end_frame 之間呼叫時 (畫面切換發生在幀中)，這一幀照常記錄完，
+        清除延到下一次 begin_frame，之後的幀完整計入新的統計。
+        """
+        if self._current is not None:
+            self._reset_pending = True
+        else:
+            self._clear()
+
+    def _clear(self):
+        self.scenes = {}
+        self.extra_stats = {}
+        self._reset_pending = False
+        self._overlay_surface = None
+
+
+def timestamped_path(directory, prefix, extension='.json'):
+    """
+    directory 中以 prefix 與毫秒時間命名的新檔案路徑；同一毫秒內已有同名檔案時加上序號，
+    腳本連續執行的多局 (例如對戰、重播) 不會互相覆蓋。
+    """
+    now = time.time()
+    stem = f"{prefix}_{time.strftime('%Y%m%d_%H%M%S', time.localtime(now))}_{int(now * 1000) % 1000:03d}"
+    path = os.path.join(directory, stem + extension)
+    index = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{stem}_{index}{extension}")
+        index += 1
+    return path
+
+
+def prune_old_files(directory, pattern, keep_files):
+    """只保留 directory 中符合 pattern 的最新 keep_files 個檔案 (依修改時間)。"""
+    paths = sorted(glob.glob(os.path.join(directory, pattern)), key=os.path.getmtime, reverse=True)
+    for path in paths[keep_files:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _percentile_dict(buffer):
+    values = buffer.percentiles()
+    return {f'p{p}': round(v, 3) for p, v in values.items()}
+
+
+if __name__ == '__main__':
+    profiler = FrameProfiler()
+    overhead_us = profiler.measure_overhead()
+    print(f"FrameProfiler: 每幀記錄成本 {overhead_us:.2f} µs "
+          f"({len(PHASES)} 個階段，約占 60 FPS 幀預算的 {overhead_us / (profiler.frame_budget_ms * 10):.3f}%)")
@@ -7,7 +7,8 @@ from led_controller import Color # 為了在測量時設定顏色
 
 # 這個模組本身不直接依賴硬體函式庫，而是接收已初始化的處理器物件。
 
-def get_player_emotion_index(sensor_handler, emotion_calculator, led_controller=None, duration_sec=3):
+def get_player_emotion_index(sensor_handler, emotion_calculator, led_controller=None, duration_sec=3,
+                             adaptive_options=None):
     """
     獲取玩家的情緒指數，並在測量期間提供 LED 視覺回饋。
     
@@ -20,6 +21,9 @@ def get_player_emotion_index(sensor_handler, emotion_calculator, led_controller=
         emotion_calculator: EmotionCalculator 實例
         led_controller (LedController, optional): LED 控制器實例。
         duration_sec (int): 收集數據的持續時間（秒）
+        adaptive_options (dict, optional): 提供時改用 SensorHandler.measure_peak_voltage_adaptive，
+            內容為其關鍵字參數 (strike_threshold, release_voltage, hold_sec, min_duration_sec, max_duration_sec)。
+            拍擊結束後即提前完成測量，實際時間記錄於 sensor_handler.last_measurement_duration_sec。
     
     返回:
         int: 計算出的負面情緒指數，如果過程中出現錯誤則返回 0
@@ -57,13 +61,27 @@ def get_player_emotion_index(sensor_handler, emotion_calculator, led_controller=
 
     try:
         # 獲取最大電壓值
-        max_voltage = sensor_handler.get_max_voltage_from_all_channels(duration_sec=duration_sec)
+        if adaptive_options is not None and hasattr(sensor_handler, 'measure_peak_voltage_adaptive'):
+            measurement = sensor_handler.measure_peak_voltage_adaptive(**adaptive_options)
+            max_voltage = measurement['max_voltage']
+            print(f"實際測量時間: {measurement['duration_sec']:.2f} 秒 ({measurement['end_reason']})")
+        else:
+            max_voltage = sensor_handler.get_max_voltage_from_all_channels(duration_sec=duration_sec)
         
         if max_voltage <= 0:
             print(f"測量結果: 未檢測到有效的壓力 (最大電壓: {max_voltage:.3f}V)")
             return 0
         
         print(f"測量完成! 最大電壓: {max_voltage:.3f}V")
+
+        # 若已載入力量校正係數表，以被擊中的通道換算力量，供記錄與調整參數參考；
+        # 係數是以扣除基線後的峰值擬合的 (force_calibration.extract_strike_features)，這裡使用相同的特徵
+        strike_peaks = getattr(sensor_handler, 'last_channel_strike_peaks', None)
+        if strike_peaks and hasattr(emotion_calculator, 'estimate_force_kg'):
+            struck_channel = max(strike_peaks, key=strike_peaks.get)
+            force_kg = emotion_calculator.estimate_force_kg(strike_peaks[struck_channel], struck_channel)
+            if force_kg is not None:
+                print(f"估計拍擊力量: {force_kg:.1f} kg (通道 {struck_channel})")
         
         # 計算情緒指數
         emotion_index = emotion_calculator.calculate_negative_emotion_index(max_voltage)
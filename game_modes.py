@@ -0,0 +1,237 @@
+# RandomGenerate/SPI_v2/game_modes.py
+"""
+遊戲模式的登錄與延遲載入。
+
+每個模式是一個 *_mode.py 模組，在檔案開頭附近 (前 DECLARATION_SCAN_BYTES 內) 以字面值宣告:
+    GAME_MODE = {'name': 'versus', 'title': '雙人對戰', 'class': 'VersusGameMode', 'order': 20,
+                 'description': '...'}
+並提供一個 GameMode 子類別 (setup / start / run)。
+
+GameModeRegistry.discover() 只讀取每個檔案的開頭、找出這段宣告並以 ast.literal_eval 解析，
+不 import 模組，因此啟動時間不受模式的數量、大小與其依賴的 import 成本影響。
+選用模式時才 import 模組並建立實例 (之後重用)；每次開始前呼叫 setup(engine)，
+資源在第一次使用時載入並由模式自己快取 (例如 versus_mode.LaneAssets 依跑道尺寸快取)，之後的局直接使用。
+"""
+import abc
+import ast
+import glob
+import importlib.util
+import os
+import re
+import sys
+import time
+
+GAME_MODE_FILE_PATTERN = '*_mode.py'
+DECLARATION_SCAN_BYTES = 16 * 1024 # 只讀取檔案開頭，宣告必須在 import 之後、其他程式碼之前
+DECLARATION_MAX_LINES = 20
+_DECLARATION_PATTERN = re.compile(r'^GAME_MODE\s*=', re.M)
+
+
+class GameModeInfo:
+    """由宣告讀出的模式資訊 (未 import 模組)。"""
+
+    def __init__(self, name, title, module, class_name, path, order=100, description=''):
+        self.name = name
+        self.title = title
+        self.module = module
+        self.class_name = class_name
+        self.path = path
+        self.order = order
+        self.description = description
+
+    def __repr__(self):
+        return f"GameModeInfo({self.name!r}, module={self.module!r})"
+
+
+class GameMode(abc.ABC):
+    """
+    遊戲模式的介面。
+        setup(engine)                    每次開始前呼叫；第一次使用時載入資源，之後使用快取
+        start(engine, initial_mileage)   切換到本模式的畫面並立即返回，流程完成時設定 engine.game_result
+        run(engine, initial_mileage)     阻塞執行一局並回傳結果 dict ({'score', 'final_mileage', 'reason', ...})
+    start 為抽象方法：沒有實作 start 的模式在載入 (建立實例) 時就會失敗，而不是開始一局之後。
+    """
+
+    def __init__(self, info):
+        self.info = info
+
+    @property
+    def name(self):
+        return self.info.name
+
+    def setup(self, engine):
+        pass
+
+    @abc.abstractmethod
+    def start(self, engine, initial_mileage):
+        """切換到本模式的畫面並立即返回。"""
+
+    def run(self, engine, initial_mileage):
+        self.start(engine, initial_mileage)
+        return engine.run_until_result()
+
+
+def read_mode_declaration(path):
+    """讀取檔案開頭的 GAME_MODE 宣告 (不執行模組)；沒有宣告時回傳 None，宣告不是字面值時引發 ValueError。"""
+    with open(path, encoding='utf-8') as f:
+        header = f.read(DECLARATION_SCAN_BYTES)
+    match = _DECLARATION_PATTERN.search(header)
+    if match is None:
+        return None
+    lines = header[match.end():].split('\n', DECLARATION_MAX_LINES)[:DECLARATION_MAX_LINES]
+    # 宣告可能跨多行：逐行加長，括號配對後才嘗試解析
+    for end in range(1, len(lines) + 1):
+        text = '\n'.join(lines[:end])
+        if text.count('{') > text.count('}'):
+            continue
+        try:
+            declaration = ast.literal_eval(text.strip())
+        except (SyntaxError, ValueError):
+            continue
+        if not isinstance(declaration, dict):
+            break
+        return declaration
+    raise ValueError("GAME_MODE 必須是 dict 字面值")
+
+
+class GameModeRegistry:
+    """掃描資料夾中的 *_mode.py 宣告，選用時才載入模式。"""
+
+    def __init__(self, search_dir=None, pattern=GAME_MODE_FILE_PATTERN):
+        self.search_dir = search_dir or os.path.dirname(os.path.abspath(__file__))
+        self.pattern = pattern
+        self.modes = {}
+        self._instances = {}
+        self.discover_ms = 0.0
+        self.switch_ms = {} # 每個模式最近一次 activate (import + setup) 的耗時
+        self.discover()
+
+    def discover(self):
+        """重新掃描模式宣告 (已載入的模式實例保留)。"""
+        start = time.perf_counter()
+        modes = {}
+        for path in sorted(glob.glob(os.path.join(self.search_dir, self.pattern))):
+            try:
+                declaration = read_mode_declaration(path)
+            except (OSError, ValueError) as e:
+                print(f"GameModeRegistry 警告: 無法讀取 {os.path.basename(path)} 的模式宣告 ({e})，已略過。")
+                continue
+            if declaration is None:
+                continue
+            name = declaration.get('name')
+            class_name = declaration.get('class')
+            if not name or not class_name:
+                print(f"GameModeRegistry 警告: {os.path.basename(path)} 的宣告缺少 'name' 或 'class'，已略過。")
+                continue
+            if name in modes:
+                print(f"GameModeRegistry 警告: 模式 '{name}' 重複宣告 ({os.path.basename(path)})，保留 {os.path.basename(modes[name].path)}。")
+                continue
+            modes[name] = GameModeInfo(name, declaration.get('title', name), os.path.splitext(os.path.basename(path))[0],
+                                       class_name, path, declaration.get('order', 100), declaration.get('description', ''))
+        self.modes = modes
+        self.discover_ms = (time.perf_counter() - start) * 1000
+        return self.names()
+
+    def names(self):
+        """依宣告的 order 排序的模式名稱。"""
+        return [info.name for info in sorted(self.modes.values(), key=lambda info: (info.order, info.name))]
+
+    def is_loaded(self, name):
+        return name in self._instances
+
+    def get(self, name):
+        """取得模式實例；第一次取得時才 import 模組。未知的模式引發 KeyError，模式類別沒有實作 start 時引發 TypeError。"""
+        mode = self._instances.get(name)
+        if mode is not None:
+            return mode
+        info = self.modes[name]
+        start = time.perf_counter()
+        module = sys.modules.get(info.module)
+        if module is None:
+            spec = importlib.util.spec_from_file_location(info.module, info.path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[info.module] = module
+            try:
+                spec.loader.exec_module(module)
+            except Exception:
+                del sys.modules[info.module]
+                raise
+        mode = self._instances[name] = getattr(module, info.class_name)(info)
+        print(f"GameModeRegistry: 已載入模式 '{name}' ({info.module})，{(time.perf_counter() - start) * 1000:.1f} ms。")
+        return mode
+
+    def activate(self, name, engine):
+        """取得模式並呼叫 setup(engine) (第一次使用時載入資源)，回傳模式實例。"""
+        start = time.perf_counter()
+        mode = self.get(name)
+        mode.setup(engine)
+        self.switch_ms[name] = (time.perf_counter() - start) * 1000
+        return mode
+
+
+def _write_synthetic_modes(directory, count, body_lines):
+    """基準測試用：產生 count 個宣告相同格式、模組本體很大的假模式檔。"""
+    body = ''.join(f"VALUE_{index} = {index} * 2\n" for index in range(body_lines))
+    for index in range(count):
+        with open(os.path.join(directory, f"synthetic{index:03d}_mode.py"), 'w', encoding='utf-8') as f:
+            f.write(f"import json\n\nGAME_MODE = {{'name': 'synthetic{index}', 'title': '測試 {index}', 'class': 'Mode',\n"
+                    f"             'order': {index}}}\n\n{body}")
+
+
+def benchmark_registry(mode_counts=(2, 20, 100), body_lines=2000, screen_size=(800, 600), switches=6):
+    """
+    量測 (1) 模式數量不同時的探索時間 (不 import)；
+    (2) 以 dummy 驅動的引擎在 classic 與 versus 之間切換時，activate + start + 第一幀的時間。
+    回傳:
+        dict: {'discover_ms': {模式數: ms}, 'first_switch_ms': {模式: ms}, 'switch_ms': [每次切換 ms]}
+    """
+    import tempfile
+    discover_ms = {}
+    with tempfile.TemporaryDirectory() as directory:
+        written = 0
+        for count in mode_counts:
+            _write_synthetic_modes(directory, count, body_lines)
+            written = count
+            registry = GameModeRegistry(directory)
+            assert len(registry.modes) == written
+            discover_ms[count] = registry.discover_ms
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from hdmi_game_engine import HdmiGameEngine
+    engine = HdmiGameEngine(*screen_size, render_mode='dirty', fullscreen=False)
+    engine.fps = 0 # 不等待幀期限，只量測切換本身
+    first_switch_ms = {}
+    switch_ms = []
+    try:
+        names = ['classic', 'versus']
+        for index in range(switches):
+            name = names[index % len(names)]
+            first = not engine.game_modes.is_loaded(name)
+            start = time.perf_counter()
+            engine.start_mode(name, 100)
+            engine.tick()
+            elapsed = (time.perf_counter() - start) * 1000
+            if first:
+                first_switch_ms[name] = elapsed
+            else:
+                switch_ms.append(elapsed)
+    finally:
+        engine.cleanup()
+    return {'discover_ms': discover_ms, 'first_switch_ms': first_switch_ms, 'switch_ms': switch_ms}
+
+
+if __name__ == '__main__':
+    registry = GameModeRegistry()
+    print(f"找到 {len(registry.modes)} 個模式 ({registry.discover_ms:.2f} ms，未 import):")
+    for mode_name in registry.names():
+        mode_info = registry.modes[mode_name]
+        print(f"  {mode_name:<10} {mode_info.title}  ({mode_info.module}.{mode_info.class_name}) {mode_info.description}")
+    report = benchmark_registry()
+    print("\n探索時間 (每個假模式檔 2000 行、不 import):")
+    for mode_count, elapsed_ms in report['discover_ms'].items():
+        print(f"  {mode_count:>4} 個模式: {elapsed_ms:.2f} ms")
+    for mode_name, elapsed_ms in report['first_switch_ms'].items():
+        print(f"第一次切換到 '{mode_name}' (import + 載入資源 + 第一幀): {elapsed_ms:.1f} ms")
+    print(f"之後的切換: 最大 {max(report['switch_ms']):.1f} ms")
+    import pygame
+    pygame.quit()
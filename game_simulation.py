@@ -0,0 +1,434 @@
+# RandomGenerate/SPI_v2/game_simulation.py
+"""
+跳躍躲避遊戲的純邏輯模擬，不依賴 pygame 顯示或時鐘。
+
+模擬以固定時間步長 (STEP_MS) 前進，所有速度皆以「每步」為單位、生成時間以毫秒為單位，
+因此無論畫面以 30、60 或 120 FPS 繪製，遊戲難度都相同。
+速度與重力常數以像素為單位，因此引擎固定在 LOGICAL_SCREEN_HEIGHT 高的邏輯解析度上模擬
+(logical_screen_size)，繪圖時才以 RenderMapping 換算成內部繪圖解析度；解析度與 render scale 不影響難度。
+HdmiGameEngine 依實際經過的時間決定每幀要跑幾步，並以 prev_* 狀態做插值繪圖。
+
+障礙物存放在 ObstaclePool (預先配置的環形緩衝區)，以「世界座標」記錄生成位置，
+移動只需更新一個捲動量；每步不建立新的 list 或 dict。
+"""
+import random
+
+LOGICAL_SCREEN_HEIGHT = 600 # 模擬的邏輯畫面高度 (速度與重力常數以此高度調校)
+
+
+class GameGeometry:
+    """模擬所需的畫面幾何資訊 (像素)，由 HdmiGameEngine 依解析度與圖片尺寸建立。"""
+
+    def __init__(self, screen_width, ground_y, player_x, player_size, obstacle_sizes, player_mask=None, obstacle_masks=None,
+                 screen_height=LOGICAL_SCREEN_HEIGHT):
+        """
+        參數:
+            screen_width (int): 障礙物生成的 x 位置 (螢幕右緣)。
+            ground_y (int): 地面 y 座標。
+            player_x (int): 玩家固定的 x 位置。
+            player_size (tuple): 玩家 (寬, 高)。
+            obstacle_sizes (dict): {高度鍵: (寬, 高)}，鍵的順序決定得分區間 (矮、高)。
+            player_mask, obstacle_masks: 玩家的 pygame.mask.Mask 與 {高度鍵: Mask}；
+                提供時矩形重疊後再以像素判斷碰撞，None 表示只用矩形。
+            screen_height (int): 幾何資訊所在的畫面高度，繪圖時以 (繪圖高度 / screen_height) 換算座標。
+        """
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.ground_y = ground_y
+        self.player_x = player_x
+        self.player_w, self.player_h = player_size
+        self.obstacle_sizes = dict(obstacle_sizes)
+        self.obstacle_height_keys = list(obstacle_sizes.keys())
+        self.player_mask = player_mask
+        self.obstacle_masks = obstacle_masks
+
+    @classmethod
+    def for_screen(cls, screen_width, screen_height, player_image_size=(350, 350), obstacle_image_size=(256, 320)):
+        """
+        不載入圖片，依 HdmiGameEngine._load_game_assets 的縮放規則計算幾何資訊 (無頭模擬使用)。
+        預設圖片尺寸為 player.png / obstacle.png 的原始尺寸。
+        引擎以 logical_screen_size(輸出解析度) 的邏輯解析度模擬 (高度固定)，要得到與實機相同的幾何資訊
+        需傳入該邏輯解析度 (例如 1920x1080 → 1067x600)；直接傳入輸出解析度得到的是另一種難度。
+        """
+        scale_factor = 1.5
+        player_h = int(screen_height * 0.13 * scale_factor)
+        player_w = int(player_image_size[0] * (player_h / player_image_size[1]))
+        obstacle_sizes = {}
+        for key, ratio in ((50, 0.07), (75, 0.12)):
+            obstacle_h = int(screen_height * ratio * scale_factor)
+            obstacle_sizes[key] = (int(obstacle_image_size[0] * (obstacle_h / obstacle_image_size[1])), obstacle_h)
+        return cls(
+            screen_width=screen_width,
+            ground_y=screen_height - int(screen_height * 0.15),
+            player_x=int(screen_width * 0.1),
+            player_size=(player_w, player_h),
+            obstacle_sizes=obstacle_sizes,
+            screen_height=screen_height
+        )
+
+
+def logical_screen_size(render_size):
+    """與 render_size 長寬比相同、高度為 LOGICAL_SCREEN_HEIGHT 的模擬解析度。"""
+    width, height = render_size
+    return (int(round(LOGICAL_SCREEN_HEIGHT * width / height)), LOGICAL_SCREEN_HEIGHT)
+
+
+class RenderMapping:
+    """把模擬的邏輯座標換算成繪圖面的像素座標 (玩家以離地高度換算，落地時剛好貼齊繪圖面的地面)。"""
+
+    def __init__(self, geometry, render_height, render_ground_y):
+        self.geometry = geometry
+        self.scale = render_height / geometry.screen_height
+        self.ground_y = render_ground_y
+        self.player_x = int(round(geometry.player_x * self.scale))
+
+    def player_bottom(self, sim, alpha):
+        geometry = self.geometry
+        lift = geometry.ground_y - (sim.interpolated_player_top(alpha) + geometry.player_h)
+        return self.ground_y - int(round(lift * self.scale))
+
+    def obstacle_x(self, sim, slot, alpha):
+        return int(sim.obstacle_x(slot, alpha) * self.scale)
+
+    def scroll(self, sim, alpha):
+        return sim.interpolated_scroll(alpha) * self.scale
+
+
+class ObstaclePool:
+    """
+    障礙物的環形緩衝區，各欄位以平行的預先配置 list 儲存 (slot-based)。
+
+    障礙物都從螢幕右緣生成、以相同速度左移，因此生成順序就是由左到右的順序：
+    最舊的 (head) 在最左邊，新的加在尾端，離開畫面的從 head 移除。
+    位置以世界座標 world_x 儲存，螢幕 x = world_x - 目前捲動量。
+    """
+
+    def __init__(self, capacity=16):
+        self.capacity = capacity
+        self.world_x = [0] * capacity
+        self.width = [0] * capacity
+        self.height = [0] * capacity
+        self.height_key = [None] * capacity
+        self.head = 0
+        self.count = 0
+        self.scored_count = 0 # 從 head 起算已計分的障礙物數量
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+        self.scored_count = 0
+
+    def slot(self, index):
+        """第 index 個 (由左到右) 障礙物所在的欄位索引。"""
+        return (self.head + index) % self.capacity
+
+    def push(self, world_x, width, height, height_key):
+        if self.count == self.capacity:
+            self._grow()
+        slot = (self.head + self.count) % self.capacity
+        self.world_x[slot] = world_x
+        self.width[slot] = width
+        self.height[slot] = height
+        self.height_key[slot] = height_key
+        self.count += 1
+
+    def pop_front(self):
+        self.head = (self.head + 1) % self.capacity
+        self.count -= 1
+        if self.scored_count > 0:
+            self.scored_count -= 1
+
+    def _grow(self):
+        """容量不足時加倍並把內容重新排成從 0 開始 (只在障礙物數量創新高時發生)。"""
+        order = [self.slot(i) for i in range(self.count)]
+        extra = self.capacity
+        for name in ('world_x', 'width', 'height', 'height_key'):
+            column = getattr(self, name)
+            setattr(self, name, [column[slot] for slot in order] + [column[0]] * extra)
+        self.head = 0
+        self.capacity += extra
+
+
+class GameSimulation:
+    """一局遊戲的狀態與固定步長更新。"""
+
+    SIM_HZ = 60
+    STEP_MS = 1000.0 / SIM_HZ
+
+    PLAYER_GRAVITY = 0.6     # 每步速度增量 (px/步²)
+    JUMP_STRENGTH = -19      # 起跳速度 (px/步)
+    OBSTACLE_SPEED_INITIAL = 5.0 # px/步
+    # 每 10 分提升一次速度: 增量 = BASE + PER_MILESTONE * 里程碑，上限 = 初速 + CAP_BONUS + CAP_PER_MILESTONE * 里程碑
+    SPEED_INCREMENT_BASE = 0.2
+    SPEED_INCREMENT_PER_MILESTONE = 0.15
+    SPEED_CAP_BONUS = 3.0
+    SPEED_CAP_PER_MILESTONE = 0.5
+    JUMP_BUFFER_DURATION_MS = 180 # 原為 120ms, 增加緩衝時間
+
+    OBSTACLE_INITIAL_SPAWN_TIME_AVG_MS = 2000 # 原為 120 幀 (60 FPS)
+    OBSTACLE_MIN_SPAWN_TIME_AVG_MS = 1000
+    OBSTACLE_SCORE_TO_REACH_MIN_SPAWN_TIME = 1000
+    OBSTACLE_SPAWN_TIME_RANDOM_RANGE_MS = 500
+    OBSTACLE_ABSOLUTE_MIN_SPAWN_TIME_MS = 667
+    OBSTACLE_SPAWN_TIME_MIN_SPREAD_MS = 83
+
+    OBSTACLE_POOL_CAPACITY = 16 # 一般解析度同時在畫面上的障礙物遠少於此數
+
+    def __init__(self, geometry, initial_mileage, rng=None):
+        """
+        參數:
+            geometry (GameGeometry): 畫面幾何資訊。
+            initial_mileage (int): 初始情緒 (里程)。
+            rng (random.Random, optional): 亂數產生器；重播或大量模擬時傳入固定種子的實例。
+        """
+        self.geometry = geometry
+        self.rng = rng or random.Random()
+        self.initial_mileage = initial_mileage
+
+        self.time_ms = 0.0
+        self.steps = 0
+        self.player_top = float(geometry.ground_y - geometry.player_h)
+        self.prev_player_top = self.player_top
+        self.player_y_velocity = 0.0
+        self.is_jumping = False
+        self.jump_buffer_expires_at = 0 # 跳躍緩衝到期時間 (模擬時間 ms)
+        self.jump_buffer_strength = 1.0
+        self.jumps = 0
+
+        self.obstacles = ObstaclePool(self.OBSTACLE_POOL_CAPACITY)
+        self.score = 0
+        self.current_mileage = initial_mileage
+        self.obstacle_speed = self.OBSTACLE_SPEED_INITIAL
+        self.last_speed_increase_milestone = 0
+        self.obstacle_timer_ms = 0.0
+        self.obstacle_spawn_time_ms = self.OBSTACLE_INITIAL_SPAWN_TIME_AVG_MS
+        self.scroll_px = 0.0 # 前景累計捲動距離，供背景視差使用
+        self.prev_scroll_px = 0.0
+
+        self.game_active = True
+        self.game_over_reason = None
+        self._spawn_obstacle()
+
+    def _spawn_obstacle(self):
+        """在螢幕右緣生成新的障礙物。"""
+        height_key = self.rng.choice(self.geometry.obstacle_height_keys)
+        width, height = self.geometry.obstacle_sizes[height_key]
+        self.obstacles.push(self.scroll_px + self.geometry.screen_width, width, height, height_key)
+
+    def obstacle_x(self, slot, alpha=1.0):
+        """障礙物在螢幕上的 x 座標；alpha < 1 時為上一步與目前位置之間的插值。"""
+        return self.obstacles.world_x[slot] - self.interpolated_scroll(alpha)
+
+    def request_jump(self, strength=1.0):
+        """
+        玩家按下跳躍：在地面上立即起跳，在空中則設定跳躍緩衝。
+        strength 為起跳速度倍率 (拍擊力道)，鍵盤為 1.0。
+        """
+        if not self.game_active:
+            return False
+        if not self.is_jumping:
+            self._start_jump(strength)
+            self.jump_buffer_expires_at = 0
+            return True
+        self.jump_buffer_expires_at = self.time_ms + self.JUMP_BUFFER_DURATION_MS
+        self.jump_buffer_strength = strength
+        return False
+
+    def _start_jump(self, strength=1.0):
+        self.is_jumping = True
+        self.player_y_velocity = self.JUMP_STRENGTH * strength
+        self.jumps += 1
+
+    def step(self):
+        """前進一個固定時間步長。遊戲結束後呼叫不會有任何作用。"""
+        if not self.game_active:
+            return
+        geometry = self.geometry
+        self.time_ms += self.STEP_MS
+        self.steps += 1
+        self.prev_player_top = self.player_top
+        self.prev_scroll_px = self.scroll_px
+
+        if self.is_jumping:
+            self.player_y_velocity += self.PLAYER_GRAVITY
+            self.player_top += self.player_y_velocity
+            if self.player_top + geometry.player_h >= geometry.ground_y:
+                self.player_top = float(geometry.ground_y - geometry.player_h)
+                self.is_jumping = False
+                self.player_y_velocity = 0.0
+                if self.jump_buffer_expires_at > self.time_ms: # 執行緩衝的跳躍
+                    self._start_jump(self.jump_buffer_strength)
+                self.jump_buffer_expires_at = 0 # 無論如何都清除緩衝
+
+        current_score_milestone = self.score // 10
+        if current_score_milestone > self.last_speed_increase_milestone:
+            # 讓加速度隨分數提升而增加
+            speed_increment = self.SPEED_INCREMENT_BASE + self.SPEED_INCREMENT_PER_MILESTONE * current_score_milestone
+            self.obstacle_speed = min(
+                self.obstacle_speed + speed_increment,
+                self.OBSTACLE_SPEED_INITIAL + self.SPEED_CAP_BONUS + self.SPEED_CAP_PER_MILESTONE * current_score_milestone # 最高速也隨分數提升
+            )
+            self.last_speed_increase_milestone = current_score_milestone
+
+        self.obstacle_timer_ms += self.STEP_MS
+        if self.obstacle_timer_ms > self.obstacle_spawn_time_ms:
+            self._spawn_obstacle()
+            self.obstacle_timer_ms = 0.0
+            prog = min(1.0, self.score / self.OBSTACLE_SCORE_TO_REACH_MIN_SPAWN_TIME)
+            curr_avg_spawn = self.OBSTACLE_INITIAL_SPAWN_TIME_AVG_MS - prog * (self.OBSTACLE_INITIAL_SPAWN_TIME_AVG_MS - self.OBSTACLE_MIN_SPAWN_TIME_AVG_MS)
+            spawn_low = max(self.OBSTACLE_ABSOLUTE_MIN_SPAWN_TIME_MS, int(curr_avg_spawn - self.OBSTACLE_SPAWN_TIME_RANDOM_RANGE_MS / 2))
+            spawn_high = max(spawn_low + self.OBSTACLE_SPAWN_TIME_MIN_SPREAD_MS, int(curr_avg_spawn + self.OBSTACLE_SPAWN_TIME_RANDOM_RANGE_MS / 2))
+            self.obstacle_spawn_time_ms = self.rng.randint(spawn_low, spawn_high)
+
+        self.scroll_px += int(self.obstacle_speed)
+        collided = self._sweep_obstacles()
+
+        # 移除已完全離開畫面左緣的障礙物 (都在 head 端)
+        pool = self.obstacles
+        while pool.count and pool.world_x[pool.head] + pool.width[pool.head] - self.scroll_px <= 0:
+            pool.pop_front()
+
+        if collided:
+            self.game_active = False
+            self.game_over_reason = "collision"
+            return
+
+        self.current_mileage = self.initial_mileage - self.score
+        if self.current_mileage <= 0:
+            self.current_mileage = 0
+            self.game_active = False
+            self.game_over_reason = "mileage_zero"
+
+    def _sweep_obstacles(self):
+        """
+        單次由左到右掃描，同時處理計分與碰撞，回傳是否碰撞。
+
+        從第一個未計分的障礙物開始：完全越過玩家左緣的計分，
+        與玩家 x 範圍重疊的做 AABB 碰撞檢查 (有遮罩時 AABB 重疊才再比對像素)，
+        遇到在玩家右緣之後的就停止，因此每步只檢查玩家附近的少數障礙物，與障礙物總數無關。
+        """
+        geometry = self.geometry
+        pool = self.obstacles
+        scroll = self.scroll_px
+        p_left = geometry.player_x
+        p_right = p_left + geometry.player_w
+        p_top = int(self.player_top)
+        p_bottom = p_top + geometry.player_h
+        ground_y = geometry.ground_y
+        low_key, high_key = geometry.obstacle_height_keys[0], geometry.obstacle_height_keys[-1]
+        player_mask = geometry.player_mask
+
+        index = pool.scored_count
+        while index < pool.count:
+            slot = (pool.head + index) % pool.capacity
+            o_left = pool.world_x[slot] - scroll
+            if o_left + pool.width[slot] < p_left:
+                if index == pool.scored_count: # 只依序計分，維持與生成順序相同的亂數使用順序
+                    height_key = pool.height_key[slot]
+                    if height_key == low_key: self.score += self.rng.randint(3, 5)
+                    elif height_key == high_key: self.score += self.rng.randint(6, 8)
+                    pool.scored_count += 1
+            elif o_left >= p_right:
+                break
+            elif ground_y - pool.height[slot] < p_bottom and ground_y > p_top:
+                if player_mask is None:
+                    return True
+                offset = (int(o_left) - p_left, ground_y - pool.height[slot] - p_top)
+                if player_mask.overlap(geometry.obstacle_masks[pool.height_key[slot]], offset):
+                    return True
+            index += 1
+        return False
+
+    def interpolated_player_top(self, alpha):
+        return self.prev_player_top + (self.player_top - self.prev_player_top) * alpha
+
+    def interpolated_scroll(self, alpha):
+        return self.prev_scroll_px + (self.scroll_px - self.prev_scroll_px) * alpha
+
+    def result(self):
+        return {'score': self.score, 'final_mileage': self.current_mileage, 'reason': self.game_over_reason}
+
+
+def _legacy_update_obstacles(obstacles, move_px, geometry, player_top, rng):
+    """舊版 (每步重建 list、以 dict 存取、另做一次完整碰撞檢查) 的障礙物更新，僅供基準測試比較。"""
+    player_left = geometry.player_x
+    low_key, high_key = geometry.obstacle_height_keys[0], geometry.obstacle_height_keys[-1]
+    remaining = []
+    score = 0
+    for obs in obstacles:
+        obs['x'] -= move_px
+        if not obs['scored'] and obs['x'] + obs['width'] < player_left:
+            if obs['height_key'] == low_key: score += rng.randint(3, 5)
+            elif obs['height_key'] == high_key: score += rng.randint(6, 8)
+            obs['scored'] = True
+        if obs['x'] + obs['width'] > 0:
+            remaining.append(obs)
+    p_right = player_left + geometry.player_w
+    p_top = int(player_top)
+    p_bottom = p_top + geometry.player_h
+    collided = False
+    for obs in remaining:
+        o_left = int(obs['x'])
+        if o_left < p_right and o_left + obs['width'] > player_left:
+            if geometry.ground_y - obs['height'] < p_bottom and geometry.ground_y > p_top:
+                collided = True
+    return remaining, score, collided
+
+
+def benchmark_obstacle_update(obstacle_counts=(5, 50, 500), steps=60, repeats=50):
+    """
+    量測每步障礙物更新 (移動、計分、碰撞、移除) 的成本，比較 ObstaclePool 與舊版 list/dict 做法。
+    障礙物高度設為 0 以免碰撞提早結束，並平均分布在玩家左側到兩倍螢幕寬之間，
+    量測期間會有障礙物經過玩家、計分並離開畫面。
+
+    回傳:
+        dict: {障礙物數量: {'pool_us', 'legacy_us'}} (每步微秒)
+    """
+    import time
+    geometry = GameGeometry(screen_width=800, ground_y=510, player_x=80, player_size=(117, 117),
+                            obstacle_sizes={50: (40, 0), 75: (48, 0)})
+
+    class BenchmarkSimulation(GameSimulation):
+        OBSTACLE_INITIAL_SPAWN_TIME_AVG_MS = float('inf') # 不生成新障礙物，只量測既有的
+
+    results = {}
+    for count in obstacle_counts:
+        spacing = (geometry.screen_width * 2 - geometry.player_x) / count
+        positions = [geometry.player_x // 2 + i * spacing for i in range(count)]
+        pool_sec = legacy_sec = 0.0
+        for rep in range(repeats):
+            sim = BenchmarkSimulation(geometry, 10 ** 9, rng=random.Random(rep))
+            sim.obstacles = ObstaclePool(max(GameSimulation.OBSTACLE_POOL_CAPACITY, count))
+            for i, x in enumerate(positions):
+                key = geometry.obstacle_height_keys[i % 2]
+                sim.obstacles.push(x, *geometry.obstacle_sizes[key], key)
+            start = time.perf_counter()
+            for _ in range(steps):
+                sim.step()
+            pool_sec += time.perf_counter() - start
+
+            rng = random.Random(rep)
+            obstacles = []
+            for i, x in enumerate(positions):
+                key = geometry.obstacle_height_keys[i % 2]
+                width, height = geometry.obstacle_sizes[key]
+                obstacles.append({'x': x, 'width': width, 'height': height, 'height_key': key, 'scored': False})
+            start = time.perf_counter()
+            for _ in range(steps):
+                obstacles, _score, _collided = _legacy_update_obstacles(obstacles, 5, geometry, sim.player_top, rng)
+            legacy_sec += time.perf_counter() - start
+        results[count] = {
+            'pool_us': pool_sec / (steps * repeats) * 1e6,
+            'legacy_us': legacy_sec / (steps * repeats) * 1e6
+        }
+    return results
+
+
+if __name__ == '__main__':
+    print("障礙物更新基準測試 (每步微秒，GameSimulation.step 含玩家與生成邏輯):")
+    print(f"{'障礙物數':>8}{'ObstaclePool':>14}{'舊版 list/dict':>16}")
+    for count, entry in benchmark_obstacle_update().items():
+        print(f"{count:>8}{entry['pool_us']:>14.2f}{entry['legacy_us']:>16.2f}")
@@ -0,0 +1,212 @@
+# RandomGenerate/SPI_v2/gpu_renderer.py
+"""
+以 SDL2 Renderer / Texture (pygame._sdl2.video) 繪製 HdmiGameEngine 畫面的 GPU 後端。
+
+- 玩家、障礙物、背景與視差層在第一次使用時上傳成 Texture，之後每幀只做 renderer copy。
+- 文字快取與 HUD 字形表的 Surface 同樣以 LRU 方式對應到 Texture，不會每幀重新上傳。
+- 文字畫面 (待機、倒數、結束) 仍以軟體 Surface 繪製，送出時以一張串流 Texture 更新後顯示。
+- 沒有 GPU (或加速 Renderer 建立失敗) 時自動改用 SDL 的軟體 Renderer，可在任何機器上執行與測試。
+
+命令列執行會以 SDL dummy 驅動比較 'full'、'dirty' 與 'gpu' 三種繪圖模式的幀時間:
+    python gpu_renderer.py [幀數]
+"""
+from collections import OrderedDict
+import time
+
+import pygame
+from pygame._sdl2 import video
+from pygame._sdl2.sdl2 import error as SDLError
+
+RENDERER_ERRORS = (pygame.error, SDLError) # _sdl2 的例外不是 pygame.error 的子類別
+
+
+class GpuPresenter:
+    """持有 SDL2 視窗與 Renderer，負責 Surface → Texture 的快取與每幀繪製。"""
+
+    TEXTURE_CACHE_SIZE = 256 # 非常駐 (文字等) Texture 的 LRU 上限
+
+    def __init__(self, size, title, fullscreen=True, prefer_accelerated=True, vsync=False):
+        """
+        參數:
+            size (tuple): 邏輯解析度 (寬, 高)；實際輸出解析度不同時由 Renderer 縮放。
+            title (str): 視窗標題。
+            fullscreen (bool): 是否以桌面 (原生) 解析度全螢幕，不切換顯示模式。
+            prefer_accelerated (bool): 先嘗試硬體加速 Renderer，失敗再改用軟體 Renderer。
+            vsync (bool): present() 是否等待垂直同步。
+        例外:
+            pygame.error: 連軟體 Renderer 都無法建立時拋出，由呼叫端改用軟體繪圖模式。
+        """
+        self.size = tuple(size)
+        self.window = video.Window(title, size=self.size, fullscreen_desktop=fullscreen)
+        self.renderer = None
+        self.accelerated = False
+        last_error = None
+        for accelerated in ((1, 0) if prefer_accelerated else (0,)):
+            try:
+                self.renderer = video.Renderer(self.window, accelerated=accelerated, vsync=vsync)
+                self.accelerated = bool(accelerated)
+                break
+            except RENDERER_ERRORS as e:
+                last_error = e
+                print(f"GpuPresenter: 無法建立{'硬體加速' if accelerated else '軟體'} Renderer: {e}")
+        if self.renderer is None:
+            self.window.destroy()
+            raise pygame.error(f"無法建立 SDL Renderer: {last_error}")
+        self.renderer.logical_size = self.size
+        self.renderer.draw_color = (0, 0, 0, 255)
+
+        self._static_textures = {}            # 常駐 Surface (精靈、背景) → Texture
+        self._textures = OrderedDict()        # 其他 Surface (文字、疊加層) → Texture，LRU
+        self._screen_texture = None           # 文字畫面使用的串流 Texture
+        self.uploads = 0
+        self.copies = 0
+        print(f"GpuPresenter: 使用{'硬體加速' if self.accelerated else '軟體'} Renderer，"
+              f"邏輯解析度 {self.size[0]}x{self.size[1]}，輸出 {self.window.size[0]}x{self.window.size[1]}。")
+
+    def set_logical_size(self, size):
+        """改變邏輯解析度 (render scale 調整)；舊的 Texture 全部丟棄，需重新 upload_static。"""
+        self.size = tuple(size)
+        self.renderer.logical_size = self.size
+        self._static_textures.clear()
+        self._textures.clear()
+        self._screen_texture = None
+
+    def upload_static(self, surfaces):
+        """預先上傳常駐 Surface (例如玩家、障礙物、背景層)，之後不受 LRU 淘汰。"""
+        for surface in surfaces:
+            if surface not in self._static_textures:
+                self._static_textures[surface] = self._upload(surface)
+
+    def _upload(self, surface):
+        self.uploads += 1
+        return video.Texture.from_surface(self.renderer, surface)
+
+    def texture_for(self, surface):
+        texture = self._static_textures.get(surface)
+        if texture is not None:
+            return texture
+        texture = self._textures.get(surface)
+        if texture is not None:
+            self._textures.move_to_end(surface)
+            return texture
+        texture = self._upload(surface)
+        self._textures[surface] = texture
+        if len(self._textures) > self.TEXTURE_CACHE_SIZE:
+            self._textures.popitem(last=False)
+        return texture
+
+    def begin_frame(self):
+        self.renderer.clear()
+
+    def draw(self, surface, position):
+        """以 Texture 複製繪製 surface；position 可為 Rect 或 (x, y)。"""
+        texture = self.texture_for(surface)
+        if isinstance(position, pygame.Rect):
+            texture.draw(dstrect=position)
+        else:
+            texture.draw(dstrect=(int(position[0]), int(position[1]), texture.width, texture.height))
+        self.copies += 1
+
+    def draw_parallax(self, background, offset_y=0):
+        """繪製 ParallaxBackground 的底圖與各捲動層 (每層最多兩次複製)；offset_y 為背景上緣的 y (對戰模式的下方跑道)。"""
+        self.draw(background.base_surface, (0, offset_y))
+        for layer in background.layers:
+            x = -int(layer.offset)
+            self.draw(layer.strip, (x, layer.y + offset_y))
+            if x < 0:
+                self.draw(layer.strip, (x + layer.strip.get_width(), layer.y + offset_y))
+
+    def present(self):
+        self.renderer.present()
+
+    def present_surface(self, surface):
+        """把整張軟體 Surface (文字畫面) 更新到串流 Texture 後顯示。"""
+        if self._screen_texture is None or (self._screen_texture.width, self._screen_texture.height) != surface.get_size():
+            self._screen_texture = video.Texture(self.renderer, surface.get_size(), streaming=True)
+        self._screen_texture.update(surface)
+        self.uploads += 1
+        self.renderer.clear()
+        self._screen_texture.draw()
+        self.renderer.present()
+
+    def get_stats(self):
+        return {
+            'accelerated': self.accelerated,
+            'static_textures': len(self._static_textures),
+            'cached_textures': len(self._textures),
+            'uploads': self.uploads,
+            'copies': self.copies
+        }
+
+    def destroy(self):
+        self._static_textures.clear()
+        self._textures.clear()
+        self._screen_texture = None
+        self.renderer = None
+        self.window.destroy()
+
+
+def compare_render_modes(frames=600, screen_size=(800, 600), background_style='parallax',
+                         modes=('full', 'dirty', 'gpu'), seed=1):
+    """
+    以相同的模擬 (固定種子、每 40 步自動跳躍) 依序測量各繪圖模式每幀 _draw_game_frame 的耗時。
+
+    回傳:
+        dict: {模式: {'frames', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'}}
+    """
+    import random
+    from hdmi_game_engine import HdmiGameEngine
+    from game_simulation import GameSimulation
+
+    results = {}
+    for mode in modes:
+        engine = HdmiGameEngine(*screen_size, render_mode=mode, background_style=background_style)
+        if engine.render_mode != mode:
+            print(f"compare_render_modes: 模式 '{mode}' 無法使用，略過。")
+            engine.cleanup()
+            continue
+        engine._reset_game(200)
+        engine.simulation.rng = random.Random(seed)
+        engine.dirty_renderer.invalidate()
+        frame_times = []
+        for frame in range(frames):
+            sim = engine.simulation
+            if not sim.game_active:
+                engine._reset_game(200)
+                engine.simulation.rng = random.Random(seed + frame)
+                sim = engine.simulation
+            if sim.steps % 40 == 0:
+                sim.request_jump()
+            sim.step()
+            engine._sync_from_simulation()
+            start = time.perf_counter()
+            engine._draw_game_frame(0.5)
+            frame_times.append((time.perf_counter() - start) * 1000)
+            pygame.event.pump()
+        ordered = sorted(frame_times)
+        results[mode] = {
+            'frames': len(frame_times),
+            'mean_ms': sum(frame_times) / len(frame_times),
+            'p50_ms': ordered[len(ordered) // 2],
+            'p95_ms': ordered[int(len(ordered) * 0.95)],
+            'p99_ms': ordered[int(len(ordered) * 0.99)]
+        }
+        if engine.gpu_presenter:
+            results[mode].update(engine.gpu_presenter.get_stats())
+        engine.cleanup()
+    return results
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    frame_count = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    comparison = compare_render_modes(frame_count)
+    print(f"\n{'模式':<8}{'平均':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms/幀，SDL 驅動: {os.environ['SDL_VIDEODRIVER']})")
+    for mode, entry in comparison.items():
+        print(f"{mode:<8}{entry['mean_ms']:>9.3f}{entry['p50_ms']:>9.3f}{entry['p95_ms']:>9.3f}{entry['p99_ms']:>9.3f}")
+    if 'gpu' in comparison:
+        print(f"gpu: {'硬體加速' if comparison['gpu']['accelerated'] else '軟體'} Renderer，"
+              f"上傳 {comparison['gpu']['uploads']} 次 Texture，複製 {comparison['gpu']['copies']} 次。")
+    pygame.quit()
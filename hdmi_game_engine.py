@@ -1,7 +1,27 @@
 import pygame
-import random
-import sys
+import math
 import os
+import random
+import time
+
+from dirty_renderer import DirtyRectRenderer
+from text_cache import TextRenderCache, GlyphAtlas
+from parallax_background import ParallaxBackground
+from game_simulation import GameSimulation, GameGeometry, RenderMapping, logical_screen_size
+from frame_profiler import FrameProfiler
+from asset_cache import ScaledAssetCache
+from collision_masks import CollisionMaskCache
+from hdmi_scenes import SceneManager, StandbyScene, MeasuringScene, PreGameScene, GameScene
+from gpu_renderer import GpuPresenter, RENDERER_ERRORS
+from render_scaler import ScaledDisplay, RenderScaleGovernor, choose_native_mode, scaled_render_size
+from session_replay import SessionRecorder, new_session_seed, geometry_matches
+from piezo_input import PiezoInputThread, jump_strength_for_amplitude
+from latency_tracer import InputLatencyTracer
+from frame_pacer import FramePacer, FPS_LEVELS
+from game_modes import GameModeRegistry
+from particle_system import ParticleSystem
+from video_capture import VideoCapture
+from waveform_view import WaveformScene, WaveformBuffer
 
 # SensorHandler 類別的匯入是為了類型提示，實際的實例會由外部傳入
 # from .sensor_handler import SensorHandler # 僅用於類型提示
@@ -13,46 +33,111 @@ class HdmiGameEngine:
     WHITE = (255, 255, 255)
     BLACK = (0, 0, 0)
     GROUND_COLOR = (140, 120, 100)
-    FPS = 60 # HDMI螢幕通常可以跑到更高FPS
-    PLAYER_GRAVITY = 0.6
-    JUMP_STRENGTH = -19
-    OBSTACLE_SPEED_INITIAL = 5.0
+    FPS = 60 # HDMI螢幕通常可以跑到更高FPS (只影響繪圖頻率，遊戲邏輯以 GameSimulation 的固定步長執行)
     INITIAL_MILEAGE_DEFAULT = 350
+    MAX_FRAME_TIME_MS = 250 # 單幀最多補跑的模擬時間，避免長時間卡頓後一次跑太多步
+
+    RENDER_MODE_FULL = 'full'   # 每幀整張重畫並 display.flip()
+    RENDER_MODE_DIRTY = 'dirty' # 只重畫變動區域並 display.update(rects)
+    RENDER_MODE_GPU = 'gpu'     # SDL2 Renderer/Texture 繪製 (無 GPU 時使用 SDL 軟體 Renderer)
 
-    JUMP_BUFFER_DURATION_MS = 180 # 原為 120ms, 增加緩衝時間
+    BACKGROUND_PLAIN = 'plain'       # 原本的白底加地面
+    BACKGROUND_PARALLAX = 'parallax' # 預繪的分層視差背景
 
-    OBSTACLE_INITIAL_SPAWN_TIME_AVG = 120 # 幀
-    OBSTACLE_MIN_SPAWN_TIME_AVG = 60
-    OBSTACLE_SCORE_TO_REACH_MIN_SPAWN_TIME = 1000
-    OBSTACLE_SPAWN_TIME_RANDOM_RANGE = 30
-    OBSTACLE_ABSOLUTE_MIN_SPAWN_TIME = 40
+    HUD_SCORE_LABEL = "價值: "
+    HUD_MILEAGE_LABEL = "情緒: "
+    PROFILER_TOGGLE_KEY = pygame.K_F3 # 切換效能分析疊加層
+    STRIKE_PARTICLES_MIN = 150   # 輕拍 / 鍵盤跳躍的粒子數約在兩者之間
+    STRIKE_PARTICLES_MAX = 2000  # 全力拍擊
+    COLLISION_PARTICLES = 2500
+    COLLISION_EFFECT_MS = 700    # 碰撞後停留播放粒子效果的時間，之後才換到結束畫面
 
     def __init__(self, screen_width=1280, screen_height=720, 
                  player_img_path='player.png', obstacle_img_path='obstacle.png',
                  sensor_handler_instance=None, piezo_jump_threshold=0.1,
-                 led_controller_instance=None):
+                 led_controller_instance=None, render_mode=RENDER_MODE_FULL,
+                 background_style=BACKGROUND_PLAIN, fps=FPS, profiler_enabled=False, profile_dump_dir=None,
+                 profile_keep_files=None, asset_cache_dir=None, native_mode=False, render_scale=1.0, auto_render_scale=False,
+                 min_render_scale=0.5, replay_dir=None, piezo_strength_scaling=False, piezo_full_voltage=1.0, piezo_channels=None,
+                 pixel_collision=False, particle_capacity=0, capture_dir=None, capture_scale=0.5, capture_fps=30,
+                 capture_min_score=0, versus_channel_groups=None, waveform_view=False, waveform_window_sec=3.0,
+                 waveform_full_scale=3.0, fullscreen=True, adaptive_fps=False, fps_levels=FPS_LEVELS):
         """
         初始化 HDMI 遊戲引擎。
         參數:
-            screen_width (int): HDMI 螢幕寬度。
-            screen_height (int): HDMI 螢幕高度。
+            screen_width (int): HDMI 輸出寬度 (native_mode 時僅在無法取得原生模式時使用)。
+            screen_height (int): HDMI 輸出高度。
             player_img_path (str): 玩家圖片檔案路徑。
             obstacle_img_path (str): 障礙物圖片檔案路徑。
             sensor_handler_instance: 可選的 SensorHandler 實例，用於拍擊跳躍。
             piezo_jump_threshold (float): 拍擊跳躍的電壓閾值。
+            piezo_strength_scaling (bool): 依拍擊電壓調整跳躍力道 (閾值 → 0.85 倍，piezo_full_voltage 以上 → 1.2 倍)。
+            piezo_full_voltage (float): 視為全力拍擊的電壓。
+            piezo_channels (sequence, optional): 單人遊戲中拍擊跳躍輪詢的通道名稱；None 為全部。
+                只輪詢一個通道時 ADS1115 改用連續轉換，取樣延遲約一個轉換週期。
             led_controller_instance: 可選的 LedController 實例，用於遊戲中的燈效。
+            render_mode (str): 'full' 為整張重畫，'dirty' 為只重畫變動區域，'gpu' 為 SDL2 Renderer/Texture 繪製。
+            background_style (str): 'plain' 為白底加地面，'parallax' 為分層視差背景。
+            fps (int): 繪圖幀率上限；遊戲速度與此無關。每幀由 FramePacer (睡眠 + 短暫輪詢) 控制間隔。
+            adaptive_fps (bool): 幀工作時間持續超過預算時依 fps_levels 降低目標幀率，有餘裕時再升回。
+            fps_levels (tuple): 自適應時可用的目標幀率，例如 (60, 50, 30)。
+            profiler_enabled (bool): 是否記錄逐階段幀時間 (按 F3 切換疊加層)。
+            profile_dump_dir (str, optional): 每局結束時把分析結果寫入此資料夾。
+            profile_keep_files (int, optional): 資料夾中每種分析結果只保留最新的幾個檔案；None 表示不刪除。
+            asset_cache_dir (str, optional): 縮放後圖片的磁碟快取資料夾；None 表示每次啟動都重新縮放。
+            native_mode (bool): 以 pygame.display.list_modes 選出的原生模式輸出，不切換 HDMI 顯示模式。
+            render_scale (float): 內部繪圖解析度相對於輸出解析度的倍率 (0~1)，送出時放大一次。
+            auto_render_scale (bool): 遊戲幀持續超過預算時，於下一局自動降低 render_scale。
+            min_render_scale (float): 自動調整的最低倍率。
+            replay_dir (str, optional): 每局的種子與輸入記錄 (.spr) 寫入此資料夾，供 session_replay 重播。
+            pixel_collision (bool): 矩形重疊後再以圖片的碰撞遮罩 (pygame.mask) 判斷，忽略圖片的透明 / 背景區域。
+            particle_capacity (int): 跳躍與碰撞粒子效果同時存在的粒子上限；0 表示關閉粒子效果。
+            capture_dir (str, optional): 每局遊戲畫面在背景錄影到此資料夾 (ffmpeg mp4 或圖片序列)；None 表示不錄影。
+            capture_scale (float): 錄影解析度相對於內部繪圖解析度的倍率。
+            capture_fps (int): 錄影幀率。
+            capture_min_score (int): 分數低於此值的局結束後刪除錄影。
+            versus_channel_groups (sequence, optional): 雙人對戰時每位玩家的拍擊通道，例如 (('A0', 'A1'), ('A2', 'A3'))。
+            waveform_view (bool): 測量情緒畫面改為即時波形 (各通道捲動波形、峰值與情緒指數)；需要 SensorHandler。
+            waveform_window_sec (float): 波形顯示最近幾秒的取樣。
+            waveform_full_scale (float): 波形上緣對應的電壓。
+            fullscreen (bool): 以全螢幕輸出；False 時開一般視窗 (開發與基準測試使用，dummy 驅動的全螢幕固定為桌面大小)。
         """
         print("正在初始化 HdmiGameEngine...")
         if not pygame.get_init():
             pygame.init()
             print("Pygame 在 HdmiGameEngine 中初始化。")
         
-        # 建議用較低解析度全螢幕（例如 1280x720）
-        self.screen_width = screen_width
-        self.screen_height = screen_height
-        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height), pygame.FULLSCREEN)
-        pygame.display.set_caption("互動式解壓小遊戲")
-        self.clock = pygame.time.Clock()
+        # 輸出使用原生模式，遊戲畫在較低的內部解析度 (screen_width x screen_height) 再放大
+        self.output_size = choose_native_mode((screen_width, screen_height)) if native_mode else (screen_width, screen_height)
+        self.render_scale = render_scale
+        self.screen_width, self.screen_height = scaled_render_size(self.output_size, render_scale)
+        self.player_img_path = player_img_path
+        self.obstacle_img_path = obstacle_img_path
+        if render_mode not in (self.RENDER_MODE_FULL, self.RENDER_MODE_DIRTY, self.RENDER_MODE_GPU):
+            print(f"HdmiGameEngine 警告: 未知的繪圖模式 '{render_mode}'，改用 '{self.RENDER_MODE_FULL}'。")
+            render_mode = self.RENDER_MODE_FULL
+        self.gpu_presenter = None
+        if render_mode == self.RENDER_MODE_GPU:
+            try:
+                # 隱藏的 1x1 顯示模式只提供 convert() 所需的像素格式，實際畫面由 GpuPresenter 的視窗顯示
+                pygame.display.set_mode((1, 1), pygame.HIDDEN)
+                self.gpu_presenter = GpuPresenter((self.screen_width, self.screen_height), "互動式解壓小遊戲")
+                self.output_size = self.gpu_presenter.window.size # 由 Renderer 放大到視窗 (桌面) 解析度
+            except RENDERER_ERRORS as e:
+                print(f"HdmiGameEngine 警告: 無法使用 GPU 繪圖 ({e})，改用 '{self.RENDER_MODE_FULL}'。")
+                render_mode = self.RENDER_MODE_FULL
+        self.display_surface = None
+        if self.gpu_presenter is None:
+            self.display_surface = pygame.display.set_mode(self.output_size, pygame.FULLSCREEN if fullscreen else 0)
+            pygame.display.set_caption("互動式解壓小遊戲")
+        self._create_render_surface()
+        self.fps = fps
+        self.profiler = FrameProfiler(enabled=profiler_enabled, target_fps=fps)
+        self.profile_dump_dir = profile_dump_dir
+        self.profile_keep_files = profile_keep_files
+        self.profiler_font = pygame.font.Font(None, 22)
+        self.render_scale_governor = RenderScaleGovernor(render_scale, fps, min_render_scale) if auto_render_scale else None
+        self.frame_pacer = FramePacer(fps, fps_levels, adaptive=adaptive_fps, on_target_change=self._on_target_fps_change)
 
         self.sensor_handler = sensor_handler_instance
         self.piezo_jump_threshold = piezo_jump_threshold
@@ -61,6 +146,12 @@ class HdmiGameEngine:
         else:
             print("HdmiGameEngine: 未提供有效 SensorHandler，拍擊跳躍功能將不可用。")
             self.sensor_handler = None
+        self.piezo_strength_scaling = piezo_strength_scaling
+        self.piezo_full_voltage = piezo_full_voltage
+        # 拍擊由背景執行緒輪詢並以 pygame 事件送入遊戲迴圈，遊戲迴圈內不做 I2C 讀取
+        self.piezo_input = (PiezoInputThread(self.sensor_handler, piezo_jump_threshold, channel_names=piezo_channels)
+                            if self.sensor_handler else None)
+        self.latency_tracer = InputLatencyTracer() # 輸入 → 模擬 → 送出畫面的逐階段延遲
         
         self.led_controller = led_controller_instance
         if self.led_controller and hasattr(self.led_controller, 'is_on') and self.led_controller.is_on:
@@ -69,60 +160,143 @@ class HdmiGameEngine:
             print("HdmiGameEngine: 未提供有效 LedController，遊戲中 LED 燈效將不可用。")
             self.led_controller = None
 
-        self._load_game_assets(player_img_path, obstacle_img_path)
-        self._initialize_game_state_vars()
+        self.render_mode = render_mode
+        self.background_style = background_style
+        self.asset_cache = ScaledAssetCache(asset_cache_dir)
+        self.pixel_collision = pixel_collision
+        self.collision_mask_cache = CollisionMaskCache() # 各局與各內部解析度共用
+        self.particle_capacity = particle_capacity
+        if capture_dir and self.gpu_presenter:
+            # GPU 模式的畫面在 Texture 上，讀回會阻塞 Renderer，不支援錄影
+            print("HdmiGameEngine 警告: 'gpu' 繪圖模式不支援錄影，已關閉錄影。")
+            capture_dir = None
+        self.capture_dir = capture_dir
+        self.capture_scale = capture_scale
+        self.capture_fps = capture_fps
+        self.capture_min_score = capture_min_score
+        self.video_capture = None
+        self.versus_channel_groups = versus_channel_groups
+        self.game_modes = GameModeRegistry() # 只讀取 *_mode.py 的宣告，選用時才 import
+        self.waveform_buffer = None
+        self.waveform_window_sec = waveform_window_sec
+        self.waveform_full_scale = waveform_full_scale
+        if waveform_view and self.sensor_handler:
+            # 測量執行緒把每筆取樣寫入環形緩衝區，測量畫面每幀從中取出最近的窗口繪製
+            self.waveform_buffer = WaveformBuffer(list(self.sensor_handler.adc_channels))
+            self.sensor_handler.sample_sink = self.waveform_buffer
+        self.effects_dt_ms = 0.0 # 本幀經過的時間 (粒子與錄影取樣使用)
+        # 模擬固定在與輸出同長寬比、高度固定的邏輯解析度上，難度不隨解析度與 render scale 改變
+        self.logical_size = logical_screen_size(self.output_size)
+        self.logical_images = None
+        self._build_resolution_assets()
+        self.render_stats = {'frames': 0, 'pixels_pushed': 0, 'last_frame_pixels': 0}
+        self.game_result = None # 一局流程 (開始前序列 → 遊戲 → 結束畫面) 完成後的結果
+        self.replay_dir = replay_dir
+        self.session_seed = None
+        self.session_recorder = None
+        self.scene_manager = SceneManager(self)
+        print(f"HdmiGameEngine: 繪圖模式 '{self.render_mode}'，內部解析度 {self.screen_width}x{self.screen_height} "
+              f"(render scale {self.render_scale:g})，輸出 {self.output_size[0]}x{self.output_size[1]}。")
         self.is_initialized = True
         print("HdmiGameEngine 初始化完畢。")
 
-    def _load_game_assets(self, player_img_path, obstacle_img_path):
-        print("正在載入遊戲資源 (HDMI)...")
-        scale_factor = 1.5  # 放大 1.5 倍
+    def _create_render_surface(self):
+        """
+        建立遊戲繪圖用的 self.screen 與送出介面 self.display:
+        內部解析度等於輸出時直接畫在顯示 Surface 上；否則畫在內部 Surface，送出時放大。
+        """
+        render_size = (self.screen_width, self.screen_height)
+        if self.gpu_presenter:
+            self.gpu_presenter.set_logical_size(render_size)
+            self.screen = pygame.Surface(render_size).convert() # 文字畫面的軟體繪圖面
+            self.display = None
+        elif render_size == tuple(self.output_size):
+            self.screen = self.display_surface
+            self.display = pygame.display
+        else:
+            self.screen = pygame.Surface(render_size).convert()
+            self.display = ScaledDisplay(self.screen, self.display_surface)
 
-        # 玩家圖片
-        try:
-            player_image_orig = pygame.image.load(player_img_path).convert_alpha()
-            orig_w, orig_h = player_image_orig.get_width(), player_image_orig.get_height()
-            target_h = int(self.screen_height * 0.13 * scale_factor)
-            scale_ratio = target_h / orig_h
-            target_w = int(orig_w * scale_ratio)
-            self.player_image = pygame.transform.smoothscale(player_image_orig, (target_w, target_h))
-        except Exception as e:
-            print(f"警告：無法載入玩家圖片 '{player_img_path}': {e}。將使用預留位置。")
-            target_h = int(self.screen_height * 0.13 * scale_factor)
-            target_w = int(target_h * 0.75)
-            self.player_image = pygame.Surface((target_w, target_h), pygame.SRCALPHA)
-            pygame.draw.rect(self.player_image, (0,200,0), self.player_image.get_rect())
+    def _build_resolution_assets(self):
+        """載入並建立與內部解析度相關的資源 (圖片、字型、背景、dirty-rect 繪圖器與 GPU Texture)。"""
+        self._load_game_assets(self.player_img_path, self.obstacle_img_path)
+        self._initialize_game_state_vars()
+        self.parallax_background = None
+        self.game_background = self._build_game_background()
+        self.dirty_renderer = DirtyRectRenderer(self.screen, self.game_background, self.display)
+        self.particles = None
+        if self.particle_capacity:
+            # 粒子大小與速度隨內部解析度縮放，不同 render scale 下看起來相同
+            self.particles = ParticleSystem(self.particle_capacity, particle_size=max(2, self.screen_height // 100),
+                                            gravity=self.screen_height * 2.0)
+        if self.gpu_presenter:
+            static_surfaces = [self.player_image, self.game_background] + list(self.obstacle_images_scaled.values())
+            if self.particles is not None:
+                static_surfaces += self.particles.sprites
+            if self.parallax_background:
+                static_surfaces += [layer.strip for layer in self.parallax_background.layers]
+            self.gpu_presenter.upload_static(static_surfaces)
+
+    def _apply_render_scale(self, render_scale):
+        """改變內部繪圖解析度並重建相關資源 (只在兩局之間呼叫；模擬在邏輯解析度上進行，難度不變)。"""
+        start = time.perf_counter()
+        self.render_scale = render_scale
+        self.screen_width, self.screen_height = scaled_render_size(self.output_size, render_scale)
+        self._create_render_surface()
+        self._build_resolution_assets()
+        print(f"HdmiGameEngine: render scale 調整為 {render_scale:g}，內部解析度 {self.screen_width}x{self.screen_height}，"
+              f"重建耗時 {(time.perf_counter() - start) * 1000:.1f} ms。")
+
+    def record_frame_work(self, scene, work_ms):
+        """SceneManager 每幀回報不含幀間隔等待的工作時間；遊戲幀交給 render scale 自動調整。"""
+        if self.render_scale_governor and scene.name == 'game':
+            self.render_scale_governor.record(work_ms)
+
+    def pace_frame(self, work_ms):
+        """SceneManager 每幀最後呼叫，等到下一幀的時間 (取代 clock.tick)。fps 設為 0 (重播、基準測試) 時不等待。"""
+        pacer = self.frame_pacer
+        if pacer.max_fps != self.fps:
+            pacer.set_max_fps(self.fps)
+            if self.fps:
+                self._on_target_fps_change(self.fps)
+                if self.render_scale_governor:
+                    self.render_scale_governor.set_target_fps(self.fps)
+        pacer.wait(work_ms)
+
+    def _on_target_fps_change(self, target_fps):
+        """
+        目標幀率改變時同步分析器的掉幀判斷。
+        render scale 自動調整的預算固定為最高幀率 (self.fps)，不跟隨自適應降級 (見 frame_pacer 模組說明)。
+        """
+        self.profiler.set_target_fps(target_fps)
 
-        # 障礙物圖片
-        try:
-            obstacle_image_orig = pygame.image.load(obstacle_img_path).convert_alpha()
-            orig_w, orig_h = obstacle_image_orig.get_width(), obstacle_image_orig.get_height()
-            self.obstacle_height_options_scaled = {
-                50: int(self.screen_height * 0.07 * scale_factor),
-                75: int(self.screen_height * 0.12 * scale_factor)
-            }
-            self.obstacle_images_scaled = {}
-            for key, target_h in self.obstacle_height_options_scaled.items():
-                scale_ratio = target_h / orig_h
-                target_w = int(orig_w * scale_ratio)
-                self.obstacle_images_scaled[key] = pygame.transform.smoothscale(obstacle_image_orig, (target_w, target_h))
-            self.obstacle_original_height_keys = list(self.obstacle_height_options_scaled.keys())
-        except Exception as e:
-            print(f"警告：無法載入障礙物圖片 '{obstacle_img_path}': {e}。將使用預留位置。")
-            self.obstacle_height_options_scaled = {
-                50: int(self.screen_height * 0.07 * scale_factor),
-                75: int(self.screen_height * 0.12 * scale_factor)
-            }
-            self.obstacle_images_scaled = {}
-            self.obstacle_original_height_keys = list(self.obstacle_height_options_scaled.keys())
-            for key, target_h in self.obstacle_height_options_scaled.items():
-                target_w = int(target_h * 0.5)
-                surf = pygame.Surface((target_w, target_h), pygame.SRCALPHA)
-                pygame.draw.rect(surf, (200,0,0), surf.get_rect())
-                self.obstacle_images_scaled[key] = surf
-        print("圖片資源載入並縮放完成 (HDMI)。")
+    def _load_game_assets(self, player_img_path, obstacle_img_path):
+        print("正在載入遊戲資源 (HDMI)...")
+        assets_start = time.perf_counter()
+        resolution = (self.screen_width, self.screen_height)
+        self.player_image, self.obstacle_images_scaled = self._load_sprite_images(player_img_path, obstacle_img_path, resolution)
+        self.obstacle_height_options_scaled = {key: image.get_height() for key, image in self.obstacle_images_scaled.items()}
+        self.obstacle_original_height_keys = list(self.obstacle_height_options_scaled.keys())
+        if self.logical_images is None:
+            # 模擬使用的邏輯解析度與 render scale 無關，邏輯尺寸的圖片 (幾何與碰撞遮罩) 只載入一次
+            if resolution == self.logical_size:
+                self.logical_images = (self.player_image, self.obstacle_images_scaled)
+            else:
+                self.logical_images = self._load_sprite_images(player_img_path, obstacle_img_path, self.logical_size)
+        # 碰撞遮罩 (邏輯尺寸，每個尺寸只計算一次)
+        self.player_mask = self.obstacle_masks = None
+        if self.pixel_collision:
+            logical_player, logical_obstacles = self.logical_images
+            self.player_mask = self.collision_mask_cache.mask_for(player_img_path, logical_player)
+            self.obstacle_masks = {key: self.collision_mask_cache.mask_for(obstacle_img_path, image)
+                                   for key, image in logical_obstacles.items()}
+        images_ms = (time.perf_counter() - assets_start) * 1000
+        cache_stats = self.asset_cache.get_stats()
+        print(f"圖片資源載入並縮放完成 (HDMI)，{images_ms:.1f} ms "
+              f"(快取命中 {cache_stats['hits']}，重新縮放 {cache_stats['misses']})。")
 
         # 字型
+        fonts_start = time.perf_counter()
         try:
             font_path = None
             font_size_small = max(18, int(self.screen_height / 30))
@@ -148,380 +322,587 @@ class HdmiGameEngine:
             self.font_medium = pygame.font.Font(None, 30)
             self.font_large = pygame.font.Font(None, 48)
 
+        # 文字繪製快取與 HUD 數字字形表
+        self.text_cache = TextRenderCache()
+        self.hud_atlas = GlyphAtlas(self.font_small, self.BLACK, labels=(self.HUD_SCORE_LABEL, self.HUD_MILEAGE_LABEL))
+        fonts_ms = (time.perf_counter() - fonts_start) * 1000
+        print(f"HdmiGameEngine: 資源載入耗時 {images_ms + fonts_ms:.1f} ms (圖片 {images_ms:.1f} ms，字型 {fonts_ms:.1f} ms)。")
+
+    def _load_sprite_images(self, player_img_path, obstacle_img_path, resolution):
+        """
+        依畫面高度縮放玩家與障礙物圖片 (經 ScaledAssetCache)，無法載入時使用預留位置。
+        回傳:
+            tuple: (玩家 Surface, {高度鍵: 障礙物 Surface})
+        """
+        scale_factor = 1.5  # 放大 1.5 倍
+        screen_height = resolution[1]
+
+        # 玩家圖片
+        target_h = int(screen_height * 0.13 * scale_factor)
+        try:
+            player_image = self.asset_cache.load_scaled(player_img_path, [target_h], resolution, scale_factor)[0]
+        except Exception as e:
+            print(f"警告：無法載入玩家圖片 '{player_img_path}': {e}。將使用預留位置。")
+            target_w = int(target_h * 0.75)
+            player_image = pygame.Surface((target_w, target_h), pygame.SRCALPHA)
+            pygame.draw.rect(player_image, (0,200,0), player_image.get_rect())
+
+        # 障礙物圖片
+        obstacle_heights = {
+            50: int(screen_height * 0.07 * scale_factor),
+            75: int(screen_height * 0.12 * scale_factor)
+        }
+        try:
+            scaled = self.asset_cache.load_scaled(obstacle_img_path, list(obstacle_heights.values()), resolution, scale_factor)
+            obstacle_images = dict(zip(obstacle_heights.keys(), scaled))
+        except Exception as e:
+            print(f"警告：無法載入障礙物圖片 '{obstacle_img_path}': {e}。將使用預留位置。")
+            obstacle_images = {}
+            for key, target_h in obstacle_heights.items():
+                target_w = int(target_h * 0.5)
+                surf = pygame.Surface((target_w, target_h), pygame.SRCALPHA)
+                pygame.draw.rect(surf, (200,0,0), surf.get_rect())
+                obstacle_images[key] = surf
+        return player_image, obstacle_images
+
     def _initialize_game_state_vars(self):
         """初始化遊戲過程中會變動的狀態變數。"""
-        self.player_y_velocity = 0
         self.player_x_start_offset = int(self.screen_width * 0.1)
         self.player_rect = self.player_image.get_rect()
         self.player_rect.x = self.player_x_start_offset
         self.ground_height = self.screen_height - int(self.screen_height * 0.15)
         self.player_rect.bottom = self.ground_height
-        self.is_jumping = False
-        self.jump_buffer_expires_at = 0 # 跳躍緩衝計時器，儲存過期時間戳
-        self.obstacles = []
+        self.simulation = None
+        self.render_mapping = None
+        self.sim_accumulator_ms = 0.0
         self.score = 0
-        self.obstacle_speed = self.OBSTACLE_SPEED_INITIAL
-        self.last_speed_increase_milestone = 0
-        self.current_mileage = self.INITIAL_MILEAGE_DEFAULT # 會由 run_game 傳入的值覆寫
-        self.obstacle_timer = 0
-        self.obstacle_spawn_time = self.OBSTACLE_INITIAL_SPAWN_TIME_AVG
+        self.current_mileage = self.INITIAL_MILEAGE_DEFAULT # 會由 start_game 傳入的值覆寫
         self.game_active = False
         self.game_over_reason = None # e.g., "collision", "mileage_zero", "quit_event"
-        self.player_speed = 6.0  # 初始速度，可自行調整
-        self.player_speed_max = 20.0  # 最大速度
 
-    def _reset_game(self, initial_mileage_val):
-        """重置遊戲狀態以開始新的一局。"""
+    def _build_game_geometry(self):
+        """依邏輯解析度與邏輯尺寸的圖片建立 GameSimulation 使用的幾何資訊 (與 render scale 無關)。"""
+        logical_width, logical_height = self.logical_size
+        logical_player, logical_obstacles = self.logical_images
+        return GameGeometry(
+            screen_width=logical_width,
+            ground_y=logical_height - int(logical_height * 0.15),
+            player_x=int(logical_width * 0.1),
+            player_size=logical_player.get_size(),
+            obstacle_sizes={key: image.get_size() for key, image in logical_obstacles.items()},
+            player_mask=self.player_mask,
+            obstacle_masks=self.obstacle_masks,
+            screen_height=logical_height
+        )
+
+    def _reset_game(self, initial_mileage_val, seed=None, geometry=None):
+        """
+        重置遊戲狀態以開始新的一局。
+        seed 為 None 時產生新的種子 (記錄在 self.session_seed)；重播時傳入錄製的種子與幾何資訊。
+        """
         self._initialize_game_state_vars()
         self.current_mileage = initial_mileage_val
-        if not self.obstacles: 
-            self.obstacles.append(self._create_obstacle())
+        self.session_seed = new_session_seed() if seed is None else seed
+        if geometry is None:
+            geometry = self._build_game_geometry()
+        self.simulation = GameSimulation(geometry, initial_mileage_val, rng=random.Random(self.session_seed))
+        self.render_mapping = RenderMapping(geometry, self.screen_height, self.ground_height)
+        self.player_rect.x = self.render_mapping.player_x
         self.game_active = True
         self.game_over_reason = None
         pygame.event.clear()
         print(f"HDMI 遊戲已重置，初始情緒: {initial_mileage_val}")
 
-    def _create_obstacle(self):
-        """創建新的障礙物。"""
-        original_height_key = random.choice(self.obstacle_original_height_keys)
-        current_obstacle_image = self.obstacle_images_scaled[original_height_key]
-        obstacle_rect = current_obstacle_image.get_rect()
-        obstacle_rect.x = self.screen_width
-        obstacle_rect.bottom = self.ground_height
-        return {"rect": obstacle_rect, "height_key": original_height_key, "scored": False, "image": current_obstacle_image}
+    def _sync_from_simulation(self):
+        """將模擬結果同步到引擎 (HUD、結束畫面與回傳結果使用)。"""
+        sim = self.simulation
+        self.score = sim.score
+        self.current_mileage = sim.current_mileage
+        self.game_active = sim.game_active
+        self.game_over_reason = sim.game_over_reason
+
+    def _collect_game_sprites(self, alpha):
+        """依插值係數 alpha (0~1) 計算本幀要繪製的 (Surface, 位置) 列表。"""
+        sim = self.simulation
+        mapping = self.render_mapping
+        self.player_rect.bottom = mapping.player_bottom(sim, alpha)
+        sprites = [(self.player_image, self.player_rect)]
+        obstacle_y = {key: self.ground_height - image.get_height() for key, image in self.obstacle_images_scaled.items()}
+        pool = sim.obstacles
+        for index in range(pool.count):
+            slot = pool.slot(index)
+            height_key = pool.height_key[slot]
+            sprites.append((self.obstacle_images_scaled[height_key], (mapping.obstacle_x(sim, slot, alpha), obstacle_y[height_key])))
+        return sprites
+
+    def _build_game_background(self):
+        """
+        預先繪製遊戲中的靜態背景 (白底與地面)。
+        使用視差背景時回傳其靜態底圖，捲動層於每幀另外繪製。
+        """
+        if self.background_style == self.BACKGROUND_PARALLAX:
+            self.parallax_background = ParallaxBackground.for_resolution(self.screen.get_size(), self.ground_height, self.GROUND_COLOR)
+            return self.parallax_background.base_surface
+        background = pygame.Surface(self.screen.get_size()).convert()
+        background.fill(self.WHITE)
+        pygame.draw.rect(background, self.GROUND_COLOR, (0, self.ground_height, self.screen_width, self.screen_height - self.ground_height))
+        return background
+
+    def _render_stats_surfaces(self):
+        """由 HUD 字形表組合分數和剩餘里程，回傳 (Surface, 位置) 列表，不呼叫 font.render。"""
+        return (self.hud_atlas.layout(self.HUD_SCORE_LABEL, self.score, (10, int(self.screen_height * 0.08)))
+                + self.hud_atlas.layout(self.HUD_MILEAGE_LABEL, self.current_mileage, (10, int(self.screen_height * 0.02))))
 
     def _display_stats_on_hdmi(self):
         """在 HDMI 螢幕上顯示分數和剩餘里程。"""
-        score_text = self.font_small.render(f"價值: {self.score}", True, self.BLACK)
-        self.screen.blit(score_text, (10, int(self.screen_height * 0.08)))
-        mileage_text = self.font_small.render(f"情緒: {self.current_mileage}", True, self.BLACK)
-        self.screen.blit(mileage_text, (10, int(self.screen_height * 0.02)))
-
-    def _game_over_screen_on_hdmi(self):
-        """在 HDMI 螢幕上顯示遊戲結束畫面，並等待使用者操作。"""
-        self.screen.fill(self.WHITE)
-        title_text_str = "遊戲結束"
-        if self.game_over_reason == "collision": title_text_str = "你很菜"
-        elif self.game_over_reason == "mileage_zero": title_text_str = "恭喜你成功離開這個令人傷心欲絕的城市"
-        
-        title_rendered = self.font_large.render(title_text_str, True, self.BLACK)
-        score_rendered = self.font_medium.render(f"獲得價值: {self.score}", True, self.BLACK)
-        mileage_rendered = self.font_medium.render(f"剩餘情緒: {self.current_mileage}", True, self.BLACK)
-        instr_rendered = self.font_small.render("按 Q 鍵返回主選單", True, (80,80,80))
-
-        text_y = int(self.screen_height * 0.25)
-        line_h_L = title_rendered.get_height()
-        line_h_M = score_rendered.get_height()
-        pad = int(self.screen_height * 0.05)
-
-        self.screen.blit(title_rendered, (self.screen_width // 2 - title_rendered.get_width() // 2, text_y))
-        text_y += line_h_L + pad
-        self.screen.blit(score_rendered, (self.screen_width // 2 - score_rendered.get_width() // 2, text_y))
-        text_y += line_h_M + pad
-        self.screen.blit(mileage_rendered, (self.screen_width // 2 - mileage_rendered.get_width() // 2, text_y))
-        text_y += line_h_M + pad * 2
-        self.screen.blit(instr_rendered, (self.screen_width // 2 - instr_rendered.get_width() // 2, text_y))
-        
-        pygame.display.flip() # 更新 HDMI 顯示
-
-        waiting_for_input = True
-        action_taken = "QUIT" # 預設
-        while waiting_for_input:
-            for evt in pygame.event.get():
-                if evt.type == pygame.QUIT:
-                    action_taken = "QUIT_VIA_WINDOW_CLOSE"
-                    waiting_for_input = False
-                if evt.type == pygame.KEYDOWN:
-                    if evt.key == pygame.K_q: 
-                        action_taken = "QUIT"
-                        waiting_for_input = False
-            self.clock.tick(self.FPS) 
-        
-        # 在返回前新增一個簡短的過場提示
-        if action_taken == "QUIT" or action_taken == "QUIT_VIA_WINDOW_CLOSE":
-            self.screen.fill(self.WHITE)
-            returning_text = self.font_medium.render("正在返回主選單...", True, self.BLACK)
-            self.screen.blit(returning_text, (self.screen_width // 2 - returning_text.get_width() // 2, self.screen_height // 2 - returning_text.get_height() // 2))
-            pygame.display.flip()
-            pygame.time.wait(1000) # 顯示1秒
-
-        return action_taken
-
-    def _execute_pre_game_sequence(self, emotion_index):
-        """在 HDMI 螢幕上執行遊戲開始前的序列：顯示情緒指數和倒數。"""
-        if not self.is_initialized: return
-
-        # 階段1: 顯示情緒指數
-        self.screen.fill(self.WHITE)
-        line1_text = f"情緒壓力指數: {emotion_index}"
-        line2_text = "遊戲即將開始..."
-        l1_rendered = self.font_medium.render(line1_text, True, self.BLACK)
-        l2_rendered = self.font_small.render(line2_text, True, self.BLACK)
-        y_start = self.screen_height // 2 - (l1_rendered.get_height() + l2_rendered.get_height() + 10) // 2
-        self.screen.blit(l1_rendered, (self.screen_width // 2 - l1_rendered.get_width() // 2, y_start))
-        self.screen.blit(l2_rendered, (self.screen_width // 2 - l2_rendered.get_width() // 2, y_start + l1_rendered.get_height() + 10))
-        pygame.display.flip()
-        
-        # 在這裡短暫等待，同時處理QUIT事件，防止視窗無響應
-        wait_start_ticks = pygame.time.get_ticks()
-        while pygame.time.get_ticks() - wait_start_ticks < 2000: # 顯示情緒指數2秒
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-            self.clock.tick(15) # 低FPS保持響應
-
-        # 階段2: 倒數計時
-        for i in range(3, 0, -1):
-            self.screen.fill(self.WHITE)
-            countdown_text = self.font_large.render(str(i), True, self.BLACK)
-            self.screen.blit(countdown_text, (self.screen_width // 2 - countdown_text.get_width() // 2, self.screen_height // 2 - countdown_text.get_height() // 2))
-            pygame.display.flip()
-            wait_start_ticks = pygame.time.get_ticks()
-            while pygame.time.get_ticks() - wait_start_ticks < 1000: # 每秒更新
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        sys.exit()
-                self.clock.tick(15)
-        
-        # 階段3: GO!
-        self.screen.fill(self.WHITE)
-        go_text = self.font_large.render("GO!", True, (0, 128, 0)) 
-        self.screen.blit(go_text, (self.screen_width // 2 - go_text.get_width() // 2, self.screen_height // 2 - go_text.get_height() // 2))
-        pygame.display.flip()
-        wait_start_ticks = pygame.time.get_ticks()
-        while pygame.time.get_ticks() - wait_start_ticks < 500: # GO 顯示半秒
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-            self.clock.tick(15)
-        print("HDMI 遊戲開始前序列完成。")
+        for text_surface, position in self._render_stats_surfaces():
+            self.screen.blit(text_surface, position)
 
-    def run_game(self, initial_mileage):
+    def _draw_game_frame(self, alpha=1.0):
         """
-        在 HDMI 螢幕上運行一局遊戲直到結束或退出。
-        返回:
-            dict: 包含遊戲結果, e.g., {'score': self.score, 'final_mileage': self.current_mileage, 'reason': self.game_over_reason}
+        依目前的繪圖模式繪製一幀遊戲畫面並送出到 HDMI，記錄本幀推送的像素數。
+        alpha 為上一步與目前模擬狀態之間的插值係數。
         """
-        if not self.is_initialized:
-            print("錯誤: HdmiGameEngine 未初始化，無法開始遊戲。")
-            return {'score': 0, 'final_mileage': initial_mileage, 'reason': 'engine_not_initialized'}
+        profiler = self.profiler
+        if self.parallax_background:
+            self.parallax_background.set_scroll(self.render_mapping.scroll(self.simulation, alpha))
+        if self.gpu_presenter:
+            presenter = self.gpu_presenter
+            presenter.begin_frame()
+            if self.parallax_background:
+                presenter.draw_parallax(self.parallax_background)
+            else:
+                presenter.draw(self.game_background, (0, 0))
+            profiler.mark('background')
+            for image, position in self._collect_game_sprites(alpha):
+                presenter.draw(image, position)
+            profiler.mark('sprites')
+            if self.particles is not None:
+                for image, position in self.particles.blit_sequence():
+                    presenter.draw(image, position)
+            profiler.mark('particles')
+            for text_surface, position in self._render_stats_surfaces():
+                presenter.draw(text_surface, position)
+            profiler.mark('hud')
+            overlay_start = time.perf_counter()
+            overlay = profiler.overlay_surface(self.profiler_font)
+            if overlay:
+                presenter.draw(overlay, profiler.overlay_position(self.screen_width, overlay))
+                profiler.mark_overlay(overlay_start)
+            presenter.present()
+            pixels = self.screen_width * self.screen_height
+        elif self.render_mode == self.RENDER_MODE_DIRTY:
+            renderer = self.dirty_renderer
+            renderer.begin_frame()
+            if self.parallax_background:
+                for band_rect in self.parallax_background.draw_layers(self.screen):
+                    renderer.mark_dirty(band_rect)
+            profiler.mark('background')
+            for image, position in self._collect_game_sprites(alpha):
+                renderer.draw(image, position)
+            profiler.mark('sprites')
+            if self.particles is not None:
+                particles_rect = self.particles.draw(self.screen)
+                if particles_rect:
+                    renderer.mark_dirty(particles_rect)
+            profiler.mark('particles')
+            for text_surface, position in self._render_stats_surfaces():
+                renderer.draw(text_surface, position)
+            profiler.mark('hud')
+            if self.video_capture:
+                self.video_capture.offer(self.screen, self.effects_dt_ms) # 在疊加層之前取樣
+            profiler.mark('capture')
+            overlay_rect = profiler.draw_overlay(self.screen, self.profiler_font)
+            if overlay_rect:
+                renderer.mark_dirty(overlay_rect)
+            pixels = renderer.present()
+        else:
+            if self.parallax_background:
+                self.screen.blit(self.game_background, (0, 0))
+                self.parallax_background.draw_layers(self.screen)
+            else:
+                self.screen.fill(self.WHITE)
+                pygame.draw.rect(self.screen, self.GROUND_COLOR, (0, self.ground_height, self.screen_width, self.screen_height - self.ground_height))
+            profiler.mark('background')
+            for image, position in self._collect_game_sprites(alpha):
+                self.screen.blit(image, position)
+            profiler.mark('sprites')
+            if self.particles is not None:
+                self.particles.draw(self.screen)
+            profiler.mark('particles')
+            self._display_stats_on_hdmi()
+            profiler.mark('hud')
+            if self.video_capture:
+                self.video_capture.offer(self.screen, self.effects_dt_ms)
+            profiler.mark('capture')
+            profiler.draw_overlay(self.screen, self.profiler_font)
+            self.display.flip()
+            pixels = self.screen.get_width() * self.screen.get_height()
+        self.latency_tracer.frame_presented()
+        profiler.mark('present')
+        self.render_stats['frames'] += 1
+        self.render_stats['pixels_pushed'] += pixels
+        self.render_stats['last_frame_pixels'] = pixels
+
+    def present_screen(self):
+        """送出整張 self.screen (文字畫面使用)：軟體模式為 display.flip() (必要時先放大)，GPU 模式更新串流 Texture。"""
+        if self.gpu_presenter:
+            self.gpu_presenter.present_surface(self.screen)
+        else:
+            self.display.flip()
 
-        # 先執行遊戲開始前序列 (顯示情緒、倒數)
-        # 這裡傳 【initial_mileage】 是為了顯示，但可能應該是 【emotion_index】；【initial_mileage】 就是 `get_player_emotion_index` 返回的值
-        self._execute_pre_game_sequence(initial_mileage)    
+    def _report_profile(self):
+        """印出本局遊戲畫面的幀時間摘要，並在設定了輸出資料夾時寫入檔案。"""
+        if not self.profiler.enabled:
+            return
+        game_summary = self.profiler.summary('game').get('game')
+        if game_summary:
+            frame = game_summary['frame_ms']
+            print(f"HdmiGameEngine: 幀時間 p50 {frame['p50']:.2f} / p95 {frame['p95']:.2f} / p99 {frame['p99']:.2f} ms，"
+                  f"掉幀 {game_summary['dropped_frames']}/{game_summary['frames']}，"
+                  f"分析器每幀成本 {self.profiler.overhead_us_per_frame:.1f} µs。")
+        if self.profile_dump_dir:
+            path = self.profiler.dump(self.profile_dump_dir, keep_files=self.profile_keep_files)
+            if path:
+                print(f"HdmiGameEngine: 幀時間分析已寫入 {path}")
+
+    def get_text_render_stats(self):
+        """回傳文字快取與 HUD 字形表的命中統計及估計節省的繪製時間 (ms)。"""
+        return {'cache': self.text_cache.get_stats(), 'hud_atlas': self.hud_atlas.get_stats()}
+
+    def get_render_stats(self):
+        """回傳本局的繪圖統計 (幀數、推送像素、平均每幀像素及占整張畫面的比例)。"""
+        stats = dict(self.render_stats)
+        frames = stats['frames']
+        stats['avg_pixels_per_frame'] = stats['pixels_pushed'] / frames if frames else 0.0
+        stats['avg_screen_fraction'] = stats['avg_pixels_per_frame'] / (self.screen.get_width() * self.screen.get_height())
+        stats['render_mode'] = self.render_mode
+        stats['render_scale'] = self.render_scale
+        stats['render_size'] = (self.screen_width, self.screen_height)
+        stats['output_size'] = tuple(self.output_size)
+        return stats
+
+    def _begin_game_session(self, initial_mileage, replay=None):
+        """
+        GameScene 進入時呼叫：套用待定的 render scale，重置遊戲、繪圖統計與 LED，並開始錄製本局。
+        replay 為 SessionRecording 時改用其種子與幾何資訊，且不錄製。
+        """
+        if self.render_scale_governor and replay is None:
+            new_scale = self.render_scale_governor.take_pending()
+            if new_scale is not None:
+                self._apply_render_scale(new_scale)
+        if replay is None:
+            self._reset_game(initial_mileage) # 重置遊戲狀態，並在此處清除事件佇列
+        else:
+            if not geometry_matches(replay.geometry, self._build_game_geometry()):
+                print("HdmiGameEngine 警告: 重播檔的幾何資訊與目前解析度/圖片不同，模擬使用錄製的幾何資訊。")
+            self._reset_game(initial_mileage, seed=replay.seed, geometry=replay.geometry)
+        self.session_recorder = None
+        self.profiler.reset() # 每局的分析結果只包含本局；本函式在幀中呼叫，清除延到下一幀開始 (進行中的幀照常記錄)
+        self.frame_pacer.restart() # 以本局的 render scale 從最高幀率重新判斷，幀間隔統計與調整記錄只包含本局
+        self.latency_tracer.reset()
+        if self.piezo_input and replay is None:
+            self.piezo_input.resume()
+        if self.replay_dir and replay is None:
+            self.session_recorder = SessionRecorder(self.session_seed, initial_mileage, self.simulation.geometry,
+                                                    (self.screen_width, self.screen_height))
+        self.render_stats = {'frames': 0, 'pixels_pushed': 0, 'last_frame_pixels': 0}
+        self.dirty_renderer.invalidate() # 開始前序列畫過整個螢幕，第一幀需整張重畫
+        if self.particles is not None:
+            self.particles.clear()
+        if self.capture_dir:
+            os.makedirs(self.capture_dir, exist_ok=True)
+            capture_base = os.path.join(self.capture_dir, f"session_{time.strftime('%Y%m%d_%H%M%S')}_{self.session_seed:08x}")
+            self.video_capture = VideoCapture(capture_base, self.screen, self.capture_scale, self.capture_fps)
+        self._set_game_leds()
+        print("開始 HDMI 遊戲會話...")
 
-        self._reset_game(initial_mileage) # 重置遊戲狀態，並在此處清除事件佇列
-        running_this_session = True
-        
-        if self.led_controller: # 遊戲開始時的 LED 效果
+    def _set_game_leds(self):
+        """遊戲 (單人或對戰) 開始時的 LED 效果。"""
+        if self.led_controller:
             from led_controller import Color # 確保 Color 可用
             # 遊戲開始時的LED效果，測試用先用簡單的藍色，之後可以在這改
-            self.led_controller.static_color(Color(0, 25, 75)) 
+            self.led_controller.play_effect(self.led_controller.static_color, Color(0, 25, 75)) # 排在進行中的燈效之後
             print("HdmiGameEngine: 設定遊戲中 LED 燈效。")
 
-        print("開始 HDMI 遊戲會話...")
-        while running_this_session:
-            current_ticks = pygame.time.get_ticks() # 獲取當前時間戳
-
-            for event in pygame.event.get():
-                # print(event)  # debug: 印出所有事件
-                if event.type == pygame.QUIT:
-                    running_this_session = False
-                    self.game_active = False 
-                    self.game_over_reason = "quit_event"
-                    break 
-                if self.game_active:
-                    if event.type == pygame.KEYDOWN:
-                        if (event.key == pygame.K_SPACE or event.key == pygame.K_UP):
-                            if not self.is_jumping: # 如果在地上，立即跳
-                                self.is_jumping = True
-                                self.player_y_velocity = self.JUMP_STRENGTH
-                                self.jump_buffer_expires_at = 0 # 清除跳躍緩衝
-                                print('跳躍')
-                            else: # 如果在空中，設定跳躍緩衝
-                                self.jump_buffer_expires_at = current_ticks + self.JUMP_BUFFER_DURATION_MS
-            
-            if not running_this_session: break
-
-            if self.game_active:
-                if self.is_jumping:
-                    self.player_y_velocity += self.PLAYER_GRAVITY
-                    self.player_rect.y += self.player_y_velocity
-                    if self.player_rect.bottom >= self.ground_height:
-                        self.player_rect.bottom = self.ground_height
-                        self.is_jumping = False
-                        self.player_y_velocity = 0
-                        print(f"DEBUG: Landed! is_jumping: {self.is_jumping}. Buffer expires at: {self.jump_buffer_expires_at}, Now: {current_ticks}")
-                        # 檢查並執行緩衝的跳躍
-                        if self.jump_buffer_expires_at > current_ticks: # 這裡用 current_ticks，而不是重新 get_ticks()
-                            self.is_jumping = True
-                            self.player_y_velocity = self.JUMP_STRENGTH
-                            print('跳躍')
-                            print(f"DEBUG: Buffered jump executed! Velo: {self.player_y_velocity}")
-                        self.jump_buffer_expires_at = 0 # 無論如何都清除緩衝
-                
-                current_score_milestone = self.score // 10
-                if current_score_milestone > self.last_speed_increase_milestone:
-                    # 讓加速度隨分數提升而增加
-                    # 這裡用線性：增量 = 0.2 + 0.01 * 分數里程碑
-                    speed_increment = 0.2 + 0.15 * current_score_milestone
-                    self.obstacle_speed = min(
-                        self.obstacle_speed + speed_increment,
-                        self.OBSTACLE_SPEED_INITIAL + 3.0 + 0.5 * current_score_milestone  # 最高速也隨分數提升
-                    )
-                    self.last_speed_increase_milestone = current_score_milestone
-                    # 玩家速度也同步加快
-                    player_speed_increment = 0.1 + 0.05 * current_score_milestone
-                    self.player_speed = min(self.player_speed + player_speed_increment, self.player_speed_max + 0.2 * current_score_milestone)
-
-                self.obstacle_timer += 1
-                if self.obstacle_timer > self.obstacle_spawn_time:
-                    self.obstacles.append(self._create_obstacle())
-                    self.obstacle_timer = 0
-                    prog = min(1.0, self.score / self.OBSTACLE_SCORE_TO_REACH_MIN_SPAWN_TIME)
-                    curr_avg_spawn = self.OBSTACLE_INITIAL_SPAWN_TIME_AVG - prog * (self.OBSTACLE_INITIAL_SPAWN_TIME_AVG - self.OBSTACLE_MIN_SPAWN_TIME_AVG)
-                    spawn_low = max(self.OBSTACLE_ABSOLUTE_MIN_SPAWN_TIME, int(curr_avg_spawn - self.OBSTACLE_SPAWN_TIME_RANDOM_RANGE / 2))
-                    spawn_high = max(spawn_low + 5, int(curr_avg_spawn + self.OBSTACLE_SPAWN_TIME_RANDOM_RANGE / 2))
-                    self.obstacle_spawn_time = random.randint(spawn_low, spawn_high)
-
-                new_obstacles = []
-                for obs_data in self.obstacles:
-                    obs_data['rect'].x -= int(self.obstacle_speed)
-                    if not obs_data['scored'] and obs_data['rect'].right < self.player_rect.left:
-                        points = 0
-                        if obs_data['height_key'] == self.obstacle_original_height_keys[0]: points = random.randint(3, 5)
-                        elif obs_data['height_key'] == self.obstacle_original_height_keys[1]: points = random.randint(6, 8)
-                        self.score += points
-                        obs_data['scored'] = True
-                    if obs_data['rect'].right > 0:
-                        new_obstacles.append(obs_data)
-                self.obstacles = new_obstacles
-
-                for obs_data in self.obstacles:
-                    if self.player_rect.colliderect(obs_data['rect']):
-                        self.game_active = False
-                        self.game_over_reason = "collision"
-                        break
-                
-                if self.game_active:
-                    self.current_mileage = initial_mileage - self.score
-                    if self.current_mileage <= 0:
-                        self.current_mileage = 0
-                        self.game_active = False
-                        self.game_over_reason = "mileage_zero"
-
-                # 玩家橫向位置固定在左側
-                self.player_rect.x = self.player_x_start_offset
-
-                # 繪圖到 HDMI 螢幕
-                self.screen.fill(self.WHITE)
-                pygame.draw.rect(self.screen, self.GROUND_COLOR, (0, self.ground_height, self.screen_width, self.screen_height - self.ground_height))
-                self.screen.blit(self.player_image, self.player_rect)
-                for obs_data in self.obstacles:
-                    self.screen.blit(obs_data['image'], obs_data['rect'])
-                self._display_stats_on_hdmi()
-                pygame.display.flip()
-
-            else: # game_active is False (遊戲結束)
-                user_choice = self._game_over_screen_on_hdmi()
-                if user_choice == "QUIT" or user_choice == "QUIT_VIA_WINDOW_CLOSE":
-                    running_this_session = False
-                    if user_choice == "QUIT_VIA_WINDOW_CLOSE": self.game_over_reason = "quit_event"
-                else:
-                    running_this_session = False
-            
-            self.clock.tick(self.FPS)
-            # print('Window focused:', pygame.key.get_focused())  # debug: 印出視窗焦點狀態
-        
+    def request_player_jump(self, source='keyboard', strength=1.0, source_time=None, intensity=0.4):
+        """
+        把一次跳躍輸入交給模擬 (在地上立即跳，在空中則設定跳躍緩衝)，並記錄到本局的重播檔。
+        source_time 為輸入產生的時間 (perf_counter)；提供時追蹤此輸入到畫面送出的延遲。
+        intensity (0~1) 決定腳下粒子爆發的數量與速度 (拍擊時由電壓換算)。
+        """
+        strength = round(strength, 3) # 與重播檔儲存的精度相同，重播才會完全一致
+        if self.session_recorder:
+            self.session_recorder.record_input(source, strength)
+        if source_time is not None:
+            self.latency_tracer.input_consumed(source, source_time)
+        if self.particles is not None:
+            self._emit_strike_particles(intensity)
+        return self.simulation.request_jump(strength)
+
+    def handle_piezo_strike(self, event):
+        """處理 PiezoInputThread 投遞的拍擊事件：交給跳躍 / 跳躍緩衝邏輯，延遲從感測器取樣時間起算。"""
+        strength = 1.0
+        if self.piezo_strength_scaling:
+            strength = jump_strength_for_amplitude(event.amplitude, self.piezo_jump_threshold, self.piezo_full_voltage)
+        intensity = jump_strength_for_amplitude(event.amplitude, self.piezo_jump_threshold, self.piezo_full_voltage, 0.0, 1.0)
+        return self.request_player_jump('piezo', strength, source_time=event.sample_time, intensity=intensity)
+
+    def _emit_strike_particles(self, intensity):
+        """跳躍輸入時在玩家腳下爆出粒子，數量與速度隨 intensity (0~1) 增加。"""
+        count = self.STRIKE_PARTICLES_MIN + (self.STRIKE_PARTICLES_MAX - self.STRIKE_PARTICLES_MIN) * intensity
+        top_speed = self.screen_height * (0.6 + 0.9 * intensity)
+        self.particles.emit(self.player_rect.centerx, self.player_rect.bottom, count,
+                            speed=(self.screen_height * 0.2, top_speed), angle=(0.1 * math.pi, 0.9 * math.pi),
+                            life=(0.3, 0.6 + 0.4 * intensity), colors=(0, 1, 2, 3))
+
+    def _emit_collision_particles(self):
+        """碰撞時在玩家前緣向四周爆出粒子。"""
+        self.particles.emit(self.player_rect.right, self.player_rect.centery, self.COLLISION_PARTICLES,
+                            speed=(self.screen_height * 0.3, self.screen_height * 1.4), angle=(0.0, 2 * math.pi),
+                            life=(0.4, self.COLLISION_EFFECT_MS / 1000.0), colors=(4, 5, 6))
+
+    def update_effects(self, dt_ms):
+        """每幀推進粒子效果 (與模擬步長無關，遊戲結束後的碰撞效果也由此推進)。"""
+        self.effects_dt_ms = dt_ms
+        if self.particles is not None:
+            self.particles.update(dt_ms / 1000.0, floor_y=self.ground_height)
+
+    def get_piezo_latency_stats(self):
+        """
+        回傳本局拍擊取樣到套用跳躍 (queue 階段) 延遲的 p50/p95/最大值 (ms)、在一幀預算內的比例，
+        以及感測器輪詢間隔 (round_period)：拍擊可能早於取樣最多一個間隔，兩者相加才是完整的延遲上限。
+        exceeds_frame_budget 表示 p95 延遲加上 p95 輪詢間隔超過一幀預算 (拍擊跳躍沒有在一幀內反應)。
+        """
+        histogram = self.latency_tracer.histogram('piezo', 'queue')
+        if histogram is None or not histogram.count:
+            return None
+        frame_budget_ms = self.frame_pacer.frame_budget_ms or self.profiler.frame_budget_ms
+        summary = histogram.summary()
+        round_period = self.piezo_input.get_round_period_stats() if self.piezo_input else None
+        worst_ms = summary['p95_ms'] + (round_period['p95_ms'] if round_period else 0.0)
+        return {
+            'strikes': histogram.count,
+            'p50_ms': summary['p50_ms'],
+            'p95_ms': summary['p95_ms'],
+            'max_ms': summary['max_ms'],
+            'within_frame_ratio': histogram.fraction_within(frame_budget_ms),
+            'round_period': round_period,
+            'frame_budget_ms': round(frame_budget_ms, 3),
+            'exceeds_frame_budget': worst_ms > frame_budget_ms
+        }
+
+    def _advance_game(self, dt_ms):
+        """
+        以固定步長推進模擬 dt_ms 毫秒，回傳繪圖插值係數 alpha。
+        經過時間先取整到微秒，重播時以相同的值累加即可得到相同的步數。
+        """
+        dt_us = int(round(dt_ms * 1000))
+        if self.session_recorder:
+            self.session_recorder.end_frame(dt_us)
+        self.sim_accumulator_ms += dt_us / 1000.0
+        stepped = False
+        while self.sim_accumulator_ms >= GameSimulation.STEP_MS and self.simulation.game_active:
+            self.simulation.step()
+            self.sim_accumulator_ms -= GameSimulation.STEP_MS
+            stepped = True
+        if stepped:
+            self.latency_tracer.simulation_stepped()
+            if self.particles is not None and self.simulation.game_over_reason == "collision":
+                self._emit_collision_particles()
+        self._sync_from_simulation()
+        return self.sim_accumulator_ms / GameSimulation.STEP_MS if self.game_active else 1.0
+
+    def _report_game_session(self):
+        """GameScene 離開時呼叫：印出本局的繪圖、文字快取、拍擊延遲與幀時間統計，並寫入重播檔。"""
+        if self.piezo_input:
+            self.piezo_input.pause()
+        if self.video_capture:
+            keep = self.score >= self.capture_min_score
+            self.video_capture.stop(keep=keep)
+            capture_stats = self.video_capture.get_stats()
+            self.profiler.extra_stats['video_capture'] = capture_stats
+            print(f"HdmiGameEngine: 錄影 {capture_stats['captured']} 幀 (丟棄 {capture_stats['dropped']} 幀)，"
+                  f"每幀複製平均 {capture_stats['avg_copy_ms']:.3f} ms / 最大 {capture_stats['max_copy_ms']:.3f} ms，"
+                  + (f"背景編碼寫入 {capture_stats['path']}。" if keep else f"分數低於 {self.capture_min_score}，不保留。"))
+            self.video_capture = None
+        piezo_stats = self.get_piezo_latency_stats()
+        if piezo_stats:
+            self.profiler.extra_stats['piezo_latency'] = piezo_stats
+            print(f"HdmiGameEngine: {piezo_stats['strikes']} 次拍擊跳躍，延遲 p50 {piezo_stats['p50_ms']:.2f} / "
+                  f"p95 {piezo_stats['p95_ms']:.2f} / 最大 {piezo_stats['max_ms']:.2f} ms，"
+                  f"{piezo_stats['within_frame_ratio'] * 100:.0f}% 在一幀內。")
+            round_period = piezo_stats['round_period']
+            if round_period:
+                print(f"HdmiGameEngine: 感測器輪詢間隔 p50 {round_period['p50_ms']:.2f} / p95 {round_period['p95_ms']:.2f} / "
+                      f"最大 {round_period['max_ms']:.2f} ms (拍擊到取樣之間最多再加一個間隔)。")
+            if piezo_stats['exceeds_frame_budget']:
+                print(f"HdmiGameEngine 警告: 拍擊延遲 p95 加上輪詢間隔超過一幀預算 ({piezo_stats['frame_budget_ms']:.1f} ms)；"
+                      f"可設定 PIEZO_JUMP_CHANNELS 只輪詢拍擊墊的通道 (單一通道時使用連續轉換)。")
+        latency_summary = self.latency_tracer.summary()
+        if latency_summary:
+            self.profiler.extra_stats['input_latency'] = latency_summary
+            for source, stages in latency_summary.items():
+                print(f"HdmiGameEngine: {source} 輸入到畫面延遲 p50 {stages['total']['p50_ms']:.1f} / p95 {stages['total']['p95_ms']:.1f} ms "
+                      f"(佇列 {stages['queue']['p50_ms']:.1f}，模擬 {stages['simulation']['p50_ms']:.1f}，繪圖 {stages['render']['p50_ms']:.1f})。")
+            if self.profile_dump_dir:
+                path = self.latency_tracer.export(self.profile_dump_dir, keep_files=self.profile_keep_files)
+                if path:
+                    print(f"HdmiGameEngine: 輸入延遲直方圖已寫入 {path}")
+        pacing_stats = self.frame_pacer.get_stats()
+        if pacing_stats['target_fps']:
+            self.profiler.extra_stats['frame_pacing'] = pacing_stats
+            print(f"HdmiGameEngine: 目標 {pacing_stats['target_fps']} FPS，幀間隔 jitter p50 {pacing_stats['jitter_ms']['p50']:.2f} / "
+                  f"p99 {pacing_stats['jitter_ms']['p99']:.2f} ms，延遲幀 {pacing_stats['late_frames']}/{pacing_stats['frames']}"
+                  + (f"，幀率調整 {len(pacing_stats['changes'])} 次。" if pacing_stats['changes'] else "。"))
+        if self.session_recorder:
+            self.session_recorder.finish({'score': self.score, 'final_mileage': self.current_mileage, 'reason': self.game_over_reason},
+                                         self.simulation.steps)
+            path = self.session_recorder.save_to_directory(self.replay_dir)
+            if path:
+                print(f"HdmiGameEngine: 本局重播檔已寫入 {path} ({os.path.getsize(path)} bytes)")
+            self.session_recorder = None
+        render_stats = self.get_render_stats()
+        print(f"HdmiGameEngine: 繪圖模式 '{self.render_mode}'，{render_stats['frames']} 幀，"
+              f"平均每幀推送 {render_stats['avg_pixels_per_frame']:.0f} 像素 ({render_stats['avg_screen_fraction'] * 100:.1f}% 畫面)。")
+        text_stats = self.get_text_render_stats()
+        print(f"HdmiGameEngine: 文字快取命中率 {text_stats['cache']['hit_rate'] * 100:.1f}%，"
+              f"估計節省繪製時間 {text_stats['cache']['estimated_saved_ms'] + text_stats['hud_atlas']['estimated_saved_ms']:.0f} ms。")
+        self._report_profile()
+
+    def _finish_game_flow(self, result):
+        """一局流程結束 (結束畫面按 Q 或關閉視窗)：清除遊戲燈效並公布結果。"""
         # 遊戲會話結束，main.py 會根據結果設定 LED，這裡可以先清除或恢復預設
         if self.led_controller:
-            self.led_controller.clear() # 清除遊戲中的特定燈效
+            self.led_controller.play_effect(self.led_controller.clear) # 清除遊戲中的特定燈效 (不阻塞遊戲迴圈)
             print("HdmiGameEngine: 清除遊戲中 LED 燈效。")
+        print(f"HDMI 遊戲會話結束 (原因: {result.get('reason') or '未知'}).")
+        self.game_result = result
 
-        print(f"HDMI 遊戲會話結束 (原因: {self.game_over_reason or '未知'}).")
-        return {'score': self.score, 'final_mileage': self.current_mileage, 'reason': self.game_over_reason}
+    def tick(self):
+        """
+        由主迴圈每幀呼叫一次：處理事件並更新、繪製目前的畫面。
+        回傳:
+            bool: False 表示使用者關閉了視窗，主程式應結束。
+        """
+        return self.scene_manager.tick()
 
-    def show_hdmi_standby_screen(self, title="互動式解壓遊戲", line1="按按鈕開始"):
-        """在 HDMI 螢幕上顯示待機或提示訊息。"""
+    def start_game(self, initial_mileage):
+        """
+        開始一局 (開始前序列 → 遊戲 → 結束畫面)，立即返回；之後每幀呼叫 tick()，
+        流程完成時 self.game_result 會變成結果 dict。
+        """
+        self.game_result = None
         if not self.is_initialized:
-            print("錯誤: HdmiGameEngine 未初始化，無法顯示待機畫面。")
+            print("錯誤: HdmiGameEngine 未初始化，無法開始遊戲。")
+            self.game_result = {'score': 0, 'final_mileage': initial_mileage, 'reason': 'engine_not_initialized'}
             return
+        # 【initial_mileage】 就是 `get_player_emotion_index` 返回的值，開始前序列以它作為情緒指數顯示
+        self.scene_manager.change(PreGameScene(self, initial_mileage))
 
-        self.screen.fill(self.WHITE)
-        
-        title_rendered = self.font_large.render(title, True, self.BLACK)
-        line1_rendered = self.font_medium.render(line1, True, self.BLACK)
-        
-        text_y = int(self.screen_height * 0.3)
-        line_h_L = title_rendered.get_height()
-        line_h_M = line1_rendered.get_height()
-        pad = int(self.screen_height * 0.05)
-
-        self.screen.blit(title_rendered, (self.screen_width // 2 - title_rendered.get_width() // 2, text_y))
-        text_y += line_h_L + pad
-        self.screen.blit(line1_rendered, (self.screen_width // 2 - line1_rendered.get_width() // 2, text_y))
-        
-        pygame.display.flip()
-        print(f"HDMI 螢幕已更新為待機畫面: '{title} - {line1}'")
+    def run_game(self, initial_mileage):
+        """
+        在 HDMI 螢幕上運行一局遊戲直到結束或退出 (阻塞版本，測試與工具使用；main.py 改用 start_game + tick)。
+        返回:
+            dict: 包含遊戲結果, e.g., {'score': self.score, 'final_mileage': self.current_mileage, 'reason': self.game_over_reason}
+        """
+        self.start_game(initial_mileage)
+        return self.run_until_result()
 
-    def show_measuring_emotion_screen(self, duration=3):
-        """在 HDMI 螢幕上顯示正在測量情緒的提示，並帶有簡單動畫。"""
+    def start_versus(self, initial_mileage):
+        """
+        開始一局雙人對戰 (開始前序列 → 上下兩條跑道的 VersusScene → 對戰結果畫面)，立即返回。
+        流程完成時 self.game_result 與 start_game 相同 (以勝者的結果)，另含 'winner' (跑道索引或 None) 與 'lanes'。
+        """
+        self.game_result = None
         if not self.is_initialized:
-            print("錯誤: HdmiGameEngine 未初始化，無法顯示測量畫面。")
+            print("錯誤: HdmiGameEngine 未初始化，無法開始對戰。")
+            self.game_result = {'score': 0, 'final_mileage': initial_mileage, 'reason': 'engine_not_initialized'}
             return
+        from versus_mode import VersusScene # 延遲載入：只有選用對戰時才 import
+        self.scene_manager.change(PreGameScene(self, initial_mileage, next_scene=VersusScene))
 
-        print("HDMI 螢幕：顯示測量情緒畫面...")
-        base_line1_text = "正在偵測您的負面情緒"
-        line2_text = f"請在 {duration} 秒內盡情釋放！"
-        l2_rendered = self.font_small.render(line2_text, True, (50, 50, 50))
-
-        start_time = pygame.time.get_ticks() # 使用 Pygame 的時間
-        animation_dots = 0
-        dot_update_interval = 300 # 每 300ms 更新一次點
-        last_dot_update = start_time
-
-        while (pygame.time.get_ticks() - start_time) < (duration * 1000):
-            # 處理基本的 Pygame 事件，以保持視窗響應，並允許退出
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    # 如果在測量時關閉視窗，也應當能終止
-                    if hasattr(self, 'running_this_session'): # 如果在 run_game 內部被間接調用
-                        self.running_this_session = False 
-                        self.game_active = False
-                        self.game_over_reason = "quit_event"
-                    pygame.quit() # 直接退出pygame，因為這是一個阻塞畫面
-                    sys.exit() # 結束程式
-                # 可以添加一個按鍵提前結束測量的邏輯，但目前不需要
-            
-            current_time_ticks = pygame.time.get_ticks()
-            if current_time_ticks - last_dot_update > dot_update_interval:
-                animation_dots = (animation_dots + 1) % 4 # 0, 1, 2, 3 個點
-                last_dot_update = current_time_ticks
-
-            self.screen.fill(self.WHITE)
-            animated_line1_text = base_line1_text + "." * animation_dots
-            l1_rendered = self.font_medium.render(animated_line1_text, True, self.BLACK)
-            
-            y_pos = self.screen_height // 2 - (l1_rendered.get_height() + l2_rendered.get_height() + 10) // 2
-            self.screen.blit(l1_rendered, (self.screen_width // 2 - l1_rendered.get_width() // 2, y_pos))
-            y_pos += l1_rendered.get_height() + 10
-            self.screen.blit(l2_rendered, (self.screen_width // 2 - l2_rendered.get_width() // 2, y_pos))
-            
-            pygame.display.flip()
-            self.clock.tick(self.FPS) # 以遊戲的FPS運行，或者一個較低的值如20FPS
+    def run_until_result(self):
+        """
+        阻塞地 tick() 直到目前的流程設定 game_result (run_game / run_versus / run_replay 與 GameMode.run 共用)。
+        視窗被關閉時以目前的分數與情緒作為結果 (原因 'quit_event')。
+        """
+        while self.game_result is None:
+            if not self.tick() and self.game_result is None:
+                self.game_result = {'score': self.score, 'final_mileage': self.current_mileage, 'reason': 'quit_event'}
+        return self.game_result
+
+    def run_versus(self, initial_mileage):
+        """阻塞版本的雙人對戰，回傳結果 dict。"""
+        self.start_versus(initial_mileage)
+        return self.run_until_result()
+
+    def start_mode(self, name, initial_mileage):
+        """
+        以 game_modes 登錄的模式開始一局，立即返回 (流程完成時 self.game_result 為結果 dict)。
+        第一次選用某個模式時才 import 其模組並載入資源；未知的模式改用 'classic'。
+        """
+        self._activate_mode(name).start(self, initial_mileage)
 
-        print("HDMI 螢幕：測量情緒畫面顯示完畢。")
-        # 測量畫面結束後，main.py 會繼續執行 get_player_emotion_index，然後是 pre_game_countdown
+    def run_mode(self, name, initial_mileage):
+        """阻塞版本的 start_mode (由模式的 run() 執行)，回傳結果 dict。"""
+        return self._activate_mode(name).run(self, initial_mileage)
+
+    def _activate_mode(self, name):
+        if name not in self.game_modes.modes:
+            print(f"HdmiGameEngine 警告: 未知的遊戲模式 '{name}'，改用 'classic'。可用: {', '.join(self.game_modes.names())}")
+            name = 'classic'
+        return self.game_modes.activate(name, self)
+
+    def start_replay(self, recording):
+        """直接以 GameScene 逐幀重播 SessionRecording (不顯示開始前序列與結束畫面)，立即返回。"""
+        self.game_result = None
+        self.scene_manager.change(GameScene(self, recording.initial_mileage, replay=recording))
+
+    def run_replay(self, recording):
+        """阻塞版本的重播，回傳重播結束時的結果 dict。"""
+        self.start_replay(recording)
+        return self.run_until_result()
+
+    def show_hdmi_standby_screen(self, title="互動式解壓遊戲", line1="按按鈕開始"):
+        """切換到待機或提示訊息畫面 (下一次 tick() 繪製)。"""
+        if not self.is_initialized:
+            print("錯誤: HdmiGameEngine 未初始化，無法顯示待機畫面。")
+            return
+        self.scene_manager.change(StandbyScene(self, title, line1))
+
+    def show_measuring_emotion_screen(self, duration=3, emotion_calculator=None):
+        """
+        切換到測量情緒畫面 (帶動畫點)，立即返回；畫面持續到下一次切換為止，
+        期間由主迴圈呼叫 tick() 更新動畫。
+        啟用 waveform_view 時改為即時波形畫面；提供 emotion_calculator 時一併顯示目前的情緒指數。
+        """
+        if not self.is_initialized:
+            print("錯誤: HdmiGameEngine 未初始化，無法顯示測量畫面。")
+            return
+        if self.waveform_buffer is not None:
+            self.waveform_buffer.reset()
+            self.scene_manager.change(WaveformScene(self, duration, self.waveform_buffer, self.waveform_window_sec,
+                                                    self.waveform_full_scale, emotion_calculator))
+            return
+        self.scene_manager.change(MeasuringScene(self, duration))
 
     def cleanup(self):
         """清理 Pygame 資源。通常由主程式在最後統一處理 pygame.quit()。"""
         print("HdmiGameEngine 正在清理 (通常無特定操作，pygame.quit() 由主程式管理)。")
         self.player_image = None
         self.obstacle_images_scaled = None
-        self.obstacles = []
+        self.simulation = None
+        if self.gpu_presenter:
+            self.gpu_presenter.destroy()
+            self.gpu_presenter = None
+        if self.piezo_input:
+            self.piezo_input.stop()
+            self.piezo_input = None
+        if self.video_capture: # 遊戲中途結束程式：保留已錄下的部分
+            self.video_capture.stop()
+            self.video_capture.wait(timeout=5.0)
+            self.video_capture = None
         pygame.display.quit()  # 關閉顯示，釋放 VRAM
         # pygame.quit() 應該在應用程式最末端呼叫
 
@@ -531,10 +912,13 @@ if __name__ == "__main__":
     game_engine = None
     try:
         # 模擬 SensorHandler
+        class MockAnalogIn:
+            voltage = 0.0 # 背景執行緒輪詢時讀到的電壓；預設不觸發，避免自動跳
+
         class MockSensorHandlerForHdmiGame:
             def __init__(self, is_ready=True):
                 self.is_initialized = is_ready
-                self.adc_channels = {'A0': 'mock'} if is_ready else {}
+                self.adc_channels = {'A0': MockAnalogIn()} if is_ready else {}
             def check_any_piezo_trigger(self, threshold):
                 # print("MockSensor: checking trigger")
                 # return random.choice([True, False, False, False]) # 模擬拍擊
@@ -0,0 +1,387 @@
+# RandomGenerate/SPI_v2/hdmi_scenes.py
+"""
+HdmiGameEngine 的非阻塞畫面 (scene) 與畫面管理器。
+
+每個畫面提供 handle_event(event)、update(dt_ms) 與 draw()，由 SceneManager.tick()
+每幀呼叫一次；畫面本身不含 while 迴圈、不等待下一幀，也不會 pygame.quit() / sys.exit()。
+main.py 的主迴圈每幀呼叫 HdmiGameEngine.tick()，其餘時間可照常處理 LED、LCD、按鈕與感測器。
+
+一局遊戲的流程: PreGameScene (顯示情緒、倒數) → GameScene → GameOverScene，
+結束時把結果寫入 engine.game_result。
+"""
+import time
+import pygame
+
+from piezo_input import PIEZO_STRIKE_EVENT
+
+
+class Scene:
+    """畫面基底類別。name 用於效能分析器分開統計。"""
+
+    name = 'scene'
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.manager = None
+        self.elapsed_ms = 0.0
+
+    def on_enter(self):
+        pass
+
+    def on_exit(self):
+        pass
+
+    def invalidate(self):
+        """要求下一幀整張重畫 (例如疊加層切換)。"""
+        pass
+
+    def handle_event(self, event):
+        pass
+
+    def update(self, dt_ms):
+        self.elapsed_ms += dt_ms
+
+    def draw(self):
+        pass
+
+
+class TextScene(Scene):
+    """白底文字畫面：只有內容改變 (或顯示效能疊加層) 時才重畫並送出整個畫面。"""
+
+    def __init__(self, engine):
+        super().__init__(engine)
+        self.needs_redraw = True
+
+    def invalidate(self):
+        self.needs_redraw = True
+
+    def draw(self):
+        engine = self.engine
+        profiler = engine.profiler
+        if not (self.needs_redraw or profiler.overlay_visible):
+            return
+        engine.screen.fill(engine.WHITE)
+        profiler.mark('background')
+        self.draw_content()
+        profiler.mark('hud')
+        profiler.draw_overlay(engine.screen, engine.profiler_font, scene=self.name)
+        engine.present_screen()
+        profiler.mark('present')
+        self.needs_redraw = False
+
+    def draw_content(self):
+        pass
+
+    def blit_centered(self, surface, y):
+        screen_width = self.engine.screen_width
+        self.engine.screen.blit(surface, (screen_width // 2 - surface.get_width() // 2, y))
+
+
+class StandbyScene(TextScene):
+    """待機或提示訊息。"""
+
+    name = 'standby'
+
+    def __init__(self, engine, title, line1):
+        super().__init__(engine)
+        self.title = title
+        self.line1 = line1
+
+    def on_enter(self):
+        print(f"HDMI 螢幕已更新為待機畫面: '{self.title} - {self.line1}'")
+
+    def draw_content(self):
+        engine = self.engine
+        title_rendered = engine.text_cache.render(engine.font_large, self.title, engine.BLACK)
+        line1_rendered = engine.text_cache.render(engine.font_medium, self.line1, engine.BLACK)
+        text_y = int(engine.screen_height * 0.3)
+        pad = int(engine.screen_height * 0.05)
+        self.blit_centered(title_rendered, text_y)
+        self.blit_centered(line1_rendered, text_y + title_rendered.get_height() + pad)
+
+
+class MeasuringScene(TextScene):
+    """測量情緒時的提示與動畫點，持續到 main.py 換到下一個畫面為止。"""
+
+    name = 'measuring'
+    DOT_UPDATE_INTERVAL_MS = 300 # 每 300ms 更新一次點
+
+    def __init__(self, engine, duration):
+        super().__init__(engine)
+        self.duration = duration
+        self.animation_dots = 0
+
+    def on_enter(self):
+        print("HDMI 螢幕：顯示測量情緒畫面...")
+
+    def update(self, dt_ms):
+        super().update(dt_ms)
+        dots = int(self.elapsed_ms // self.DOT_UPDATE_INTERVAL_MS) % 4 # 0, 1, 2, 3 個點
+        if dots != self.animation_dots:
+            self.animation_dots = dots
+            self.needs_redraw = True
+
+    def draw_content(self):
+        engine = self.engine
+        l1_rendered = engine.text_cache.render(engine.font_medium, "正在偵測您的負面情緒" + "." * self.animation_dots, engine.BLACK)
+        l2_rendered = engine.text_cache.render(engine.font_small, f"請在 {self.duration} 秒內盡情釋放！", (50, 50, 50))
+        y_pos = engine.screen_height // 2 - (l1_rendered.get_height() + l2_rendered.get_height() + 10) // 2
+        self.blit_centered(l1_rendered, y_pos)
+        self.blit_centered(l2_rendered, y_pos + l1_rendered.get_height() + 10)
+
+
+class FlowScene(TextScene):
+    """一局遊戲流程中的畫面；關閉視窗時直接結束流程並回報 quit_event。"""
+
+    def __init__(self, engine, initial_mileage):
+        super().__init__(engine)
+        self.initial_mileage = initial_mileage
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.engine._finish_game_flow(self.quit_result())
+
+    def quit_result(self):
+        return {'score': self.engine.score, 'final_mileage': self.engine.current_mileage, 'reason': 'quit_event'}
+
+
+class PreGameScene(FlowScene):
+    """
+    遊戲開始前序列：顯示情緒指數 2 秒、倒數 3-2-1、GO! 半秒，接著進入 GameScene
+    (或 next_scene 指定的畫面類別，例如對戰模式的 VersusScene，以 (engine, 情緒指數) 建立)。
+    """
+
+    name = 'pre_game'
+    # (結束時間 ms, 顯示內容)
+    STAGES = ((2000, 'index'), (3000, '3'), (4000, '2'), (5000, '1'), (5500, 'GO!'))
+
+    def __init__(self, engine, emotion_index, next_scene=None):
+        super().__init__(engine, emotion_index)
+        self.stage = 0
+        self.next_scene = next_scene or GameScene
+
+    def quit_result(self):
+        return {'score': 0, 'final_mileage': self.initial_mileage, 'reason': 'quit_event'} # 遊戲尚未開始
+
+    def update(self, dt_ms):
+        super().update(dt_ms)
+        stage = self.stage
+        while stage < len(self.STAGES) and self.elapsed_ms >= self.STAGES[stage][0]:
+            stage += 1
+        if stage >= len(self.STAGES):
+            print("HDMI 遊戲開始前序列完成。")
+            self.manager.change(self.next_scene(self.engine, self.initial_mileage))
+        elif stage != self.stage:
+            self.stage = stage
+            self.needs_redraw = True
+
+    def draw_content(self):
+        engine = self.engine
+        content = self.STAGES[self.stage][1]
+        if content == 'index':
+            l1_rendered = engine.text_cache.render(engine.font_medium, f"情緒壓力指數: {self.initial_mileage}", engine.BLACK)
+            l2_rendered = engine.text_cache.render(engine.font_small, "遊戲即將開始...", engine.BLACK)
+            y_start = engine.screen_height // 2 - (l1_rendered.get_height() + l2_rendered.get_height() + 10) // 2
+            self.blit_centered(l1_rendered, y_start)
+            self.blit_centered(l2_rendered, y_start + l1_rendered.get_height() + 10)
+        else:
+            color = (0, 128, 0) if content == 'GO!' else engine.BLACK
+            rendered = engine.text_cache.render(engine.font_large, content, color)
+            self.blit_centered(rendered, engine.screen_height // 2 - rendered.get_height() // 2)
+
+
+class GameScene(Scene):
+    """
+    遊戲進行中：以固定步長推進 GameSimulation，並依繪圖模式繪製。
+    replay 為 SessionRecording 時，每幀改用錄製的經過時間與輸入 (忽略鍵盤跳躍)，結束後直接公布結果。
+    """
+
+    name = 'game'
+
+    def __init__(self, engine, initial_mileage, replay=None):
+        super().__init__(engine)
+        self.initial_mileage = initial_mileage
+        self.replay = replay
+        self.replay_frame = 0
+        self.alpha = 0.0
+        self.ended = False
+        self.reported = False
+        self.effect_remaining_ms = 0
+
+    def on_enter(self):
+        self.engine._begin_game_session(self.initial_mileage, replay=self.replay)
+
+    def on_exit(self):
+        self._report()
+
+    def _report(self):
+        if not self.reported:
+            self.reported = True
+            self.engine._report_game_session()
+
+    def invalidate(self):
+        self.engine.dirty_renderer.invalidate()
+
+    def handle_event(self, event):
+        engine = self.engine
+        if event.type == pygame.QUIT:
+            engine.game_active = False
+            engine.game_over_reason = "quit_event"
+            self.ended = True
+            self._report()
+            engine._finish_game_flow({'score': engine.score, 'final_mileage': engine.current_mileage, 'reason': engine.game_over_reason})
+        elif engine.game_active and event.type == pygame.KEYDOWN and self.replay is None:
+            if event.key == pygame.K_SPACE or event.key == pygame.K_UP:
+                # 在地上立即跳，在空中則設定跳躍緩衝；模擬輸入自帶 sample_time
+                engine.request_player_jump('keyboard', source_time=getattr(event, 'sample_time', self.manager.last_pump_time))
+        elif engine.game_active and event.type == PIEZO_STRIKE_EVENT and self.replay is None:
+            engine.handle_piezo_strike(event)
+
+    def update(self, dt_ms):
+        super().update(dt_ms)
+        engine = self.engine
+        if self.ended:
+            if self.effect_remaining_ms > 0: # 碰撞粒子效果播完才換到結束畫面
+                self.effect_remaining_ms -= dt_ms
+                engine.update_effects(dt_ms)
+                return
+            if engine.game_result is None:
+                if self.replay is None:
+                    self.manager.change(GameOverScene(engine, self.initial_mileage))
+                else:
+                    self._report()
+                    engine._finish_game_flow({'score': engine.score, 'final_mileage': engine.current_mileage,
+                                              'reason': engine.game_over_reason or 'quit_event'})
+            return
+        if self.replay is not None:
+            if self.replay_frame >= len(self.replay.frames): # 錄製在遊戲結束前中止 (關閉視窗)
+                self.ended = True
+                return
+            dt_us, inputs = self.replay.frames[self.replay_frame]
+            self.replay_frame += 1
+            for source, strength in inputs:
+                engine.request_player_jump(source, strength)
+            dt_ms = dt_us / 1000.0
+        self.alpha = engine._advance_game(dt_ms)
+        engine.update_effects(dt_ms)
+        self.ended = not engine.game_active # 最後一幀仍照常繪製，下一幀才換到結束畫面
+        if self.ended and engine.particles is not None and engine.game_over_reason == "collision" and self.replay is None:
+            self.effect_remaining_ms = engine.COLLISION_EFFECT_MS
+
+    def draw(self):
+        if self.engine.game_result is None:
+            self.engine._draw_game_frame(self.alpha)
+
+
+class GameOverScene(FlowScene):
+    """遊戲結束畫面：按 Q 後顯示「正在返回主選單...」1 秒再結束流程。"""
+
+    name = 'game_over'
+    RETURNING_MESSAGE_MS = 1000
+
+    def __init__(self, engine, initial_mileage):
+        super().__init__(engine, initial_mileage)
+        self.returning_since_ms = None
+
+    def handle_event(self, event):
+        super().handle_event(event)
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_q and self.returning_since_ms is None:
+            self.returning_since_ms = self.elapsed_ms
+            self.needs_redraw = True
+
+    def update(self, dt_ms):
+        super().update(dt_ms)
+        engine = self.engine
+        if (self.returning_since_ms is not None and engine.game_result is None
+                and self.elapsed_ms - self.returning_since_ms >= self.RETURNING_MESSAGE_MS):
+            engine._finish_game_flow(self.result())
+
+    def result(self):
+        engine = self.engine
+        return {'score': engine.score, 'final_mileage': engine.current_mileage, 'reason': engine.game_over_reason}
+
+    def draw_content(self):
+        engine = self.engine
+        if self.returning_since_ms is not None:
+            returning_text = engine.text_cache.render(engine.font_medium, "正在返回主選單...", engine.BLACK)
+            self.blit_centered(returning_text, engine.screen_height // 2 - returning_text.get_height() // 2)
+            return
+
+        title_text_str = "遊戲結束"
+        if engine.game_over_reason == "collision": title_text_str = "你很菜"
+        elif engine.game_over_reason == "mileage_zero": title_text_str = "恭喜你成功離開這個令人傷心欲絕的城市"
+        title_rendered = engine.text_cache.render(engine.font_large, title_text_str, engine.BLACK)
+        score_rendered = engine.text_cache.render(engine.font_medium, f"獲得價值: {engine.score}", engine.BLACK)
+        mileage_rendered = engine.text_cache.render(engine.font_medium, f"剩餘情緒: {engine.current_mileage}", engine.BLACK)
+        instr_rendered = engine.text_cache.render(engine.font_small, "按 Q 鍵返回主選單", (80, 80, 80))
+
+        text_y = int(engine.screen_height * 0.25)
+        pad = int(engine.screen_height * 0.05)
+        self.blit_centered(title_rendered, text_y)
+        text_y += title_rendered.get_height() + pad
+        self.blit_centered(score_rendered, text_y)
+        text_y += score_rendered.get_height() + pad
+        self.blit_centered(mileage_rendered, text_y)
+        text_y += score_rendered.get_height() + pad * 2
+        self.blit_centered(instr_rendered, text_y)
+
+
+class SceneManager:
+    """持有目前的畫面，每次 tick() 處理一幀: 事件 → update → draw → 等待下一幀 (FramePacer)。"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.current = None
+        self.quit_requested = False
+        self.last_pump_time = None # 本幀 event.get() 返回的時間，作為按鍵輸入的來源時間
+        self._last_tick = None
+
+    def change(self, scene):
+        """立即切換畫面 (本幀就會以新畫面繪製)。"""
+        if self.current is not None:
+            self.current.on_exit()
+        scene.manager = self
+        self.current = scene
+        scene.on_enter()
+
+    def tick(self):
+        """
+        執行一幀。關閉視窗 (pygame.QUIT) 時設定 quit_requested 並交由畫面處理，不會結束程式。
+        回傳:
+            bool: False 表示已要求結束程式。
+        """
+        engine = self.engine
+        profiler = engine.profiler
+        now = time.perf_counter()
+        dt_ms = 0.0 if self._last_tick is None else min((now - self._last_tick) * 1000, engine.MAX_FRAME_TIME_MS)
+        self._last_tick = now
+
+        scene = self.current
+        profiler.begin_frame(scene.name if scene else 'idle')
+        events = pygame.event.get()
+        self.last_pump_time = time.perf_counter()
+        profiler.mark('event_pump')
+        for event in events:
+            if event.type == pygame.QUIT:
+                self.quit_requested = True
+            elif event.type == pygame.KEYDOWN and event.key == engine.PROFILER_TOGGLE_KEY:
+                profiler.toggle_overlay()
+                if self.current:
+                    self.current.invalidate()
+                continue
+            if self.current:
+                self.current.handle_event(event)
+        profiler.mark('input')
+
+        if self.current:
+            self.current.update(dt_ms)
+            profiler.mark('simulation')
+            self.current.draw()
+        work_ms = (time.perf_counter() - now) * 1000
+        if self.current:
+            engine.record_frame_work(self.current, work_ms)
+
+        engine.pace_frame(work_ms)
+        profiler.mark('tick_wait')
+        profiler.end_frame()
+        return not self.quit_requested
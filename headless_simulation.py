@@ -0,0 +1,253 @@
+# RandomGenerate/SPI_v2/headless_simulation.py
+"""
+無頭 (不開視窗、不使用時鐘) 的加速模擬與蒙地卡羅難度分析。
+
+以 GameSimulation 搭配可替換的機器人策略 (bot policy)，用固定種子盡可能快地跑完整局，
+再把大量局數分散到 process pool，統計每個初始情緒值 (initial_mileage) 的
+局長、得分與通關率分布，用於調整 OBSTACLE_SPEED_INITIAL、生成時間與加速公式。
+
+命令列用法:
+    python headless_simulation.py --mileages 50 100 200 350 --sessions 2000 \\
+        --policy reactive --set OBSTACLE_SPEED_INITIAL=6 -o sweep.json
+"""
+import argparse
+import inspect
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from game_simulation import GameSimulation, GameGeometry, logical_screen_size
+
+MAX_SESSION_STEPS = GameSimulation.SIM_HZ * 60 * 10 # 單局最多模擬 10 分鐘
+SESSIONS_PER_TASK = 50
+PERCENTILES = (10, 50, 90)
+
+
+class NeverJumpPolicy:
+    """從不跳躍 (基準線)。"""
+
+    def __init__(self, rng, **_params):
+        pass
+
+    def decide(self, sim):
+        return False
+
+
+class ReactiveBotPolicy:
+    """
+    模擬人類反應的策略：最近的障礙物進入反應距離時起跳。
+    反應距離以「步數 × 目前速度」計算，並加入高斯抖動與偶爾失誤。
+    """
+
+    def __init__(self, rng, lead_steps=14, jitter_steps=3.0, miss_rate=0.02):
+        self.rng = rng
+        self.lead_steps = lead_steps
+        self.jitter_steps = jitter_steps
+        self.miss_rate = miss_rate
+        self._planned_obstacle = None
+        self._trigger_distance = 0.0
+
+    def decide(self, sim):
+        if sim.is_jumping:
+            return False
+        geometry = sim.geometry
+        player_right = geometry.player_x + geometry.player_w
+        pool = sim.obstacles
+        # 障礙物由左到右排列，第一個右緣仍在玩家左緣之後的就是最近的
+        nearest_slot = None
+        for index in range(pool.scored_count, pool.count):
+            slot = pool.slot(index)
+            if sim.obstacle_x(slot) + pool.width[slot] > geometry.player_x:
+                nearest_slot = slot
+                break
+        if nearest_slot is None:
+            return False
+        nearest_world_x = pool.world_x[nearest_slot] # 世界座標在障礙物生命期間不變，可作為識別
+        if nearest_world_x != self._planned_obstacle:
+            # 看到新的障礙物時決定這次的反應距離 (或這次會失誤)
+            self._planned_obstacle = nearest_world_x
+            if self.rng.random() < self.miss_rate:
+                self._trigger_distance = -1.0e9
+            else:
+                lead = max(1.0, self.rng.gauss(self.lead_steps, self.jitter_steps))
+                self._trigger_distance = lead * int(sim.obstacle_speed)
+        return sim.obstacle_x(nearest_slot) - player_right <= self._trigger_distance
+
+POLICIES = {
+    'never': NeverJumpPolicy,
+    'reactive': ReactiveBotPolicy
+}
+
+
+def make_simulation_class(overrides=None):
+    """依參數覆寫建立 GameSimulation 子類別 (例如 {'OBSTACLE_SPEED_INITIAL': 6.0})。"""
+    if not overrides:
+        return GameSimulation
+    unknown = [name for name in overrides if not hasattr(GameSimulation, name)]
+    if unknown:
+        raise ValueError(f"GameSimulation 沒有參數: {', '.join(unknown)}")
+    return type('TunedGameSimulation', (GameSimulation,), dict(overrides))
+
+
+def run_session(geometry, initial_mileage, seed, policy_name='reactive', policy_params=None,
+                simulation_class=GameSimulation, max_steps=MAX_SESSION_STEPS):
+    """
+    以固定種子跑完一局 (或達到 max_steps)。
+
+    回傳:
+        dict: {'steps', 'duration_sec', 'score', 'reason', 'cleared', 'jumps'}
+    """
+    sim = simulation_class(geometry, initial_mileage, rng=random.Random(seed))
+    policy = POLICIES[policy_name](random.Random(seed ^ 0x5EED), **(policy_params or {}))
+    while sim.game_active and sim.steps < max_steps:
+        if policy.decide(sim):
+            sim.request_jump()
+        sim.step()
+    return {
+        'steps': sim.steps,
+        'duration_sec': sim.steps / GameSimulation.SIM_HZ,
+        'score': sim.score,
+        'reason': sim.game_over_reason or 'timeout',
+        'cleared': sim.game_over_reason == 'mileage_zero',
+        'jumps': sim.jumps
+    }
+
+
+def _run_session_batch(task):
+    """Worker: 跑一批連續種子的局，只回傳統計需要的欄位以減少程序間傳輸。"""
+    screen_size, initial_mileage, first_seed, count, policy_name, policy_params, overrides = task
+    geometry = GameGeometry.for_screen(*logical_screen_size(screen_size)) # 與引擎相同：在輸出解析度的邏輯解析度上模擬
+    simulation_class = make_simulation_class(overrides)
+    rows = []
+    for seed in range(first_seed, first_seed + count):
+        result = run_session(geometry, initial_mileage, seed, policy_name, policy_params, simulation_class)
+        rows.append((result['duration_sec'], result['score'], result['cleared']))
+    return initial_mileage, rows
+
+
+def _percentiles(values):
+    ordered = sorted(values)
+    if not ordered:
+        return {f'p{p}': 0.0 for p in PERCENTILES}
+    return {f'p{p}': ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in PERCENTILES}
+
+
+def run_difficulty_sweep(mileages, sessions_per_mileage, policy_name='reactive', policy_params=None,
+                         overrides=None, screen_size=(800, 600), workers=None, base_seed=0):
+    """
+    對每個初始情緒值跑 sessions_per_mileage 局，分散到 process pool。
+
+    回傳:
+        dict: {initial_mileage: {'sessions', 'clear_rate', 'duration_sec', 'score', 'mean_duration_sec', 'mean_score'}}
+    """
+    make_simulation_class(overrides) # 提早檢查參數名稱
+    tasks = []
+    for mileage in mileages:
+        for offset in range(0, sessions_per_mileage, SESSIONS_PER_TASK):
+            count = min(SESSIONS_PER_TASK, sessions_per_mileage - offset)
+            tasks.append((tuple(screen_size), mileage, base_seed + offset, count, policy_name, policy_params, overrides))
+
+    collected = {mileage: [] for mileage in mileages}
+    if workers == 1:
+        batches = map(_run_session_batch, tasks)
+        for mileage, rows in batches:
+            collected[mileage].extend(rows)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for mileage, rows in executor.map(_run_session_batch, tasks):
+                collected[mileage].extend(rows)
+
+    report = {}
+    for mileage, rows in collected.items():
+        durations = [r[0] for r in rows]
+        scores = [r[1] for r in rows]
+        report[mileage] = {
+            'sessions': len(rows),
+            'clear_rate': sum(1 for r in rows if r[2]) / len(rows) if rows else 0.0,
+            'mean_duration_sec': sum(durations) / len(rows) if rows else 0.0,
+            'mean_score': sum(scores) / len(rows) if rows else 0.0,
+            'duration_sec': _percentiles(durations),
+            'score': _percentiles(scores)
+        }
+    return report
+
+
+def check_engine_geometry(output_size=(1920, 1080), render_scale=0.5):
+    """
+    以 SDL dummy 驅動建立 HdmiGameEngine，確認引擎與無頭模擬對同一輸出解析度建立相同的 GameGeometry。
+    回傳:
+        tuple: (是否相同, 引擎的幾何資訊, 無頭模擬的幾何資訊)
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from hdmi_game_engine import HdmiGameEngine
+    from session_replay import geometry_matches
+    engine = HdmiGameEngine(*output_size, render_scale=render_scale, fullscreen=False)
+    try:
+        engine_geometry = engine._build_game_geometry()
+    finally:
+        engine.cleanup()
+    headless_geometry = GameGeometry.for_screen(*logical_screen_size(output_size))
+    return geometry_matches(engine_geometry, headless_geometry), engine_geometry, headless_geometry
+
+
+def _parse_overrides(pairs, defaults=None):
+    """解析 NAME=VALUE；defaults 中有預設值的名稱轉成與預設值相同的型別 (例如 *_MS 常數為 int)，其餘轉成 float。"""
+    overrides = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition('=')
+        name = name.strip()
+        default = (defaults or {}).get(name)
+        value_type = type(default) if isinstance(default, (int, float)) and not isinstance(default, bool) else float
+        overrides[name] = value_type(value)
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="無頭加速模擬與難度分析。")
+    parser.add_argument('--mileages', type=int, nargs='+', default=[50, 100, 200, 350], help="要分析的初始情緒值")
+    parser.add_argument('--sessions', type=int, default=1000, help="每個初始情緒值的局數")
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='reactive')
+    parser.add_argument('--policy-param', action='append', default=[], metavar='NAME=VALUE', help="策略參數，例如 lead_steps=12")
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE', help="覆寫 GameSimulation 參數，例如 OBSTACLE_SPEED_INITIAL=6")
+    parser.add_argument('--screen', type=int, nargs=2, default=[800, 600], metavar=('W', 'H'),
+                        help="輸出解析度；與引擎相同，實際在同長寬比、高度固定的邏輯解析度上模擬")
+    parser.add_argument('--check-geometry', action='store_true', help="只確認引擎與無頭模擬對 --screen 建立相同的幾何資訊")
+    parser.add_argument('--workers', type=int, default=None, help="process 數量 (預設為 CPU 核心數，1 表示不使用 pool)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default=None, help="輸出報告 JSON 路徑")
+    args = parser.parse_args()
+
+    if args.check_geometry:
+        matches, engine_geometry, headless_geometry = check_engine_geometry(tuple(args.screen))
+        print(f"HeadlessSimulation: {args.screen[0]}x{args.screen[1]} 的幾何資訊{'相同' if matches else '不同'}"
+              f" (引擎 {vars(engine_geometry)}，無頭 {vars(headless_geometry)})。")
+        raise SystemExit(0 if matches else 1)
+
+    overrides = _parse_overrides(args.set, {name: getattr(GameSimulation, name) for name in dir(GameSimulation) if name.isupper()})
+    policy_signature = inspect.signature(POLICIES[args.policy].__init__)
+    policy_params = _parse_overrides(args.policy_param, {name: param.default for name, param in policy_signature.parameters.items()})
+    total = len(args.mileages) * args.sessions
+    print(f"HeadlessSimulation: {total} 局 (策略 {args.policy}，覆寫 {overrides or '無'})，workers={args.workers or os.cpu_count()}")
+
+    start = time.perf_counter()
+    report = run_difficulty_sweep(args.mileages, args.sessions, args.policy, policy_params, overrides,
+                                  tuple(args.screen), args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'初始情緒':>8}{'通關率':>9}{'平均秒數':>10}{'p50秒':>8}{'p90秒':>8}{'平均分數':>10}")
+    for mileage, entry in report.items():
+        print(f"{mileage:>8}{entry['clear_rate'] * 100:>8.1f}%{entry['mean_duration_sec']:>10.1f}"
+              f"{entry['duration_sec']['p50']:>8.1f}{entry['duration_sec']['p90']:>8.1f}{entry['mean_score']:>10.1f}")
+    print(f"耗時 {elapsed:.1f}s ({total / elapsed:.0f} 局/秒)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'overrides': overrides, 'policy': args.policy, 'policy_params': policy_params,
+                       'elapsed_sec': round(elapsed, 2), 'results': report}, f, ensure_ascii=False, indent=2)
+        print(f"報告已寫入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+# RandomGenerate/SPI_v2/latency_tracer.py
+"""
+輸入到畫面 (input-to-photon) 的延遲追蹤。
+
+每個跳躍輸入記錄四個時間點 (time.perf_counter):
+    來源    拍擊的取樣時間 / 按鍵被 event.get() 取出的時間 (模擬輸入可自帶 sample_time)
+    消化    GameScene 處理事件、交給模擬的時間
+    模擬    之後第一個套用到它的固定步長執行完的時間
+    送出    之後第一次 display.flip() / update() / Renderer.present() 返回的時間
+並把相鄰時間點的差分別累計到各階段的直方圖:
+    queue       來源 → 消化 (感測器輪詢、事件佇列、clock.tick 的等待)
+    simulation  消化 → 模擬 (固定步長累加器)
+    render      模擬 → 送出 (繪圖與送出畫面)
+    total       來源 → 送出
+
+直方圖為固定大小的 array，每個輸入只做幾次加法；每幀沒有輸入在途時只有一次 list 判斷。
+"""
+import json
+import os
+import threading
+import time
+from array import array
+
+import pygame
+
+from frame_profiler import prune_old_files, timestamped_path
+
+STAGES = ('queue', 'simulation', 'render', 'total')
+
+
+class LatencyHistogram:
+    """固定寬度區間的延遲直方圖 (ms)，超出範圍的計入最後一格。"""
+
+    def __init__(self, bucket_ms=0.25, bucket_count=400):
+        self.bucket_ms = bucket_ms
+        self.counts = array('I', [0]) * (bucket_count + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, value_ms):
+        index = int(value_ms / self.bucket_ms)
+        last = len(self.counts) - 1
+        self.counts[index if index < last else last] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        if value_ms > self.max_ms:
+            self.max_ms = value_ms
+
+    def percentile(self, percent):
+        """以區間上緣估計百分位數。"""
+        if not self.count:
+            return 0.0
+        target = self.count * percent / 100
+        running = 0
+        for index, bucket_count in enumerate(self.counts):
+            running += bucket_count
+            if running >= target:
+                return min(self.max_ms, (index + 1) * self.bucket_ms)
+        return self.max_ms
+
+    def fraction_within(self, limit_ms):
+        """不超過 limit_ms 的比例 (以區間估計)。"""
+        if not self.count:
+            return 0.0
+        buckets = int(limit_ms / self.bucket_ms)
+        return sum(self.counts[:buckets]) / self.count
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50), 3),
+            'p95_ms': round(self.percentile(95), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'max_ms': round(self.max_ms, 3)
+        }
+
+    def buckets(self):
+        """非零區間 {區間下緣 ms: 次數}，輸出檔使用。"""
+        return {round(index * self.bucket_ms, 3): bucket_count for index, bucket_count in enumerate(self.counts) if bucket_count}
+
+
+class InputLatencyTracer:
+    """追蹤在途的輸入，並依輸入來源 (keyboard / piezo / ...) 分開累計各階段直方圖。"""
+
+    def __init__(self, bucket_ms=0.25, bucket_count=400):
+        self.bucket_ms = bucket_ms
+        self.bucket_count = bucket_count
+        self.reset()
+
+    def reset(self):
+        self.histograms = {}
+        self._pending = [] # [來源, 來源時間, 消化時間, 模擬時間或 None]
+
+    def _histograms_for(self, source):
+        histograms = self.histograms.get(source)
+        if histograms is None:
+            histograms = self.histograms[source] = {stage: LatencyHistogram(self.bucket_ms, self.bucket_count) for stage in STAGES}
+        return histograms
+
+    def input_consumed(self, source, source_time, now=None):
+        self._pending.append([source, source_time, time.perf_counter() if now is None else now, None])
+
+    def simulation_stepped(self, now=None):
+        """本幀至少執行了一個模擬步。"""
+        if not self._pending:
+            return
+        now = time.perf_counter() if now is None else now
+        for record in self._pending:
+            if record[3] is None:
+                record[3] = now
+
+    def frame_presented(self, now=None):
+        """畫面已送出：已被模擬套用的輸入完成追蹤。"""
+        if not self._pending:
+            return
+        now = time.perf_counter() if now is None else now
+        remaining = []
+        for record in self._pending:
+            source, source_time, consumed_time, step_time = record
+            if step_time is None:
+                remaining.append(record)
+                continue
+            histograms = self._histograms_for(source)
+            histograms['queue'].add((consumed_time - source_time) * 1000)
+            histograms['simulation'].add((step_time - consumed_time) * 1000)
+            histograms['render'].add((now - step_time) * 1000)
+            histograms['total'].add((now - source_time) * 1000)
+        self._pending = remaining
+
+    def merge(self, other):
+        """把另一個追蹤器 (例如前一局) 的直方圖累加進來。"""
+        for source, histograms in other.histograms.items():
+            mine = self._histograms_for(source)
+            for stage, histogram in histograms.items():
+                target = mine[stage]
+                for index, bucket_count in enumerate(histogram.counts):
+                    target.counts[index] += bucket_count
+                target.count += histogram.count
+                target.total_ms += histogram.total_ms
+                target.max_ms = max(target.max_ms, histogram.max_ms)
+
+    def histogram(self, source, stage):
+        histograms = self.histograms.get(source)
+        return histograms[stage] if histograms else None
+
+    def summary(self):
+        """{來源: {階段: {'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'}}}"""
+        return {source: {stage: histogram.summary() for stage, histogram in histograms.items()}
+                for source, histograms in self.histograms.items()}
+
+    def export(self, directory, prefix='input_latency', keep_files=None):
+        """把各來源、各階段的摘要與直方圖寫成 JSON，回傳檔案路徑 (沒有資料時回傳 None)；keep_files 指定時只保留最新的幾個檔案。"""
+        if not self.histograms:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = timestamped_path(directory, prefix)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'bucket_ms': self.bucket_ms,
+                       'summary': self.summary(),
+                       'histograms': {source: {stage: histogram.buckets() for stage, histogram in histograms.items()}
+                                      for source, histograms in self.histograms.items()}}, f, indent=1)
+        if keep_files:
+            prune_old_files(directory, f"{prefix}_*.json", keep_files)
+        return path
+
+
+def post_simulated_input(source='keyboard', amplitude=1.0):
+    """
+    投遞一個帶有 sample_time 的模擬輸入事件 (可從其他執行緒呼叫)，
+    與實際按鍵 / 拍擊走相同的事件處理與追蹤流程。
+    """
+    from piezo_input import PIEZO_STRIKE_EVENT
+    now = time.perf_counter()
+    if source == 'piezo':
+        event = pygame.event.Event(PIEZO_STRIKE_EVENT, amplitude=amplitude, channel='simulated', sample_time=now)
+    else:
+        event = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE, mod=0, unicode=' ', scancode=0, sample_time=now)
+    pygame.event.post(event)
+
+
+def run_latency_benchmark(duration_sec=10.0, inputs_per_sec=4.0, source='piezo', render_mode='dirty',
+                          screen_size=(800, 600), seed=1):
+    """
+    以 SDL dummy 驅動跑一段遊戲，由另一個執行緒在隨機時間投遞模擬輸入，回傳延遲摘要。
+    遊戲結束 (碰撞) 時立即重新開始，直到 duration_sec。
+    """
+    import random
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from hdmi_game_engine import HdmiGameEngine
+    from hdmi_scenes import GameScene
+
+    engine = HdmiGameEngine(*screen_size, render_mode=render_mode, background_style='parallax')
+    combined = InputLatencyTracer()
+    stop = threading.Event()
+    rng = random.Random(seed)
+
+    def feed_inputs():
+        while not stop.wait(rng.expovariate(inputs_per_sec)):
+            post_simulated_input(source, amplitude=rng.uniform(0.2, 1.5))
+
+    feeder = threading.Thread(target=feed_inputs, daemon=True)
+    try:
+        engine.scene_manager.change(GameScene(engine, 10 ** 6))
+        feeder.start()
+        end_time = time.perf_counter() + duration_sec
+        while time.perf_counter() < end_time:
+            if not engine.game_active:
+                combined.merge(engine.latency_tracer) # 新的一局會重置引擎的追蹤器
+                engine.scene_manager.change(GameScene(engine, 10 ** 6))
+            engine.tick()
+        stop.set()
+        feeder.join()
+        combined.merge(engine.latency_tracer)
+        return combined.summary()
+    finally:
+        stop.set()
+        engine.cleanup()
+
+
+if __name__ == '__main__':
+    import sys
+    benchmark_source = sys.argv[1] if len(sys.argv) > 1 else 'piezo'
+    report = run_latency_benchmark(source=benchmark_source)
+    for input_source, stages in report.items():
+        print(f"\n{input_source}: {'階段':<12}{'次數':>6}{'平均':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'最大':>8} (ms)")
+        for stage, values in stages.items():
+            print(f"{'':<{len(input_source) + 2}}{stage:<12}{values['count']:>6}{values['mean_ms']:>8.2f}{values['p50_ms']:>8.2f}"
+                  f"{values['p95_ms']:>8.2f}{values['p99_ms']:>8.2f}{values['max_ms']:>8.2f}")
+    pygame.quit()
@@ -1,5 +1,6 @@
 # RandomGenerate/SPI_v2/led_controller.py
 import time
+from concurrent.futures import ThreadPoolExecutor
 from rpi_ws281x import Adafruit_NeoPixel, Color
 
 class LedController:
@@ -22,6 +23,8 @@ class LedController:
         self.rainbow_j_offset = 0  # 用於彩虹動畫的內部狀態
         self.is_on = False # 追蹤燈條是否已 begin
         self.default_brightness = brightness # 儲存初始亮度
+        self._effect_executor = None # 阻塞燈效的背景執行緒 (第一次 play_effect 時建立)
+        self._last_effect = None
 
     def begin(self):
         """啟動 LED 燈條通訊。"""
@@ -37,6 +40,27 @@ class LedController:
             self.strip = None 
             self.is_on = False
 
+    def play_effect(self, effect, *args, **kwargs):
+        """
+        在 LED 執行緒上執行阻塞的燈效 (例如 play_effect(self.color_wipe, Color(0, 255, 0), wait_ms=25))，立即返回。
+        主迴圈在燈效進行中繼續更新畫面；多個燈效依提交順序執行，燈條不會被兩個執行緒同時寫入。
+        """
+        if self._effect_executor is None:
+            self._effect_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='led-effect')
+        self._last_effect = self._effect_executor.submit(effect, *args, **kwargs)
+        return self._last_effect
+
+    def is_effect_running(self):
+        """是否還有 play_effect 提交的燈效尚未完成 (此時主迴圈不應直接寫入燈條)。"""
+        return self._last_effect is not None and not self._last_effect.done()
+
+    def stop_effects(self):
+        """取消排隊中的燈效並等待進行中的燈效結束 (程式結束前呼叫)。"""
+        if self._effect_executor is not None:
+            self._effect_executor.shutdown(wait=True, cancel_futures=True)
+            self._effect_executor = None
+            self._last_effect = None
+
     def _wheel(self, pos):
         """內部輔助函式，產生彩虹循環中的單一顏色。"""
         # pos 在 0-255 之間
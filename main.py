@@ -3,10 +3,13 @@ import RPi.GPIO as GPIO
 import pygame # Pygame 的 init/quit 需要在此層級管理
 import signal
 import sys # 用於 sys.exit()
+from concurrent.futures import ThreadPoolExecutor
 # import board # 由 system_configurator 內部處理
 
 # 從新模組匯入初始化函式和控制器類別 (儘管類別主要由 configurator 內部使用)
 from system_configurator import initialize_systems, cleanup_systems, BUTTON_PIN, MUSIC_DEFAULT_VOLUME, MUSIC_GAME_VOLUME # 直接從設定檔取用 BUTTON_PIN 和音量常數
+from system_configurator import MEASUREMENT_DURATION_SEC, MEASUREMENT_ADAPTIVE, MEASUREMENT_ADAPTIVE_OPTIONS
+from system_configurator import HDMI_GAME_MODE
 # from .led_controller import LedController # 已由 system_configurator 處理
 # from .sensor_handler import SensorHandler # 已由 system_configurator 處理
 # from .emotion_calculator import EmotionCalculator # 已由 system_configurator 處理
@@ -17,6 +20,17 @@ from led_controller import LedController, Color # 修正此處的匯入
 
 # --- 全域常數 ---
 GAME_START_THRESHOLD = 10 # 啟動遊戲所需的情緒指數閾值
+RESULTS_MUSIC_WAIT_SEC = 5 # 遊戲結束後等待結束音樂 (或玩家看 LCD 結果) 的最長時間
+RESULTS_NO_MUSIC_WAIT_SEC = 3
+RETRY_MESSAGE_SEC = 2 # 情緒不足提示的顯示時間
+IDLE_LOOP_SLEEP_SEC = 0.02 # 沒有 HDMI 引擎 (不會等待下一幀) 時每圈的等待時間
+
+# 主迴圈階段
+PHASE_STANDBY = 'standby'       # 待機，等待按鈕
+PHASE_MEASURING = 'measuring'   # 背景執行緒測量情緒中
+PHASE_GAME = 'game'             # HDMI 遊戲流程進行中 (開始前序列、遊戲、結束畫面)
+PHASE_RESULTS = 'results'       # 顯示結果並等待結束音樂
+PHASE_RETRY = 'retry'           # 情緒不足提示
 
 # ===== 主程式 =====
 def main():
@@ -65,8 +79,12 @@ def main():
         signal.signal(signal.SIGINT, signal_handler_main)
         signal.signal(signal.SIGTERM, signal_handler_main)
         
-        waiting_for_button = True
         rainbow_j_offset = 0
+        phase = PHASE_STANDBY
+        phase_deadline = 0.0 # PHASE_RESULTS / PHASE_RETRY 的結束時間
+        measurement_future = None
+        # 情緒測量 (讀取 ADC 數秒) 在背景執行緒進行，主迴圈同時更新 HDMI 畫面與 LED
+        measurement_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='emotion-measure')
         
         if music_player:
             music_player.play_random_music(category='default', loop=True)
@@ -82,128 +100,157 @@ def main():
         if led_controller:
             led_controller.reset_rainbow_animation_state() # 確保彩虹從頭開始
 
+        def return_to_standby():
+            if spi_lcd_display: spi_lcd_display.show_standby_message("按鈕啟動")
+            if hdmi_game_engine: # 新增：遊戲結束後更新 HDMI 待機畫面
+                hdmi_game_engine.show_hdmi_standby_screen(title="準備就緒", line1="按按鈕重新開始")
+            if led_controller: 
+                led_controller.reset_rainbow_animation_state() # 為下一次待機準備彩虹
+            print("\n系統已返回待機狀態，等待按鈕按下...")
+            return PHASE_STANDBY
+
+        def show_game_results(game_results):
+            """
+            遊戲結束後的 LED、音樂與 LCD 處理，回傳等待結果畫面的秒數。
+            燈效交給 LED 執行緒 (play_effect) 執行，主迴圈繼續 tick() 結束畫面與處理輸入。
+            """
+            if music_player:
+                music_player.set_volume(MUSIC_DEFAULT_VOLUME) 
+                music_player.switch_to_category('game_over', loop=False)
+            
+            if led_controller and game_results: # 遊戲結束燈效
+                reason = game_results.get('reason')
+                print(f"LED：遊戲結束，原因: {reason}")
+                if reason == "mileage_zero": # 成功
+                    led_controller.play_effect(led_controller.color_wipe, Color(0, 255, 0), wait_ms=25) # 綠色擦拭
+                    led_controller.play_effect(led_controller.rainbow_effect, wait_ms=20, iterations=1) # 短暫勝利彩虹
+                elif reason == "collision": # 失敗
+                    led_controller.play_effect(led_controller.color_wipe, Color(255, 0, 0), wait_ms=25) # 紅色擦拭
+                    led_controller.play_effect(led_controller.show_flash_pattern, Color(150,0,0), times=4, duration_on=0.15, duration_off=0.1)
+                else: # 其他退出情況 (例如按Q)
+                    led_controller.play_effect(led_controller.color_wipe, Color(0,0,0), wait_ms=10) # 快速熄滅
+            
+            if spi_lcd_display and game_results:
+                spi_lcd_display.display_game_results(
+                    game_results.get('score', 0),
+                    game_results.get('final_mileage', 0),
+                    game_results.get('reason', 'unknown')
+                )
+            # 等待一段時間讓玩家看 LCD 結果，同時播放結束音樂
+            return RESULTS_MUSIC_WAIT_SEC if music_player else RESULTS_NO_MUSIC_WAIT_SEC
+
         print("\n系統已就緒，等待按鈕按下以開始測量情緒...")
         
         while running_main_loop[0]:
-            if waiting_for_button:
-                if led_controller:
+            # 每圈處理一幀 HDMI 畫面與 Pygame 事件 (由 FramePacer 控制迴圈速度)
+            if hdmi_game_engine:
+                if not hdmi_game_engine.tick():
+                    print("Pygame QUIT 事件觸發主迴圈退出。")
+                    running_main_loop[0] = False
+                    break
+            else:
+                time.sleep(IDLE_LOOP_SLEEP_SEC)
+                if pygame.get_init(): # 沒有 HDMI 引擎時仍處理 QUIT 事件
+                    for event in pygame.event.get():
+                        if event.type == pygame.QUIT:
+                            print("Pygame QUIT 事件觸發主迴圈退出。")
+                            running_main_loop[0] = False
+                if not running_main_loop[0]:
+                    break
+            now = time.time()
+
+            if phase == PHASE_STANDBY:
+                if led_controller and not led_controller.is_effect_running(): # 結束燈效播完後才回到彩虹
                     led_controller.update_rainbow_cycle_frame(rainbow_j_offset) # 主迴圈控制彩虹動畫幀更新
                     rainbow_j_offset = (rainbow_j_offset + 1) % (256*5) # 調整彩虹長度和速度
-                time.sleep(0.02) # 稍微降低待機時的更新頻率
                 
                 if GPIO.input(BUTTON_PIN) == GPIO.HIGH:
                     print("\n按鈕已按下！")
-                    waiting_for_button = False
                     
                     if led_controller: 
                         print("LED：按鈕按下，執行戲院追逐彩虹燈效...")
-                        # 執行一個短暫的、炫彩的阻塞動畫作為測量提示
-                        led_controller.theater_chase_rainbow(wait_ms=40, iterations=1, cycle_limit=20) 
+                        # 短暫的炫彩動畫作為測量提示 (在 LED 執行緒播放，測量畫面同時開始)
+                        led_controller.play_effect(led_controller.theater_chase_rainbow, wait_ms=40, iterations=1, cycle_limit=20)
                     
                     if music_player: music_player.fade_out(300)
                     if spi_lcd_display: spi_lcd_display.display_message(["測量情緒中..."], font_size='large')
                     if hdmi_game_engine: 
-                        hdmi_game_engine.show_measuring_emotion_screen(duration=3)
+                        hdmi_game_engine.show_measuring_emotion_screen(duration=MEASUREMENT_DURATION_SEC, emotion_calculator=emotion_calculator)
 
-                    emotion_index = 0
                     if sensor_handler and emotion_calculator:
-                        emotion_index = get_player_emotion_index(
-                            sensor_handler, emotion_calculator, duration_sec=3
+                        measurement_future = measurement_executor.submit(
+                            get_player_emotion_index, sensor_handler, emotion_calculator,
+                            duration_sec=MEASUREMENT_DURATION_SEC,
+                            adaptive_options=MEASUREMENT_ADAPTIVE_OPTIONS if MEASUREMENT_ADAPTIVE else None
                         )
                     else:
                         print("錯誤: 感測器或情緒計算器未初始化，無法獲取情緒指數。")
-                        emotion_index = GAME_START_THRESHOLD + 1 # 模擬一個值以便測試流程
-
-                    if emotion_index >= GAME_START_THRESHOLD:
-                        print(f"測量完成！負面情緒指數: {emotion_index}")
-                        if spi_lcd_display: spi_lcd_display.display_message([f"情緒值: {emotion_index}", "準備開始遊戲"], font_size='medium')
-                        
-                        if music_player: 
-                            music_player.set_volume(MUSIC_GAME_VOLUME) 
-                            music_player.switch_to_category('game', loop=True)
-                        
-                        game_results = None
-                        if hdmi_game_engine:
-                            print("啟動 HDMI 遊戲...")
-                            game_results = hdmi_game_engine.run_game(emotion_index)
-                            print(f"HDMI 遊戲結束。結果: {game_results}")
-                        else:
-                            print("錯誤: HDMI 遊戲引擎未初始化，無法啟動遊戲。")
-                            # 模擬遊戲結果以便流程繼續
-                            game_results = {'score': 0, 'final_mileage': emotion_index, 'reason': 'engine_fail'}
+                        measurement_future = None
+                    phase = PHASE_MEASURING
 
-                        # 遊戲結束後的 LED 和音樂處理
-                        if music_player:
-                            music_player.set_volume(MUSIC_DEFAULT_VOLUME) 
-                            music_player.switch_to_category('game_over', loop=False)
-                        
-                        if led_controller and game_results: # 遊戲結束燈效
-                            reason = game_results.get('reason')
-                            print(f"LED：遊戲結束，原因: {reason}")
-                            if reason == "mileage_zero": # 成功
-                                led_controller.color_wipe(Color(0, 255, 0), wait_ms=25) # 綠色擦拭
-                                time.sleep(0.5)
-                                led_controller.rainbow_effect(wait_ms=20, iterations=1) # 短暫勝利彩虹
-                            elif reason == "collision": # 失敗
-                                led_controller.color_wipe(Color(255, 0, 0), wait_ms=25) # 紅色擦拭
-                                time.sleep(0.5)
-                                led_controller.show_flash_pattern(Color(150,0,0), times=4, duration_on=0.15, duration_off=0.1)
-                            else: # 其他退出情況 (例如按Q)
-                                led_controller.color_wipe(Color(0,0,0), wait_ms=10) # 快速熄滅
-                            # time.sleep(1.5) # 等待顯示效果後，HdmiGameEngine的clear會執行
-                        
-                        if spi_lcd_display and game_results:
-                            spi_lcd_display.display_game_results(
-                                game_results.get('score', 0),
-                                game_results.get('final_mileage', 0),
-                                game_results.get('reason', 'unknown')
-                            )
-                        
-                        # 等待一段時間讓玩家看 LCD 結果，同時播放結束音樂
-                        if music_player and music_player.is_music_playing():
-                            wait_start_time = time.time()
-                            while music_player.is_music_playing() and (time.time() - wait_start_time < 5):
-                                time.sleep(0.1) # 等待音樂播放或最多5秒
-                            music_player.stop() # 確保音樂停了
-                        elif not music_player:
-                            time.sleep(3) # 如果沒有音樂播放器，固定等待3秒
-                        
-                        if music_player: 
-                            # music_player.stop() # 確保音樂停了 (switch_to_category 內部會先 stop)
-                            music_player.set_volume(MUSIC_DEFAULT_VOLUME) # 確保切回預設音樂時是預設音量
-                            music_player.switch_to_category('default', loop=True)
+            elif phase == PHASE_MEASURING:
+                if measurement_future is not None and not measurement_future.done():
+                    continue # 測量中，畫面動畫由 tick() 繼續更新
+                if measurement_future is not None:
+                    try:
+                        emotion_index = measurement_future.result()
+                    except Exception as e:
+                        print(f"錯誤: 測量情緒時發生例外: {e}")
+                        emotion_index = 0
+                else:
+                    emotion_index = GAME_START_THRESHOLD + 1 # 模擬一個值以便測試流程
+                measurement_future = None
 
-                    else:
-                        print(f"負面情緒指數 ({emotion_index}) 過低 (未達到 {GAME_START_THRESHOLD})。請再試一次。")
-                        if spi_lcd_display: spi_lcd_display.display_message(["情緒不足", "請再試一次"], font_size='large')
-                        time.sleep(2)
-                        if music_player: 
-                            music_player.set_volume(MUSIC_DEFAULT_VOLUME) # 確保是預設音量
-                            music_player.switch_to_category('default', loop=True)
+                if emotion_index >= GAME_START_THRESHOLD:
+                    print(f"測量完成！負面情緒指數: {emotion_index}")
+                    if spi_lcd_display: spi_lcd_display.display_message([f"情緒值: {emotion_index}", "準備開始遊戲"], font_size='medium')
                     
-                    if spi_lcd_display: spi_lcd_display.show_standby_message("按鈕啟動")
-                    if hdmi_game_engine: # 新增：遊戲結束後更新 HDMI 待機畫面
-                        hdmi_game_engine.show_hdmi_standby_screen(title="準備就緒", line1="按按鈕重新開始")
-                    if led_controller: 
-                        led_controller.reset_rainbow_animation_state() # 為下一次待機準備彩虹
+                    if music_player: 
+                        music_player.set_volume(MUSIC_GAME_VOLUME) 
+                        music_player.switch_to_category('game', loop=True)
                     
-                    waiting_for_button = True
-                    print("\n系統已返回待機狀態，等待按鈕按下...")
-            
-            # 處理 Pygame 事件以保持視窗回應 (主要由 HdmiGameEngine 內部處理，但以防萬一)
-            # 也確保在遊戲引擎未運行時，主迴圈仍能處理 QUIT 事件
-            if pygame.get_init():
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        print("Pygame QUIT 事件觸發主迴圈退出。")
-                        running_main_loop[0] = False
-            
-            if not running_main_loop[0]: # 如果信號或事件要求退出
-                break
-            
-            # 在非等待按鈕且非 LED 更新的快速迴圈中，稍作延遲
-            if not waiting_for_button:
-                 time.sleep(0.01)
+                    if hdmi_game_engine:
+                        print("啟動 HDMI 遊戲...")
+                        hdmi_game_engine.start_mode(HDMI_GAME_MODE, emotion_index)
+                        phase = PHASE_GAME
+                    else:
+                        print("錯誤: HDMI 遊戲引擎未初始化，無法啟動遊戲。")
+                        # 模擬遊戲結果以便流程繼續
+                        game_results = {'score': 0, 'final_mileage': emotion_index, 'reason': 'engine_fail'}
+                        phase_deadline = now + show_game_results(game_results)
+                        phase = PHASE_RESULTS
+                else:
+                    print(f"負面情緒指數 ({emotion_index}) 過低 (未達到 {GAME_START_THRESHOLD})。請再試一次。")
+                    if spi_lcd_display: spi_lcd_display.display_message(["情緒不足", "請再試一次"], font_size='large')
+                    phase_deadline = now + RETRY_MESSAGE_SEC
+                    phase = PHASE_RETRY
+
+            elif phase == PHASE_GAME:
+                game_results = hdmi_game_engine.game_result
+                if game_results is not None:
+                    print(f"HDMI 遊戲結束。結果: {game_results}")
+                    phase_deadline = time.time() + show_game_results(game_results)
+                    phase = PHASE_RESULTS
+
+            elif phase == PHASE_RESULTS:
+                # 等待音樂播放完或到達時限
+                if now < phase_deadline and (not music_player or music_player.is_music_playing()):
+                    continue
+                if music_player: 
+                    music_player.stop() # 確保音樂停了
+                    music_player.set_volume(MUSIC_DEFAULT_VOLUME) # 確保切回預設音樂時是預設音量
+                    music_player.switch_to_category('default', loop=True)
+                phase = return_to_standby()
+
+            elif phase == PHASE_RETRY:
+                if now < phase_deadline:
+                    continue
+                if music_player: 
+                    music_player.set_volume(MUSIC_DEFAULT_VOLUME) # 確保是預設音量
+                    music_player.switch_to_category('default', loop=True)
+                phase = return_to_standby()
+
+        measurement_executor.shutdown(wait=False)
 
     except KeyboardInterrupt:
         print("\n主程式被使用者中斷 (Ctrl+C)。")
@@ -0,0 +1,177 @@
+# RandomGenerate/SPI_v2/parallax_background.py
+"""
+HdmiGameEngine 的分層背景：每層在解析度確定時預先繪製成可循環的橫向長條 (strip)，
+遊戲中依各自的視差速度捲動。
+
+- 靜態層 (天空漸層) 合併成一張 base_surface，也作為 DirtyRectRenderer 的還原背景。
+- 捲動層 (遠景天際線、近景建築、地面) 每層每幀最多 2 次 blit (循環接縫)，
+  與場景複雜度無關；各層所在的水平帶先以 base_surface 還原一次。
+- 同一解析度只繪製一次，之後從類別層級的快取取用。
+"""
+import random
+import pygame
+
+
+class ParallaxLayer:
+    """一個可水平循環捲動的背景層。"""
+
+    def __init__(self, name, strip, y, speed_factor):
+        """
+        參數:
+            name (str): 層名稱 (用於記憶體報告)。
+            strip (pygame.Surface): 寬度等於螢幕寬的循環長條，左右邊緣可無縫相接。
+            y (int): 長條在螢幕上的頂端位置。
+            speed_factor (float): 相對於障礙物速度的捲動比例，0 表示靜止。
+        """
+        self.name = name
+        self.strip = strip
+        self.y = y
+        self.speed_factor = speed_factor
+        self.offset = 0.0
+        self.band_rect = pygame.Rect(0, y, strip.get_width(), strip.get_height())
+
+    def scroll(self, distance_px):
+        self.offset = (self.offset + distance_px * self.speed_factor) % self.strip.get_width()
+
+    def draw(self, target):
+        """以最多兩次 blit 畫出循環長條。"""
+        x = -int(self.offset)
+        target.blit(self.strip, (x, self.y))
+        if x < 0:
+            target.blit(self.strip, (x + self.strip.get_width(), self.y))
+
+    def memory_bytes(self):
+        return self.strip.get_width() * self.strip.get_height() * self.strip.get_bytesize()
+
+
+class ParallaxBackground:
+    """預先繪製的分層背景。以 for_resolution() 取得，同一解析度只繪製一次。"""
+
+    _cache = {}
+
+    SKY_TOP_COLOR = (236, 232, 245)
+    SKY_HORIZON_COLOR = (255, 246, 240)
+    FAR_SKYLINE_COLOR = (205, 203, 218)
+    NEAR_SKYLINE_COLOR = (170, 168, 188)
+    WINDOW_COLOR = (245, 232, 170)
+    LAYOUT_SEED = 2024 # 固定種子，讓天際線在每次啟動都相同
+
+    @classmethod
+    def for_resolution(cls, screen_size, ground_y, ground_color):
+        key = (tuple(screen_size), ground_y, tuple(ground_color))
+        background = cls._cache.get(key)
+        if background is None:
+            background = cls(screen_size, ground_y, ground_color)
+            cls._cache[key] = background
+        background.reset_scroll()
+        return background
+
+    def __init__(self, screen_size, ground_y, ground_color):
+        self.width, self.height = screen_size
+        self.ground_y = ground_y
+        self.ground_color = ground_color
+        rng = random.Random(self.LAYOUT_SEED)
+
+        self.base_surface = self._build_sky()
+        self.layers = [
+            ParallaxLayer('far_skyline', self._build_skyline(rng, self.FAR_SKYLINE_COLOR, 0.15, 0.35, 50, 110, windows=False), 0, 0.15),
+            ParallaxLayer('near_skyline', self._build_skyline(rng, self.NEAR_SKYLINE_COLOR, 0.08, 0.22, 40, 90, windows=True), 0, 0.4),
+            ParallaxLayer('ground', self._build_ground(), ground_y, 1.0)
+        ]
+        # 天際線長條只涵蓋地面以上的建築高度範圍
+        for layer in self.layers[:2]:
+            layer.y = ground_y - layer.strip.get_height()
+            layer.band_rect.y = layer.y
+        self.dirty_bands = _merge_bands([layer.band_rect for layer in self.layers])
+        print(f"ParallaxBackground: 已預先繪製 {self.width}x{self.height} 背景，"
+              + "，".join(f"{name} {size / 1024:.0f} KB" for name, size in self.get_memory_report().items()))
+
+    def _build_sky(self):
+        surface = pygame.Surface((self.width, self.height)).convert()
+        top, bottom = self.SKY_TOP_COLOR, self.SKY_HORIZON_COLOR
+        for row in range(self.ground_y):
+            t = row / max(1, self.ground_y - 1)
+            color = tuple(int(top[i] + (bottom[i] - top[i]) * t) for i in range(3))
+            pygame.draw.line(surface, color, (0, row), (self.width, row))
+        pygame.draw.rect(surface, self.ground_color, (0, self.ground_y, self.width, self.height - self.ground_y))
+        return surface
+
+    def _build_skyline(self, rng, color, min_h_ratio, max_h_ratio, min_w, max_w, windows):
+        strip_h = int(self.height * max_h_ratio)
+        strip = pygame.Surface((self.width, strip_h), pygame.SRCALPHA).convert_alpha()
+        strip.fill((0, 0, 0, 0))
+        x = 0
+        while x < self.width:
+            building_w = rng.randint(min_w, max_w)
+            building_h = rng.randint(int(self.height * min_h_ratio), strip_h)
+            rect = pygame.Rect(x, strip_h - building_h, building_w, building_h)
+            lit_windows = []
+            if windows:
+                for wy in range(rect.top + 8, rect.bottom - 10, 16):
+                    for wx in range(rect.left + 6, rect.right - 8, 14):
+                        if rng.random() < 0.35:
+                            lit_windows.append(pygame.Rect(wx, wy, 5, 7))
+            # 超出右邊界的部分畫到左邊，確保長條可以無縫循環
+            for shift in (0, -self.width):
+                pygame.draw.rect(strip, color, rect.move(shift, 0))
+                for window_rect in lit_windows:
+                    pygame.draw.rect(strip, self.WINDOW_COLOR, window_rect.move(shift, 0))
+            x += building_w + rng.randint(0, 12)
+        return strip
+
+    def _build_ground(self):
+        ground_h = self.height - self.ground_y
+        strip = pygame.Surface((self.width, ground_h)).convert()
+        strip.fill(self.ground_color)
+        stripe_color = tuple(max(0, c - 18) for c in self.ground_color)
+        stripe_spacing = max(24, self.width // 20)
+        for x in range(0, self.width, stripe_spacing):
+            pygame.draw.line(strip, stripe_color, (x, 4), (x + stripe_spacing // 3, ground_h - 4), 3)
+        return strip
+
+    def reset_scroll(self):
+        for layer in self.layers:
+            layer.offset = 0.0
+
+    def scroll(self, distance_px):
+        """依前景 (障礙物) 移動的距離捲動各層。"""
+        for layer in self.layers:
+            layer.scroll(distance_px)
+
+    def set_scroll(self, total_distance_px):
+        """直接設定前景累計捲動距離 (可為插值後的小數)，各層依視差比例換算位置。"""
+        for layer in self.layers:
+            layer.offset = (total_distance_px * layer.speed_factor) % layer.strip.get_width()
+
+    def draw_layers(self, target):
+        """
+        還原捲動層所在的水平帶並畫出所有捲動層。
+        回傳本幀變動的區域列表 (供 dirty-rect 模式使用)。
+        """
+        for band in self.dirty_bands:
+            target.blit(self.base_surface, band, band)
+        for layer in self.layers:
+            layer.draw(target)
+        return self.dirty_bands
+
+    def blit_count_per_frame(self):
+        return len(self.dirty_bands) + 2 * len(self.layers)
+
+    def get_memory_report(self):
+        """回傳各層預繪 Surface 佔用的位元組數。"""
+        report = {'base': self.base_surface.get_width() * self.base_surface.get_height() * self.base_surface.get_bytesize()}
+        for layer in self.layers:
+            report[layer.name] = layer.memory_bytes()
+        return report
+
+
+def _merge_bands(rects):
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
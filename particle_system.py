@@ -0,0 +1,251 @@
+# RandomGenerate/SPI_v2/particle_system.py
+"""
+拍擊與碰撞的粒子效果。
+
+每個粒子若是一個 Python 物件，數千個粒子光是逐一更新就會吃掉整個幀預算。
+ParticleSystem 把位置、速度、剩餘壽命與顏色存放在預先配置、固定容量的 NumPy 陣列中：
+    - 更新 (重力、移動、落地反彈、移除死亡粒子) 全部是陣列運算，沒有逐粒子的 Python 迴圈
+    - 繪製只使用少數預先建立的精靈 (顏色 x 淡出階段，淡出以縮小表示，不需要 alpha 混色)，
+      以一次 Surface.blits() 批次貼上
+    - 容量用完時新的粒子直接捨棄並計數，不會配置新的記憶體
+
+粒子只是視覺效果，使用自己的亂數產生器，不影響 GameSimulation 與重播的結果。
+"""
+import time
+
+import numpy as np
+import pygame
+
+DEFAULT_PALETTE = ((255, 214, 90), (255, 150, 60), (255, 255, 255), (120, 200, 255)) # 拍擊: 金、橘、白、藍
+COLLISION_PALETTE = ((255, 80, 60), (255, 150, 60), (90, 90, 90))                     # 碰撞: 紅、橘、灰
+
+
+class ParticleSystem:
+    """固定容量、以 NumPy 陣列儲存的粒子系統。存活的粒子永遠排在陣列的前 count 格。"""
+
+    def __init__(self, capacity=4096, particle_size=4, palette=DEFAULT_PALETTE + COLLISION_PALETTE,
+                 fade_levels=4, gravity=900.0, bounce=0.35, seed=None):
+        """
+        參數:
+            capacity (int): 同時存在的粒子上限。
+            particle_size (int): 剛產生時的精靈邊長 (像素)。
+            palette (tuple): 可用的顏色，emit 以索引指定。
+            fade_levels (int): 淡出階段數，壽命越接近結束精靈越小。
+            gravity (float): 重力加速度 (px/s²)。
+            bounce (float): 落地反彈時保留的垂直速度比例。
+            seed (int, optional): 亂數種子。
+        """
+        self.capacity = capacity
+        self.palette = tuple(palette)
+        self.fade_levels = fade_levels
+        self.gravity = gravity
+        self.bounce = bounce
+        self.rng = np.random.default_rng(seed)
+        self.position = np.zeros((capacity, 2), dtype=np.float32)
+        self.velocity = np.zeros((capacity, 2), dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)     # 剩餘壽命 (秒)
+        self.max_life = np.ones(capacity, dtype=np.float32)  # 初始壽命 (秒)
+        self.color = np.zeros(capacity, dtype=np.uint8)      # palette 索引
+        self.count = 0
+        self.emitted = 0
+        self.dropped = 0
+        self._build_sprites(particle_size)
+
+    def _build_sprites(self, particle_size):
+        """每個顏色 x 淡出階段一個不透明的小方塊；_half 為各精靈的中心位移，繪製時以陣列查表。"""
+        self.sprites = []
+        half = []
+        for rgb in self.palette:
+            for level in range(self.fade_levels):
+                side = max(1, int(round(particle_size * (self.fade_levels - level) / self.fade_levels)))
+                sprite = pygame.Surface((side, side))
+                sprite.fill(rgb)
+                if pygame.display.get_surface() is not None:
+                    sprite = sprite.convert()
+                self.sprites.append(sprite)
+                half.append(side // 2)
+        self.particle_size = particle_size
+        self._half = np.array(half, dtype=np.int32)
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def emit(self, x, y, count, speed=(150.0, 450.0), angle=(0.0, np.pi), life=(0.4, 0.9), colors=(0, 1, 2)):
+        """
+        在 (x, y) 產生一批粒子，回傳實際產生的數量 (超過剩餘容量的部分捨棄)。
+
+        參數:
+            speed (tuple): 初速範圍 (px/s)。
+            angle (tuple): 發射角範圍 (弧度，0 為向右，π/2 為向上)。
+            life (tuple): 壽命範圍 (秒)。
+            colors (tuple): 隨機選用的 palette 索引。
+        """
+        count = int(count)
+        available = self.capacity - self.count
+        if count > available:
+            self.dropped += count - available
+            count = available
+        if count <= 0:
+            return 0
+        start, end = self.count, self.count + count
+        rng = self.rng
+        theta = rng.uniform(angle[0], angle[1], count)
+        magnitude = rng.uniform(speed[0], speed[1], count)
+        self.position[start:end, 0] = x
+        self.position[start:end, 1] = y
+        self.velocity[start:end, 0] = np.cos(theta) * magnitude
+        self.velocity[start:end, 1] = -np.sin(theta) * magnitude # 螢幕座標 y 向下
+        lifetimes = rng.uniform(life[0], life[1], count)
+        self.life[start:end] = lifetimes
+        self.max_life[start:end] = lifetimes
+        self.color[start:end] = rng.choice(np.asarray(colors, dtype=np.uint8), count)
+        self.count = end
+        self.emitted += count
+        return count
+
+    def update(self, dt_sec, floor_y=None):
+        """前進 dt_sec 秒；提供 floor_y 時粒子落到該高度會反彈。"""
+        n = self.count
+        if not n or dt_sec <= 0:
+            return
+        position = self.position[:n]
+        velocity = self.velocity[:n]
+        velocity[:, 1] += self.gravity * dt_sec
+        position += velocity * dt_sec
+        if floor_y is not None:
+            below = position[:, 1] > floor_y
+            if below.any():
+                position[below, 1] = floor_y
+                velocity[below, 1] *= -self.bounce
+                velocity[below, 0] *= 0.7
+        life = self.life[:n]
+        life -= dt_sec
+        alive = life > 0
+        alive_count = int(np.count_nonzero(alive))
+        if alive_count < n: # 把存活的粒子往前搬，維持 [0, count) 都是存活粒子
+            for array in (self.position, self.velocity, self.life, self.max_life, self.color):
+                array[:alive_count] = array[:n][alive]
+            self.count = alive_count
+
+    def blit_sequence(self):
+        """
+        回傳本幀 (精靈, (x, y)) 的迭代器，可直接交給 Surface.blits() 或逐一交給 GpuPresenter.draw()。
+        不先建成 list：每個 tuple 用完即釋放，數千個粒子也不會讓存活物件累積而觸發完整的 GC。
+        """
+        n = self.count
+        if not n:
+            return iter(())
+        fade = ((1.0 - self.life[:n] / self.max_life[:n]) * self.fade_levels).astype(np.int32)
+        np.clip(fade, 0, self.fade_levels - 1, out=fade)
+        sprite_index = self.color[:n].astype(np.int32) * self.fade_levels + fade
+        top_left = iter((self.position[:n].astype(np.int32) - self._half[sprite_index][:, None]).ravel().tolist())
+        return zip(map(self.sprites.__getitem__, sprite_index.tolist()), zip(top_left, top_left))
+
+    def bounds(self):
+        """所有粒子的外接矩形 (dirty-rect 繪圖使用)；沒有粒子時回傳 None。"""
+        n = self.count
+        if not n:
+            return None
+        position = self.position[:n]
+        left, top = np.floor(position.min(axis=0)).astype(int) - self.particle_size
+        right, bottom = np.ceil(position.max(axis=0)).astype(int) + self.particle_size
+        return pygame.Rect(int(left), int(top), int(right - left), int(bottom - top))
+
+    def draw(self, surface):
+        """以一次 blits() 把所有粒子畫到 surface，回傳外接矩形 (沒有粒子時為 None)。"""
+        if not self.count:
+            return None
+        surface.blits(self.blit_sequence(), doreturn=False)
+        return self.bounds()
+
+    def get_stats(self):
+        return {'alive': self.count, 'capacity': self.capacity, 'emitted': self.emitted, 'dropped': self.dropped}
+
+
+class _ObjectParticle:
+    """基準測試用：每個粒子一個物件的傳統做法。"""
+    __slots__ = ('x', 'y', 'vx', 'vy', 'life', 'max_life', 'color')
+
+
+def _update_object_particles(particles, dt_sec, gravity, floor_y, bounce):
+    alive = []
+    for p in particles:
+        p.vy += gravity * dt_sec
+        p.x += p.vx * dt_sec
+        p.y += p.vy * dt_sec
+        if p.y > floor_y:
+            p.y = floor_y
+            p.vy *= -bounce
+            p.vx *= 0.7
+        p.life -= dt_sec
+        if p.life > 0:
+            alive.append(p)
+    return alive
+
+
+def benchmark_particles(counts=(500, 1000, 2000, 4000), frames=90, screen_size=(800, 600), seed=1):
+    """
+    量測每幀更新與繪製的時間 (ms)，比較 ParticleSystem 與每個粒子一個物件、逐一 fill 的做法。
+    每種數量先產生一次爆發，壽命設長以在量測期間維持粒子數。
+    回傳:
+        dict: {粒子數: {'array_update_ms', 'array_draw_ms', 'object_update_ms', 'object_draw_ms'}}
+    """
+    if not pygame.display.get_init():
+        pygame.display.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+    surface = pygame.Surface(screen_size).convert()
+    floor_y = screen_size[1] * 0.85
+    dt_sec = 1 / 60
+    results = {}
+    for count in counts:
+        system = ParticleSystem(capacity=count, seed=seed)
+        system.emit(screen_size[0] / 2, floor_y, count, life=(60.0, 60.0))
+        update_sec = draw_sec = 0.0
+        for _ in range(frames):
+            start = time.perf_counter()
+            system.update(dt_sec, floor_y)
+            middle = time.perf_counter()
+            system.draw(surface)
+            update_sec += middle - start
+            draw_sec += time.perf_counter() - middle
+
+        particles = []
+        for i in range(count):
+            p = _ObjectParticle()
+            p.x, p.y = float(system.position[i, 0]), float(system.position[i, 1])
+            p.vx, p.vy = float(system.velocity[i, 0]), float(system.velocity[i, 1])
+            p.life = p.max_life = 60.0
+            p.color = system.palette[int(system.color[i])]
+            particles.append(p)
+        object_update_sec = object_draw_sec = 0.0
+        for _ in range(frames):
+            start = time.perf_counter()
+            particles = _update_object_particles(particles, dt_sec, system.gravity, floor_y, system.bounce)
+            middle = time.perf_counter()
+            for p in particles:
+                size = max(1, int(system.particle_size * p.life / p.max_life))
+                surface.fill(p.color, (int(p.x) - size // 2, int(p.y) - size // 2, size, size))
+            object_update_sec += middle - start
+            object_draw_sec += time.perf_counter() - middle
+        results[count] = {
+            'array_update_ms': update_sec / frames * 1000,
+            'array_draw_ms': draw_sec / frames * 1000,
+            'object_update_ms': object_update_sec / frames * 1000,
+            'object_draw_ms': object_draw_sec / frames * 1000
+        }
+    return results
+
+
+if __name__ == '__main__':
+    import os
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    print("粒子系統基準測試 (每幀 ms):")
+    print(f"{'粒子數':>8}{'陣列更新':>10}{'批次繪製':>10}{'物件更新':>10}{'逐一繪製':>10}")
+    for particle_count, entry in benchmark_particles().items():
+        print(f"{particle_count:>8}{entry['array_update_ms']:>12.3f}{entry['array_draw_ms']:>12.3f}"
+              f"{entry['object_update_ms']:>12.3f}{entry['object_draw_ms']:>12.3f}")
+    pygame.quit()
@@ -0,0 +1,230 @@
+# RandomGenerate/SPI_v2/piezo_input.py
+"""
+遊戲中的拍擊跳躍輸入。
+
+I2C 讀取每個通道都會阻塞數毫秒，因此不在遊戲迴圈內呼叫 check_any_piezo_trigger，
+而是由 PiezoInputThread 在背景執行緒持續輪詢所有通道：偵測到拍擊 (上升超過閾值) 時
+以自訂的 pygame 事件 PIEZO_STRIKE_EVENT 投遞到事件佇列，遊戲迴圈在下一幀的事件處理中
+取得並交給跳躍 / 跳躍緩衝邏輯。事件帶有取樣時間，用於量測拍擊到跳躍的延遲。
+
+ADS1115 輪流讀取多個通道時每次都是一次單次轉換，輪詢一輪的時間 = 通道數 × 轉換時間
+(860 SPS 約 1.2 ms，預設 128 SPS 約 8 ms)。只輪詢一個通道 (channel_names) 時改用連續轉換模式，
+讀取只取回最新結果，一輪約等於一個轉換週期。取樣時間取自最強通道開始讀取的時間，
+拍擊可能在上一輪讀取該通道之後就已發生，因此另外統計每輪的間隔 (round period)，與延遲一起回報。
+
+延遲的下限由遊戲迴圈決定：事件在下一幀開始時才被取出，取樣到套用跳躍最多約一幀，
+再加上最多一個輪詢間隔；多通道輪詢時總和可能超過一幀，每局的報告會標示 (exceeds_frame_budget)。
+
+執行緒只在遊戲進行中 (resume) 讀取感測器，其餘時間 (pause) 不佔用 I2C，
+避免與情緒測量的峰值偵測互相干擾。
+
+對戰模式以 set_channel_groups() 把通道分組 (每位玩家一組)：每組有自己的偵測器，
+事件的 group 屬性為組別索引，兩位玩家同時拍擊也不會互相遮蔽。未分組時 group 為 None。
+"""
+import threading
+import time
+
+import pygame
+
+from frame_profiler import RingBuffer
+
+PIEZO_STRIKE_EVENT = pygame.event.custom_type()
+
+
+class PiezoStrikeDetector:
+    """
+    由 (時間, 電壓) 序列判斷拍擊的上升緣。
+    電壓超過 threshold 時觸發一次，需回落到 threshold * release_ratio 以下
+    且距離上次觸發超過 refractory_sec 才會再次觸發，避免一次拍擊的振盪造成多次跳躍。
+    """
+
+    def __init__(self, threshold=0.1, release_ratio=0.5, refractory_sec=0.12):
+        self.threshold = threshold
+        self.release_voltage = threshold * release_ratio
+        self.refractory_sec = refractory_sec
+        self.armed = True
+        self.last_strike_time = None
+
+    def update(self, timestamp, voltage):
+        """輸入一筆取樣 (秒, 本輪所有通道中的最高電壓)，回傳 True 表示這筆取樣是一次新的拍擊。"""
+        if not self.armed:
+            if voltage <= self.release_voltage and timestamp - self.last_strike_time >= self.refractory_sec:
+                self.armed = True
+            else:
+                return False
+        if voltage >= self.threshold:
+            self.armed = False
+            self.last_strike_time = timestamp
+            return True
+        return False
+
+
+def jump_strength_for_amplitude(amplitude, threshold, full_voltage, min_strength=0.85, max_strength=1.2):
+    """拍擊電壓線性對應到跳躍力道倍率：剛好達到閾值為 min_strength，full_voltage 以上為 max_strength。"""
+    if full_voltage <= threshold:
+        return 1.0
+    ratio = min(1.0, max(0.0, (amplitude - threshold) / (full_voltage - threshold)))
+    return min_strength + (max_strength - min_strength) * ratio
+
+
+class PiezoInputThread:
+    """在背景執行緒輪詢 SensorHandler 的所有通道，把拍擊以 PIEZO_STRIKE_EVENT 投遞到 pygame 事件佇列。"""
+
+    def __init__(self, sensor_handler, threshold=0.1, release_ratio=0.5, refractory_sec=0.12, poll_interval_sec=0.0005,
+                 channel_names=None):
+        """
+        參數:
+            sensor_handler: 已初始化且設定好通道的 SensorHandler (只使用 adc_channels)。
+            threshold (float): 觸發跳躍的電壓閾值。
+            release_ratio (float): 回落到 threshold * release_ratio 以下才重新啟用觸發。
+            refractory_sec (float): 兩次觸發的最短間隔 (秒)。
+            poll_interval_sec (float): 每輪讀完所有通道後讓出 CPU 的時間 (秒)。
+            channel_names (sequence, optional): 未分組時輪詢的通道名稱 (只輪詢有拍擊墊的通道)；None 為全部。
+                只有一個通道時 ADS1115 改用連續轉換模式。
+        """
+        self.sensor_handler = sensor_handler
+        self.threshold = threshold
+        self.release_ratio = release_ratio
+        self.refractory_sec = refractory_sec
+        self.detector = PiezoStrikeDetector(threshold, release_ratio, refractory_sec)
+        self._groups = None # ((組別索引, 通道名稱 tuple, 偵測器), ...)；None 表示所有通道共用 self.detector
+        self.poll_interval_sec = poll_interval_sec
+        self.channel_names = None
+        if channel_names:
+            available = sensor_handler.adc_channels
+            missing = [name for name in channel_names if name not in available]
+            if missing:
+                print(f"PiezoInputThread 警告: 通道 {missing} 未設定，已略過。")
+            self.channel_names = tuple(name for name in channel_names if name in available) or None
+        self._continuous_channel = None
+        self._continuous_supported = True
+        self.strikes = 0
+        self.read_errors = 0
+        self.rounds = 0
+        self.round_periods_ms = RingBuffer(1024) # 相鄰兩輪開始的間隔 (ms)
+        self._last_round_start = None
+        self._active = threading.Event()
+        self._idle = threading.Event() # 執行緒不在讀取感測器 (pause 等待此狀態後才返回)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='PiezoInputThread', daemon=True)
+        self._thread.start()
+
+    def set_channel_groups(self, channel_groups):
+        """
+        設定通道分組 (在 resume 之前呼叫)。
+        參數:
+            channel_groups (sequence or None): 每組的通道名稱，例如 (('A0', 'A1'), ('A2', 'A3'))；None 恢復為不分組。
+        """
+        if channel_groups is None:
+            self._groups = None
+            return
+        available = self.sensor_handler.adc_channels
+        groups = []
+        for index, names in enumerate(channel_groups):
+            missing = [name for name in names if name not in available]
+            if missing:
+                print(f"PiezoInputThread 警告: 第 {index + 1} 組的通道 {missing} 未設定，已略過。")
+            groups.append((index, tuple(name for name in names if name in available),
+                           PiezoStrikeDetector(self.threshold, self.release_ratio, self.refractory_sec)))
+        self._groups = tuple(groups)
+
+    def resume(self):
+        """開始輪詢 (遊戲開始時呼叫)。"""
+        now = time.perf_counter()
+        detectors = [self.detector] + [group[2] for group in self._groups or ()]
+        for detector in detectors:
+            detector.armed = False # 等訊號先回到基線，避免把開始前的拍擊當成跳躍
+            detector.last_strike_time = now
+        self.round_periods_ms = RingBuffer(self.round_periods_ms.capacity) # 只統計本局
+        self._last_round_start = None
+        self._active.set()
+
+    def pause(self):
+        """停止輪詢並釋放 I2C (遊戲結束時呼叫)：等目前這一輪讀完、ADS1115 恢復單次轉換後才返回。"""
+        self._active.clear()
+        self._idle.wait(0.1)
+
+    def stop(self):
+        self._stop.set()
+        self._active.set()
+        self._thread.join(timeout=1.0)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._idle.clear()
+            if not self._active.is_set():
+                self._set_continuous_channel(None)
+                self._last_round_start = None
+                self._idle.set()
+                self._active.wait(0.1)
+                continue
+            round_start = time.perf_counter()
+            if self._last_round_start is not None:
+                self.round_periods_ms.append((round_start - self._last_round_start) * 1000)
+            self._last_round_start = round_start
+            channels = self.sensor_handler.adc_channels
+            groups = self._groups
+            if groups is None:
+                names = self.channel_names or tuple(channels)
+                self._set_continuous_channel(names[0] if len(names) == 1 else None)
+                self._poll(None, channels, names, self.detector)
+            else:
+                self._set_continuous_channel(None)
+                for index, names, detector in groups:
+                    self._poll(index, channels, names, detector)
+            self.rounds += 1
+            if self.poll_interval_sec:
+                time.sleep(self.poll_interval_sec)
+
+    def _set_continuous_channel(self, channel_name):
+        """只在需要改變時切換 ADS1115 的轉換模式 (由輪詢執行緒呼叫，與讀取在同一執行緒)。"""
+        if channel_name == self._continuous_channel or not self._continuous_supported:
+            return
+        try:
+            self.sensor_handler.set_continuous_channel(channel_name)
+        except Exception as e:
+            print(f"PiezoInputThread 警告: 無法切換 ADS1115 轉換模式 ({e})，改用單次轉換。")
+            self._continuous_supported = False
+            return
+        self._continuous_channel = channel_name
+
+    def _poll(self, group, channels, names, detector):
+        """讀取 names 指定的通道，以其中最高的電壓更新偵測器，觸發時投遞事件。"""
+        round_max = 0.0
+        strongest_channel = None
+        sample_time = time.perf_counter()
+        for channel_name in names:
+            read_start = time.perf_counter() # 單次轉換在讀取開始後進行，以此作為取樣時間
+            try:
+                voltage = channels[channel_name].voltage
+            except Exception:
+                self.read_errors += 1
+                continue # 單次讀取失敗時略過此通道
+            if voltage > round_max:
+                round_max = voltage
+                strongest_channel = channel_name
+                sample_time = read_start
+        if detector.update(sample_time, round_max):
+            self.strikes += 1
+            try:
+                pygame.event.post(pygame.event.Event(PIEZO_STRIKE_EVENT, amplitude=round_max, channel=strongest_channel,
+                                                     group=group, sample_time=sample_time))
+            except pygame.error:
+                pass # 顯示已關閉 (程式結束中)
+
+    def get_round_period_stats(self):
+        """本局輪詢間隔 (ms) 的平均、p50/p95 與最大值；尚無資料時回傳 None。"""
+        periods = self.round_periods_ms.snapshot()
+        if not periods:
+            return None
+        percentiles = self.round_periods_ms.percentiles((50, 95))
+        return {
+            'mean_ms': round(sum(periods) / len(periods), 3),
+            'p50_ms': round(percentiles[50], 3),
+            'p95_ms': round(percentiles[95], 3),
+            'max_ms': round(max(periods), 3)
+        }
+
+    def get_stats(self):
+        return {'strikes': self.strikes, 'rounds': self.rounds, 'read_errors': self.read_errors,
+                'round_period': self.get_round_period_stats()}
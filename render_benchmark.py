@@ -0,0 +1,357 @@
+# RandomGenerate/SPI_v2/render_benchmark.py
+"""
+HdmiGameEngine 的繪圖基準測試組。
+
+以 SDL 的 dummy 視訊驅動 (視窗模式，畫面大小與要求的解析度相同) 建立引擎，不需要螢幕與人操作，
+依序在多種解析度與繪圖模式下跑固定的腳本情境:
+    standby    待機畫面 (每幀強制整張重畫)
+    measuring  測量情緒畫面 (每幀強制整張重畫)
+    game       遊戲進行中，畫面上維持 N 個障礙物 (障礙物碰撞高度為 0，玩家不會死亡；玩家持續跳躍)
+    game_over  遊戲結束畫面 (每幀強制整張重畫)
+每個情境先暖機，再量測:
+    - 每幀 tick() 的時間分布 (平均、百分位數、標準差、1 ms 直方圖) 與 FrameProfiler 的逐階段百分位數
+    - 量測期間的 GC 次數與停頓時間、每幀淨增加的記憶體區塊數 (sys.getallocatedblocks)
+    - 另跑一段 tracemalloc 取得每幀配置的峰值與淨增加位元組 (tracemalloc 本身很慢，因此與計時分開)
+結果寫成 JSON，可用 --compare 與先前 (其他 commit) 的結果比較。
+
+命令列用法:
+    python render_benchmark.py -o bench/before.json
+    python render_benchmark.py --resolutions 800x600 1920x1080 --modes dirty --obstacles 5 50 \\
+        --compare bench/before.json -o bench/after.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pygame
+
+SCENARIOS = ('standby', 'measuring', 'game', 'game_over')
+DEFAULT_RESOLUTIONS = ((640, 480), (800, 600), (1280, 720), (1920, 1080))
+DEFAULT_RENDER_MODES = ('full', 'dirty')
+DEFAULT_OBSTACLE_COUNTS = (5, 50)
+HISTOGRAM_MAX_MS = 40 # 直方圖 1 ms 一格，超過的全部算在最後一格
+BENCHMARK_MILEAGE = 10 ** 6 # 遊戲情境不會因里程歸零結束
+
+
+class _GcMonitor:
+    """以 gc.callbacks 記錄量測期間各世代的回收次數與停頓時間。"""
+
+    def __init__(self):
+        self.collections = [0, 0, 0]
+        self.pause_ms = 0.0
+        self.max_pause_ms = 0.0
+        self._start = None
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self._start = time.perf_counter()
+        elif self._start is not None:
+            elapsed = (time.perf_counter() - self._start) * 1000
+            self.collections[info['generation']] += 1
+            self.pause_ms += elapsed
+            self.max_pause_ms = max(self.max_pause_ms, elapsed)
+            self._start = None
+
+    def __enter__(self):
+        gc.callbacks.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        gc.callbacks.remove(self)
+
+
+def _percentile(ordered, percent):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def frame_time_distribution(samples_ms):
+    """每幀時間 (ms) 的分布摘要與 1 ms 直方圖。"""
+    ordered = sorted(samples_ms)
+    histogram = [0] * (HISTOGRAM_MAX_MS + 1)
+    for value in ordered:
+        histogram[min(HISTOGRAM_MAX_MS, int(value))] += 1
+    return {
+        'mean': round(statistics.fmean(ordered), 4),
+        'stdev': round(statistics.pstdev(ordered), 4),
+        'min': round(ordered[0], 4),
+        'p50': round(_percentile(ordered, 50), 4),
+        'p90': round(_percentile(ordered, 90), 4),
+        'p95': round(_percentile(ordered, 95), 4),
+        'p99': round(_percentile(ordered, 99), 4),
+        'max': round(ordered[-1], 4),
+        'histogram_1ms': histogram
+    }
+
+
+class _GameDriver:
+    """遊戲情境：畫面上維持固定數量的障礙物並讓玩家持續跳躍。"""
+
+    def __init__(self, engine, obstacle_count):
+        self.engine = engine
+        self.obstacle_count = obstacle_count
+
+    def start(self):
+        from hdmi_scenes import GameScene
+        engine = self.engine
+        engine.scene_manager.change(GameScene(engine, BENCHMARK_MILEAGE))
+        sim = engine.simulation
+        sim.obstacle_spawn_time_ms = float('inf') # 不隨機生成，障礙物數量由 _top_up 維持
+        sim.obstacles.clear()
+        # 在一個螢幕寬內平均分布；碰撞高度設為 0 (繪圖只依 height_key 選圖片，外觀不變)
+        self.spacing = max(1.0, sim.geometry.screen_width / self.obstacle_count)
+        self.next_x = 0.0
+        self._top_up()
+
+    def _top_up(self):
+        """從右緣補上障礙物，畫面上維持約 obstacle_count 個 (離開左緣的由模擬移除)。"""
+        sim = self.engine.simulation
+        geometry = sim.geometry
+        keys = geometry.obstacle_height_keys
+        while self.next_x - sim.scroll_px < geometry.screen_width:
+            key = keys[int(self.next_x / self.spacing) % len(keys)]
+            sim.obstacles.push(int(self.next_x), geometry.obstacle_sizes[key][0], 0, key)
+            self.next_x += self.spacing
+
+    def before_frame(self):
+        engine = self.engine
+        if not engine.simulation.is_jumping:
+            engine.request_player_jump('bot')
+        self._top_up()
+
+
+class _RedrawDriver:
+    """文字畫面情境：每幀要求整張重畫 (實際運作時只在內容改變時重畫，這裡量測的是重畫一次的成本)。"""
+
+    def __init__(self, engine, scenario):
+        self.engine = engine
+        self.scenario = scenario
+
+    def start(self):
+        from hdmi_scenes import GameOverScene
+        engine = self.engine
+        if self.scenario == 'standby':
+            engine.show_hdmi_standby_screen()
+        elif self.scenario == 'measuring':
+            engine.show_measuring_emotion_screen(duration=3)
+        else:
+            engine.score, engine.current_mileage, engine.game_over_reason = 123, 456, 'collision'
+            engine.scene_manager.change(GameOverScene(engine, BENCHMARK_MILEAGE))
+
+    def before_frame(self):
+        self.engine.scene_manager.current.needs_redraw = True
+
+
+def _make_driver(engine, scenario, obstacle_count):
+    if scenario == 'game':
+        return _GameDriver(engine, obstacle_count)
+    return _RedrawDriver(engine, scenario)
+
+
+def run_scenario(engine, scenario, obstacle_count=0, frames=300, warmup_frames=30, allocation_frames=60):
+    """
+    在已建立的引擎上跑一個情境，回傳量測結果 dict。
+    引擎的幀率限制會暫時關閉 (fps=0)，量測的是每幀實際的工作時間。
+    """
+    driver = _make_driver(engine, scenario, obstacle_count)
+    saved_fps = engine.fps
+    engine.fps = 0
+    try:
+        driver.start()
+        scene_name = engine.scene_manager.current.name
+        for _ in range(warmup_frames):
+            driver.before_frame()
+            engine.tick()
+        engine.profiler.reset()
+
+        samples = [0.0] * frames
+        perf_counter = time.perf_counter
+        blocks_before = sys.getallocatedblocks()
+        with _GcMonitor() as gc_monitor:
+            for index in range(frames):
+                driver.before_frame()
+                start = perf_counter()
+                engine.tick()
+                samples[index] = (perf_counter() - start) * 1000
+        net_blocks = sys.getallocatedblocks() - blocks_before
+        phases = engine.profiler.summary(scene_name).get(scene_name, {}).get('phases', {})
+
+        peaks = []
+        retained = []
+        tracemalloc.start()
+        try:
+            for _ in range(allocation_frames):
+                driver.before_frame()
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                engine.tick()
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                retained.append(current - before)
+        finally:
+            tracemalloc.stop()
+    finally:
+        engine.fps = saved_fps
+
+    peaks.sort()
+    return {
+        'scenario': scenario,
+        'scene': scene_name,
+        'obstacles': obstacle_count if scenario == 'game' else 0,
+        'frames': frames,
+        'frame_ms': frame_time_distribution(samples),
+        'phases_ms': phases,
+        'gc': {'collections': gc_monitor.collections, 'pause_ms': round(gc_monitor.pause_ms, 3),
+               'max_pause_ms': round(gc_monitor.max_pause_ms, 3)},
+        'allocations': {
+            'net_blocks_per_frame': round(net_blocks / frames, 3),
+            'peak_bytes_per_frame': {'p50': _percentile(peaks, 50), 'p95': _percentile(peaks, 95), 'max': peaks[-1]},
+            'retained_bytes_per_frame': round(statistics.fmean(retained), 1)
+        }
+    }
+
+
+def _benchmark_metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'sdl': '.'.join(str(part) for part in pygame.get_sdl_version()),
+        'video_driver': pygame.display.get_driver() if pygame.display.get_init() else os.environ.get('SDL_VIDEODRIVER'),
+        'machine': platform.machine(),
+        'platform': platform.platform()
+    }
+
+
+def run_render_benchmark(resolutions=DEFAULT_RESOLUTIONS, render_modes=DEFAULT_RENDER_MODES, scenarios=SCENARIOS,
+                         obstacle_counts=DEFAULT_OBSTACLE_COUNTS, frames=300, warmup_frames=30, allocation_frames=60,
+                         background_style='parallax'):
+    """
+    依序對每個解析度 x 繪圖模式建立一個引擎，跑完所有情境。
+    回傳:
+        dict: {'meta', 'config', 'results': [每個 (解析度, 模式, 情境, 障礙物數) 一筆]}
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from hdmi_game_engine import HdmiGameEngine
+
+    results = []
+    for width, height in resolutions:
+        for render_mode in render_modes:
+            engine = HdmiGameEngine(width, height, render_mode=render_mode, background_style=background_style,
+                                    profiler_enabled=True, fullscreen=False)
+            surface_size = list(engine.screen.get_size())
+            if surface_size != [engine.screen_width, engine.screen_height]:
+                print(f"RenderBenchmark 警告: 視訊驅動建立的畫面為 {surface_size[0]}x{surface_size[1]}，"
+                      f"與要求的 {width}x{height} 不同，結果僅供參考。")
+            try:
+                for scenario in scenarios:
+                    for obstacle_count in (obstacle_counts if scenario == 'game' else (0,)):
+                        entry = run_scenario(engine, scenario, obstacle_count, frames, warmup_frames, allocation_frames)
+                        entry.update({'resolution': [width, height], 'surface_size': surface_size,
+                                      'render_mode': engine.render_mode})
+                        results.append(entry)
+                        frame = entry['frame_ms']
+                        print(f"RenderBenchmark: {width}x{height} {engine.render_mode:<5} {_case_label(entry):<12} "
+                              f"p50 {frame['p50']:.2f} / p95 {frame['p95']:.2f} / p99 {frame['p99']:.2f} ms")
+            finally:
+                engine.cleanup()
+    return {
+        'meta': _benchmark_metadata(),
+        'config': {'frames': frames, 'warmup_frames': warmup_frames, 'allocation_frames': allocation_frames,
+                   'background_style': background_style},
+        'results': results
+    }
+
+
+def _case_label(entry):
+    return f"{entry['scenario']}[{entry['obstacles']}]" if entry['scenario'] == 'game' else entry['scenario']
+
+
+def _case_key(entry):
+    return (tuple(entry['resolution']), entry['render_mode'], entry['scenario'], entry['obstacles'])
+
+
+def compare_reports(baseline, current):
+    """
+    比較兩份報告中相同情境的 p50 / p95 幀時間與每幀峰值配置。
+    回傳:
+        list[dict]: 每個共同情境一筆，含兩邊的數值與變化百分比 (正值表示變慢 / 變多)。
+    """
+    previous = {_case_key(entry): entry for entry in baseline['results']}
+    rows = []
+    for entry in current['results']:
+        old = previous.get(_case_key(entry))
+        if old is None:
+            continue
+        row = {'case': f"{entry['resolution'][0]}x{entry['resolution'][1]} {entry['render_mode']} {_case_label(entry)}"}
+        for name, old_value, new_value in (
+                ('p50_ms', old['frame_ms']['p50'], entry['frame_ms']['p50']),
+                ('p95_ms', old['frame_ms']['p95'], entry['frame_ms']['p95']),
+                ('peak_bytes', old['allocations']['peak_bytes_per_frame']['p50'], entry['allocations']['peak_bytes_per_frame']['p50'])):
+            row[name] = (old_value, new_value, (new_value - old_value) / old_value * 100 if old_value else 0.0)
+        rows.append(row)
+    return rows
+
+
+def _parse_resolution(text):
+    width, _, height = text.lower().partition('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HdmiGameEngine 繪圖基準測試 (SDL dummy 驅動)。")
+    parser.add_argument('--resolutions', nargs='+', default=[f'{w}x{h}' for w, h in DEFAULT_RESOLUTIONS], metavar='WxH')
+    parser.add_argument('--modes', nargs='+', default=list(DEFAULT_RENDER_MODES), choices=('full', 'dirty', 'gpu'))
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument('--obstacles', type=int, nargs='+', default=list(DEFAULT_OBSTACLE_COUNTS), help="遊戲情境畫面上的障礙物數")
+    parser.add_argument('--frames', type=int, default=300, help="每個情境量測的幀數")
+    parser.add_argument('--warmup', type=int, default=30)
+    parser.add_argument('--allocation-frames', type=int, default=60, help="tracemalloc 量測的幀數")
+    parser.add_argument('--background', choices=('plain', 'parallax'), default='parallax')
+    parser.add_argument('--compare', default=None, help="與此先前的報告 JSON 比較")
+    parser.add_argument('-o', '--output', default=None, help="輸出報告 JSON 路徑")
+    args = parser.parse_args()
+
+    report = run_render_benchmark([_parse_resolution(text) for text in args.resolutions], args.modes, args.scenarios,
+                                  args.obstacles, args.frames, args.warmup, args.allocation_frames, args.background)
+
+    print(f"\n{'情境':<32}{'平均':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'GC 次數':>9}{'峰值配置/幀':>14}")
+    for entry in report['results']:
+        frame = entry['frame_ms']
+        case = f"{entry['resolution'][0]}x{entry['resolution'][1]} {entry['render_mode']} {_case_label(entry)}"
+        print(f"{case:<32}{frame['mean']:>8.2f}{frame['p50']:>8.2f}{frame['p95']:>8.2f}{frame['p99']:>8.2f}"
+              f"{sum(entry['gc']['collections']):>9}{entry['allocations']['peak_bytes_per_frame']['p50']:>13} B")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\n與 {args.compare} (commit {baseline['meta'].get('commit')}) 比較:")
+        for row in compare_reports(baseline, report):
+            p50, p95, peak = row['p50_ms'], row['p95_ms'], row['peak_bytes']
+            print(f"{row['case']:<32} p50 {p50[0]:.2f} → {p50[1]:.2f} ({p50[2]:+.1f}%)  "
+                  f"p95 {p95[0]:.2f} → {p95[1]:.2f} ({p95[2]:+.1f}%)  峰值配置 {peak[0]} → {peak[1]} B ({peak[2]:+.1f}%)")
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"報告已寫入 {args.output}")
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
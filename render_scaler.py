@@ -0,0 +1,161 @@
+# RandomGenerate/SPI_v2/render_scaler.py
+"""
+內部繪圖解析度 (render scale) 與 HDMI 原生顯示模式。
+
+遊戲畫面畫在 "原生解析度 × render_scale" 的內部 Surface 上，每幀只在送出時放大一次到
+原生解析度的顯示 Surface，HDMI 螢幕不需要切換模式或經過螢幕本身的縮放器。
+render_scale 越低，每幀需要繪製的像素越少；RenderScaleGovernor 在遊戲幀的工作時間
+持續超過預算時自動降低 render_scale (於下一局開始時套用)。
+"""
+import math
+
+import pygame
+
+RENDER_SCALE_LEVELS = (1.0, 0.85, 0.75, 0.6, 0.5, 0.4) # 自動調整時依序嘗試的倍率
+MAX_SCALE_DENOMINATOR = 16 # 內部與輸出像素對齊區塊的最大邊長
+MAX_SCALE_SNAP = 0.05      # 為了對齊最多偏離要求倍率的量
+
+
+def choose_native_mode(fallback_size):
+    """
+    由 pygame.display.list_modes 選出顯示器的原生 (最大) 全螢幕模式。
+    無法取得模式列表時改用桌面目前解析度，再不行則回傳 fallback_size。
+    """
+    if not pygame.display.get_init():
+        pygame.display.init()
+    modes = pygame.display.list_modes(0, pygame.FULLSCREEN)
+    if modes and modes != -1:
+        return max(modes, key=lambda mode: mode[0] * mode[1])
+    info = pygame.display.Info()
+    if info.current_w > 0 and info.current_h > 0:
+        return (info.current_w, info.current_h)
+    return tuple(fallback_size)
+
+
+def scaled_render_size(output_size, render_scale):
+    """
+    輸出解析度乘上 render_scale 後的內部繪圖解析度；倍率 1 時與輸出相同。
+    優先採用相差不超過 MAX_SCALE_SNAP 的簡單分數倍率 (分母 ≤ MAX_SCALE_DENOMINATOR，且兩軸都整除)，
+    這樣內部像素與輸出像素以固定的小區塊對齊，變動區域可以單獨放大而與整張放大的結果完全相同。
+    """
+    if render_scale >= 1.0:
+        return tuple(output_size)
+    width, height = output_size
+    best = None
+    for denominator in range(1, MAX_SCALE_DENOMINATOR + 1):
+        for numerator in range(1, denominator):
+            if (width * numerator) % denominator or (height * numerator) % denominator:
+                continue
+            error = abs(numerator / denominator - render_scale)
+            if best is None or error < best[0]:
+                best = (error, numerator, denominator)
+    if best is not None and best[0] <= MAX_SCALE_SNAP:
+        _, numerator, denominator = best
+        return (width * numerator // denominator, height * numerator // denominator)
+    return tuple(max(2, int(round(length * render_scale / 2)) * 2) for length in output_size)
+
+
+class ScaledDisplay:
+    """
+    把內部繪圖 Surface 放大送到顯示 Surface，介面與 pygame.display 的 flip()/update(rects) 相同，
+    可直接交給 DirtyRectRenderer 使用。
+    """
+
+    def __init__(self, render_surface, output_surface):
+        self.render_surface = render_surface
+        self.output_surface = output_surface
+        self.output_size = output_surface.get_size()
+        render_w, render_h = render_surface.get_size()
+        # 內部 block_w x block_h 像素剛好對應輸出 out_block_w x out_block_h 像素
+        divisor_x = math.gcd(render_w, self.output_size[0])
+        divisor_y = math.gcd(render_h, self.output_size[1])
+        self.block_w, self.block_h = render_w // divisor_x, render_h // divisor_y
+        self.out_block_w, self.out_block_h = self.output_size[0] // divisor_x, self.output_size[1] // divisor_y
+        self.aligned = self.block_w <= MAX_SCALE_DENOMINATOR and self.block_h <= MAX_SCALE_DENOMINATOR
+        self.render_rect = render_surface.get_rect()
+
+    def flip(self):
+        # 最近鄰放大 (transform.scale) 直接寫入顯示 Surface，不配置新的 Surface
+        pygame.transform.scale(self.render_surface, self.output_size, self.output_surface)
+        pygame.display.flip()
+
+    def update(self, rects):
+        """
+        只放大並送出變動區域 (內部座標)。區域先向外對齊到像素區塊，單獨放大的結果才會與整張放大相同；
+        倍率無法對齊時改為整張放大，只送出變動區域。
+        """
+        if not self.aligned:
+            pygame.transform.scale(self.render_surface, self.output_size, self.output_surface)
+            pygame.display.update([self._output_rect(rect) for rect in rects])
+            return
+        output_rects = []
+        for rect in rects:
+            left = rect.left // self.block_w * self.block_w
+            top = rect.top // self.block_h * self.block_h
+            right = -(-rect.right // self.block_w) * self.block_w
+            bottom = -(-rect.bottom // self.block_h) * self.block_h
+            block_rect = pygame.Rect(left, top, right - left, bottom - top).clip(self.render_rect)
+            if block_rect.width <= 0 or block_rect.height <= 0:
+                continue
+            output_rect = self._output_rect(block_rect)
+            pygame.transform.scale(self.render_surface.subsurface(block_rect), output_rect.size,
+                                   self.output_surface.subsurface(output_rect))
+            output_rects.append(output_rect)
+        if output_rects:
+            pygame.display.update(output_rects)
+
+    def _output_rect(self, rect):
+        scale_x = self.output_size[0] / self.render_rect.width
+        scale_y = self.output_size[1] / self.render_rect.height
+        left, top = int(rect.left * scale_x), int(rect.top * scale_y)
+        right = min(self.output_size[0], math.ceil(rect.right * scale_x))
+        bottom = min(self.output_size[1], math.ceil(rect.bottom * scale_y))
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+
+class RenderScaleGovernor:
+    """
+    統計遊戲幀的工作時間 (不含 clock.tick 的等待)，每 window_frames 幀檢查一次:
+    超過預算的幀比例高於 over_budget_ratio 時，提出降低一級 render_scale 的要求。
+    只會往下調整，避免在兩個倍率之間來回切換。
+    """
+
+    def __init__(self, render_scale, target_fps, min_scale=0.5, window_frames=120, over_budget_ratio=0.1,
+                 levels=RENDER_SCALE_LEVELS):
+        self.render_scale = render_scale
+        self.min_scale = min_scale
+        self.window_frames = window_frames
+        self.over_budget_ratio = over_budget_ratio
+        self.levels = sorted(set(levels) | {render_scale}, reverse=True)
+        self.set_target_fps(target_fps)
+        self.pending_scale = None
+        self.adjustments = []
+        self._frames = 0
+        self._over_budget = 0
+
+    def set_target_fps(self, target_fps):
+        self.frame_budget_ms = 1000.0 / target_fps
+
+    def record(self, work_ms):
+        self._frames += 1
+        if work_ms > self.frame_budget_ms:
+            self._over_budget += 1
+        if self._frames < self.window_frames:
+            return
+        ratio = self._over_budget / self._frames
+        self._frames = self._over_budget = 0
+        if ratio <= self.over_budget_ratio or self.pending_scale is not None:
+            return
+        lower = [level for level in self.levels if self.min_scale <= level < self.render_scale]
+        if lower:
+            self.pending_scale = lower[0]
+            print(f"RenderScaleGovernor: {ratio * 100:.0f}% 的幀超過 {self.frame_budget_ms:.1f} ms 預算，"
+                  f"下一局 render scale 降為 {self.pending_scale:g}。")
+
+    def take_pending(self):
+        """取出待套用的新倍率 (沒有則回傳 None)。"""
+        scale, self.pending_scale = self.pending_scale, None
+        if scale is not None:
+            self.adjustments.append((self.render_scale, scale))
+            self.render_scale = scale
+        return scale
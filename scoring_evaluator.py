@@ -0,0 +1,169 @@
+# RandomGenerate/SPI_v2/scoring_evaluator.py
+"""
+離線評估情緒計分公式：在錄製好的 trace 集合上，以多組候選設定重新計分並比較結果。
+
+每個 trace 視為一次測量 (與 get_max_voltage_from_all_channels 相同，取所有通道的峰值)，
+再以 EmotionCalculator 依各候選設定計分。讀檔與計分分塊交給 process pool 平行處理，
+主程序只負責彙整統計。
+
+候選設定檔為 JSON 陣列，每個元素可包含:
+    name, min_voltage_threshold, max_emotion_value, voltage_gain, exponent, scale, game_start_threshold
+未指定的欄位沿用 BASELINE_CANDIDATE。
+
+命令列用法:
+    python scoring_evaluator.py <trace目錄> [candidates.json] [-o report.json] [--workers N]
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from emotion_calculator import EmotionCalculator
+from sensor_trace import list_trace_files, load_trace
+
+# 與 system_configurator.py (EMOTION_VOLTAGE_THRESHOLD, MAX_EMOTION_INDEX) 及 main.py (GAME_START_THRESHOLD) 目前設定一致
+BASELINE_CANDIDATE = {
+    'name': 'current',
+    'min_voltage_threshold': 0.05,
+    'max_emotion_value': 500,
+    'voltage_gain': 5.0,
+    'exponent': 2.0,
+    'scale': 100.0,
+    'game_start_threshold': 10
+}
+CALCULATOR_KEYS = ('min_voltage_threshold', 'max_emotion_value', 'voltage_gain', 'exponent', 'scale')
+TRACES_PER_TASK = 64
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+HISTOGRAM_BINS = 20
+
+
+def load_candidates(path=None):
+    """讀取候選設定檔，補齊預設欄位。未提供檔案時只評估目前設定。"""
+    if path is None:
+        return [dict(BASELINE_CANDIDATE)]
+    with open(path, 'r', encoding='utf-8') as f:
+        raw_candidates = json.load(f)
+    candidates = []
+    for index, raw in enumerate(raw_candidates):
+        candidate = dict(BASELINE_CANDIDATE)
+        candidate.update(raw)
+        candidate['name'] = raw.get('name', f'candidate_{index}')
+        candidates.append(candidate)
+    return candidates
+
+
+def _score_trace_chunk(args):
+    """
+    Worker: 讀取一批 trace，回傳 (峰值電壓 (n,), 分數矩陣 (n, 候選數))。
+    每個 worker 只建立一次各候選的 EmotionCalculator。
+    """
+    trace_paths, candidates = args
+    calculators = [EmotionCalculator(**{key: c[key] for key in CALCULATOR_KEYS}) for c in candidates]
+    peaks = np.zeros(len(trace_paths), dtype=np.float64)
+    scores = np.zeros((len(trace_paths), len(candidates)), dtype=np.int64)
+    for row, path in enumerate(trace_paths):
+        try:
+            peak = load_trace(path).peak_voltage()
+        except Exception as e:
+            print(f"ScoringEvaluator 警告: 無法讀取 {path}: {e}")
+            peak = 0.0
+        peaks[row] = peak
+        for col, calculator in enumerate(calculators):
+            scores[row, col] = calculator.calculate_negative_emotion_index(peak)
+    return peaks, scores
+
+
+def score_traces(trace_paths, candidates, workers=None):
+    """將 trace 分塊送進 process pool 計分，回傳合併後的 (peaks, scores)。"""
+    chunks = [trace_paths[i:i + TRACES_PER_TASK] for i in range(0, len(trace_paths), TRACES_PER_TASK)]
+    tasks = [(chunk, candidates) for chunk in chunks]
+    if workers == 1:
+        results = [_score_trace_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_score_trace_chunk, tasks))
+    if not results:
+        return np.zeros(0), np.zeros((0, len(candidates)), dtype=np.int64)
+    return np.concatenate([r[0] for r in results]), np.vstack([r[1] for r in results])
+
+
+def summarize_scores(scores, candidates):
+    """計算各候選的分數分布、通過率，以及相對於第一個候選 (基準) 的差異。"""
+    summary = {'n_sessions': int(scores.shape[0]), 'candidates': [], 'differences_vs_baseline': []}
+    if scores.shape[0] == 0:
+        return summary
+
+    passed = np.column_stack([scores[:, i] >= c['game_start_threshold'] for i, c in enumerate(candidates)])
+    for i, candidate in enumerate(candidates):
+        column = scores[:, i]
+        hist_counts, hist_edges = np.histogram(column, bins=HISTOGRAM_BINS, range=(0, max(1, candidate['max_emotion_value'])))
+        summary['candidates'].append({
+            'config': candidate,
+            'mean': round(float(column.mean()), 2),
+            'std': round(float(column.std()), 2),
+            'percentiles': {f'p{p}': float(v) for p, v in zip(PERCENTILES, np.percentile(column, PERCENTILES))},
+            'pass_rate': round(float(passed[:, i].mean()), 4),
+            'zero_rate': round(float((column == 0).mean()), 4),
+            'capped_rate': round(float((column >= candidate['max_emotion_value']).mean()), 4),
+            'histogram': {'bin_edges': [round(float(e), 2) for e in hist_edges], 'counts': hist_counts.tolist()}
+        })
+
+    baseline_scores = scores[:, 0]
+    for i, candidate in enumerate(candidates[1:], start=1):
+        delta = scores[:, i] - baseline_scores
+        summary['differences_vs_baseline'].append({
+            'name': candidate['name'],
+            'mean_score_delta': round(float(delta.mean()), 2),
+            'mean_abs_score_delta': round(float(np.abs(delta).mean()), 2),
+            'pass_rate_delta': round(float(passed[:, i].mean() - passed[:, 0].mean()), 4),
+            'newly_passing_rate': round(float((passed[:, i] & ~passed[:, 0]).mean()), 4),
+            'newly_failing_rate': round(float((~passed[:, i] & passed[:, 0]).mean()), 4)
+        })
+    return summary
+
+
+def print_summary(summary):
+    print(f"\n共評估 {summary['n_sessions']} 個測量。")
+    print(f"{'候選':<20}{'平均':>9}{'p50':>8}{'p90':>8}{'通過率':>9}{'封頂率':>9}")
+    for entry in summary['candidates']:
+        pct = entry['percentiles']
+        print(f"{entry['config']['name']:<20}{entry['mean']:>9.1f}{pct['p50']:>8.0f}{pct['p90']:>8.0f}"
+              f"{entry['pass_rate'] * 100:>8.1f}%{entry['capped_rate'] * 100:>8.1f}%")
+    for diff in summary['differences_vs_baseline']:
+        print(f"  {diff['name']} 相對基準: 平均分數 {diff['mean_score_delta']:+.1f}, "
+              f"通過率 {diff['pass_rate_delta'] * 100:+.1f}%, "
+              f"新通過 {diff['newly_passing_rate'] * 100:.1f}% / 新失敗 {diff['newly_failing_rate'] * 100:.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以多組候選設定離線重新計分 trace 集合。")
+    parser.add_argument('trace_dir', help="trace 目錄 (sensor_trace.py 格式)")
+    parser.add_argument('candidates', nargs='?', default=None, help="候選設定 JSON 檔，第一個候選作為比較基準")
+    parser.add_argument('-o', '--output', default=None, help="輸出報告 JSON 路徑")
+    parser.add_argument('--workers', type=int, default=None, help="process 數量 (預設為 CPU 核心數，1 表示不使用 pool)")
+    args = parser.parse_args()
+
+    candidates = load_candidates(args.candidates)
+    trace_paths = list_trace_files(args.trace_dir)
+    if not trace_paths:
+        print(f"在 {args.trace_dir} 中找不到 trace 檔案。")
+        return
+
+    print(f"ScoringEvaluator: {len(trace_paths)} 個 trace × {len(candidates)} 組候選，workers={args.workers or os.cpu_count()}")
+    start = time.perf_counter()
+    _peaks, scores = score_traces(trace_paths, candidates, workers=args.workers)
+    summary = summarize_scores(scores, candidates)
+    summary['elapsed_sec'] = round(time.perf_counter() - start, 2)
+    print_summary(summary)
+    print(f"耗時 {summary['elapsed_sec']}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"報告已寫入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
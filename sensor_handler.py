@@ -4,16 +4,31 @@ import board # For I2C bus SCL, SDA
 import busio # For I2C
 import adafruit_ads1x15.ads1115 as ADS
 from adafruit_ads1x15.analog_in import AnalogIn
+from adafruit_ads1x15.ads1x15 import Mode
+from strike_window import StrikeWindowDetector
+from force_calibration import baseline_subtracted_peak
+
+DEFAULT_DATA_RATE = 860 # ADS1115 最高取樣率；單次轉換模式下每次讀取約 1.2 ms (預設 128 SPS 約 8 ms)
 
 class SensorHandler:
     """處理 ADS1115 ADC 感測器讀取的類別。"""
 
-    def __init__(self):
-        """初始化 SensorHandler。"""
+    def __init__(self, data_rate=DEFAULT_DATA_RATE):
+        """
+        初始化 SensorHandler。
+        參數:
+            data_rate (int): ADS1115 取樣率 (SPS)。每次讀取通道都是一次單次轉換，
+                取樣率決定遊戲中拍擊輪詢一輪所需的時間。
+        """
+        self.data_rate = data_rate
         self.i2c_bus = None
         self.ads_sensor = None
         self.adc_channels = {}  # 儲存已設定的 AnalogIn 物件，以通道名稱為鍵
         self.is_initialized = False
+        self.last_channel_max_voltages = {} # 最近一次峰值偵測的各通道結果
+        self.last_channel_strike_peaks = {} # 同上，但扣除各通道基線 (與力量校正擬合時的特徵相同)，供力量校正使用
+        self.last_measurement_duration_sec = 0.0 # 最近一次峰值偵測實際花費的時間
+        self.sample_sink = None # 可選的 waveform_view.WaveformBuffer；峰值偵測時每筆取樣以 push(通道索引, 時間, 電壓) 交給它
 
     def initialize_ads1115(self):
         """
@@ -25,9 +40,9 @@ class SensorHandler:
             return True
         try:
             self.i2c_bus = busio.I2C(board.SCL, board.SDA)
-            self.ads_sensor = ADS.ADS1115(self.i2c_bus)
+            self.ads_sensor = ADS.ADS1115(self.i2c_bus, data_rate=self.data_rate)
             self.is_initialized = True
-            print("SensorHandler: ADS1115 I2C 初始化成功。")
+            print(f"SensorHandler: ADS1115 I2C 初始化成功 ({self.data_rate} SPS)。")
             return True
         except ValueError as ve:
             # 通常是 SCL/SDA 未正確設定或硬體未連接時引發
@@ -78,13 +93,30 @@ class SensorHandler:
             self.adc_channels = {} # 設定失敗時清除
             return False
 
-    def _read_single_channel_max_voltage(self, channel_name, duration_sec):
-        """內部輔助函式，讀取指定單一通道在特定時間內的最高電壓。"""
+    def set_continuous_channel(self, channel_name):
+        """
+        channel_name 為通道名稱時讓 ADS1115 以連續轉換模式持續轉換該通道：之後讀取同一通道只需取回
+        最新的轉換結果 (一次 I2C 讀取)，不必每次等待單次轉換。None 恢復單次轉換模式
+        (輪流讀取多個通道時使用；連續模式下切換通道反而要多等兩個轉換週期)。
+        """
+        if not self.is_initialized or not self.ads_sensor:
+            return False
+        if channel_name is None:
+            self.ads_sensor.mode = Mode.SINGLE
+            return True
+        self.ads_sensor.mode = Mode.CONTINUOUS
+        self.adc_channels[channel_name].voltage # 第一次讀取設定多工器並開始連續轉換
+        return True
+
+    def _read_single_channel_max_voltage(self, channel_name, duration_sec, samples=None):
+        """內部輔助函式，讀取指定單一通道在特定時間內的最高電壓 (samples 為 list 時附加每筆取樣)。"""
         if channel_name not in self.adc_channels:
             # print(f"SensorHandler 錯誤: 通道 {channel_name} 未設定。") # 詳細日誌
             return 0.0
 
         chan_obj = self.adc_channels[channel_name]
+        sink = self.sample_sink
+        channel_index = list(self.adc_channels).index(channel_name)
         # print(f"開始偵測 {channel_name} 通道壓力（{duration_sec}秒內取最高電壓）...")
         start_time = time.time()
         max_voltage_on_channel = 0.0
@@ -92,6 +124,10 @@ class SensorHandler:
         try:
             while time.time() - start_time < duration_sec:
                 voltage = chan_obj.voltage
+                if sink is not None:
+                    sink.push(channel_index, time.perf_counter(), voltage)
+                if samples is not None:
+                    samples.append(voltage)
                 if voltage > max_voltage_on_channel:
                     max_voltage_on_channel = voltage
                 time.sleep(0.01)  # 快速取樣
@@ -120,20 +156,87 @@ class SensorHandler:
 
         overall_max_voltage = 0.0
         channel_max_voltages = {}
+        channel_strike_peaks = {}
 
         print(f"SensorHandler: 開始偵測 {duration_sec} 秒內各通道峰值電壓...")
         for channel_name in self.adc_channels.keys():
-            voltage = self._read_single_channel_max_voltage(channel_name, duration_sec)
+            samples = []
+            voltage = self._read_single_channel_max_voltage(channel_name, duration_sec, samples)
             channel_max_voltages[channel_name] = voltage
+            channel_strike_peaks[channel_name] = baseline_subtracted_peak(samples)
             if voltage > overall_max_voltage:
                 overall_max_voltage = voltage
         
+        self.last_channel_max_voltages = channel_max_voltages
+        self.last_channel_strike_peaks = channel_strike_peaks
+        self.last_measurement_duration_sec = duration_sec * len(self.adc_channels)
         for ch_name, ch_volt in channel_max_voltages.items():
             # print(f"  通道 {ch_name} 的最高電壓: {ch_volt:.3f} V") # 詳細日誌
             pass
         print(f"SensorHandler: 所有通道中偵測到的最終最高電壓為：{overall_max_voltage:.3f} V")
         return overall_max_voltage
 
+    def measure_peak_voltage_adaptive(self, strike_threshold=0.1, release_voltage=0.05, hold_sec=0.3,
+                                      min_duration_sec=0.5, max_duration_sec=3.0):
+        """
+        自適應峰值偵測：所有通道輪流取樣於同一個測量窗口內，
+        一旦偵測到拍擊且訊號回落到基線並維持 hold_sec，即提前結束 (不早於 min_duration_sec)。
+
+        參數:
+            strike_threshold (float): 視為拍擊的電壓。
+            release_voltage (float): 視為回到基線的電壓。
+            hold_sec (float): 回到基線需維持的時間 (秒)。
+            min_duration_sec (float): 最短測量時間 (秒)。
+            max_duration_sec (float): 最長測量時間 (秒)。
+
+        回傳:
+            dict: {'max_voltage', 'channel_max_voltages', 'duration_sec', 'end_reason'}
+        """
+        result = {'max_voltage': 0.0, 'channel_max_voltages': {}, 'duration_sec': 0.0, 'end_reason': None}
+        if not self.is_initialized or not self.adc_channels:
+            print("SensorHandler 錯誤：ADS1115 未初始化或通道未設定，無法讀取峰值電壓。")
+            return result
+
+        detector = StrikeWindowDetector(strike_threshold, release_voltage, hold_sec, min_duration_sec, max_duration_sec)
+        channel_max_voltages = {name: 0.0 for name in self.adc_channels}
+        channel_samples = {name: [] for name in self.adc_channels} # 測量結束後才知道窗口長度，基線由完整序列計算
+        print(f"SensorHandler: 開始自適應偵測 (最短 {min_duration_sec}s, 最長 {max_duration_sec}s)...")
+
+        sink = self.sample_sink
+        start_time = time.monotonic()
+        elapsed = 0.0
+        while True:
+            round_max = 0.0
+            for channel_index, (channel_name, chan_obj) in enumerate(self.adc_channels.items()):
+                try:
+                    voltage = chan_obj.voltage
+                except Exception:
+                    continue # 單次讀取失敗時略過此通道
+                if sink is not None:
+                    sink.push(channel_index, time.perf_counter(), voltage)
+                channel_samples[channel_name].append(voltage)
+                if voltage > channel_max_voltages[channel_name]:
+                    channel_max_voltages[channel_name] = voltage
+                if voltage > round_max:
+                    round_max = voltage
+            elapsed = time.monotonic() - start_time
+            if detector.update(elapsed, round_max):
+                break
+            time.sleep(0.002) # 各通道已輪詢一次，短暫讓出 CPU
+
+        overall_max_voltage = max(channel_max_voltages.values())
+        self.last_channel_max_voltages = channel_max_voltages
+        self.last_channel_strike_peaks = {name: baseline_subtracted_peak(samples) for name, samples in channel_samples.items()}
+        self.last_measurement_duration_sec = elapsed
+        result.update({
+            'max_voltage': overall_max_voltage,
+            'channel_max_voltages': channel_max_voltages,
+            'duration_sec': elapsed,
+            'end_reason': detector.end_reason
+        })
+        print(f"SensorHandler: 自適應偵測於 {elapsed:.2f}s 結束 ({detector.end_reason})，最高電壓 {overall_max_voltage:.3f} V")
+        return result
+
     def check_any_piezo_trigger(self, threshold=0.1):
         """
         快速檢查是否有任何壓電薄膜被觸發 (電壓超過閾值)。
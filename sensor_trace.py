@@ -0,0 +1,160 @@
+# RandomGenerate/SPI_v2/sensor_trace.py
+"""
+壓電感測器原始波形 (trace) 的錄製、儲存與讀取。
+
+每個 trace 檔案是一個 .npz，內容為:
+    timestamps          (n,) float64，相對於錄製開始的秒數
+    voltages            (通道數, n) float32，各通道電壓
+    channel_names       (通道數,) 通道名稱，例如 'A0'
+    reference_force_kg  標註的參考力量 (kg)，未標註時為 NaN
+
+本模組不依賴任何硬體函式庫，離線工具 (校正、評估) 可直接匯入；
+錄製時才需要傳入已初始化的 SensorHandler。
+"""
+import os
+import time
+import numpy as np
+
+TRACE_FILE_EXTENSION = '.npz'
+
+
+class SensorTrace:
+    """一次錄製的多通道電壓波形。"""
+
+    def __init__(self, timestamps, voltages, channel_names, reference_force_kg=None, source_path=None):
+        """
+        參數:
+            timestamps (array-like): 每個取樣點的時間 (秒)。
+            voltages (array-like): 形狀為 (通道數, 取樣數) 的電壓陣列。
+            channel_names (list[str]): 通道名稱，順序對應 voltages 的列。
+            reference_force_kg (float, optional): 標註的參考力量 (kg)。
+            source_path (str, optional): 讀取來源檔案路徑。
+        """
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.voltages = np.atleast_2d(np.asarray(voltages, dtype=np.float32))
+        self.channel_names = [str(name) for name in channel_names]
+        self.reference_force_kg = None if reference_force_kg is None or np.isnan(reference_force_kg) else float(reference_force_kg)
+        self.source_path = source_path
+
+    @property
+    def duration_sec(self):
+        if self.timestamps.size < 2:
+            return 0.0
+        return float(self.timestamps[-1] - self.timestamps[0])
+
+    def channel_peaks(self):
+        """回傳各通道的峰值電壓，形狀為 (通道數,)。"""
+        if self.voltages.shape[1] == 0:
+            return np.zeros(len(self.channel_names), dtype=np.float32)
+        return self.voltages.max(axis=1)
+
+    def peak_voltage(self):
+        """回傳所有通道中的最高電壓 (與 get_max_voltage_from_all_channels 的定義一致)。"""
+        peaks = self.channel_peaks()
+        return float(peaks.max()) if peaks.size else 0.0
+
+
+def save_trace(path, trace):
+    """將 SensorTrace 寫入 .npz 檔 (壓縮)。"""
+    force = np.nan if trace.reference_force_kg is None else trace.reference_force_kg
+    np.savez_compressed(
+        path,
+        timestamps=trace.timestamps,
+        voltages=trace.voltages,
+        channel_names=np.asarray(trace.channel_names),
+        reference_force_kg=np.float64(force)
+    )
+
+
+def load_trace(path):
+    """從 .npz 檔讀取 SensorTrace。"""
+    with np.load(path, allow_pickle=False) as data:
+        force = float(data['reference_force_kg']) if 'reference_force_kg' in data else np.nan
+        return SensorTrace(
+            timestamps=data['timestamps'],
+            voltages=data['voltages'],
+            channel_names=list(data['channel_names']),
+            reference_force_kg=force,
+            source_path=path
+        )
+
+
+def list_trace_files(trace_dir):
+    """列出目錄 (含子目錄) 下所有 trace 檔案，依路徑排序。"""
+    trace_paths = []
+    for root, _dirs, files in os.walk(trace_dir):
+        for file_name in files:
+            if file_name.endswith(TRACE_FILE_EXTENSION):
+                trace_paths.append(os.path.join(root, file_name))
+    trace_paths.sort()
+    return trace_paths
+
+
+def record_trace(sensor_handler, duration_sec=3.0, sample_interval_sec=0.0, reference_force_kg=None):
+    """
+    以輪詢方式同時錄製所有已設定通道的電壓波形。
+
+    參數:
+        sensor_handler: 已初始化並設定通道的 SensorHandler 實例。
+        duration_sec (float): 錄製時間 (秒)。
+        sample_interval_sec (float): 每輪取樣之間的等待時間，0 表示盡可能快。
+        reference_force_kg (float, optional): 本次拍擊的參考力量 (kg)。
+
+    回傳:
+        SensorTrace 或 None (感測器未就緒時)。
+    """
+    if not sensor_handler or not sensor_handler.is_initialized or not sensor_handler.adc_channels:
+        print("SensorTrace 錯誤: SensorHandler 未就緒，無法錄製波形。")
+        return None
+
+    channel_names = list(sensor_handler.adc_channels.keys())
+    channel_objs = [sensor_handler.adc_channels[name] for name in channel_names]
+    timestamps = []
+    rows = []
+
+    start_time = time.monotonic()
+    now = start_time
+    while now - start_time < duration_sec:
+        row = []
+        for chan_obj in channel_objs:
+            try:
+                row.append(chan_obj.voltage)
+            except Exception:
+                row.append(0.0)
+        timestamps.append(now - start_time)
+        rows.append(row)
+        if sample_interval_sec > 0:
+            time.sleep(sample_interval_sec)
+        now = time.monotonic()
+
+    voltages = np.asarray(rows, dtype=np.float32).T if rows else np.zeros((len(channel_names), 0), dtype=np.float32)
+    return SensorTrace(timestamps, voltages, channel_names, reference_force_kg=reference_force_kg)
+
+
+# 使用範例: 在機台上錄製標註過的拍擊
+#   python sensor_trace.py traces/ 35.0     (以 35kg 參考力量錄製一筆)
+if __name__ == '__main__':
+    import sys
+    from sensor_handler import SensorHandler
+
+    if len(sys.argv) < 2:
+        print("用法: python sensor_trace.py <輸出目錄> [參考力量kg] [錄製秒數]")
+        sys.exit(1)
+
+    output_dir = sys.argv[1]
+    force_kg = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    record_sec = float(sys.argv[3]) if len(sys.argv) > 3 else 3.0
+    os.makedirs(output_dir, exist_ok=True)
+
+    handler = SensorHandler()
+    if not (handler.initialize_ads1115() and handler.setup_adc_channels()):
+        print("感測器初始化失敗，無法錄製。")
+        sys.exit(1)
+
+    input(f"請準備拍擊 (參考力量: {force_kg if force_kg is not None else '未標註'} kg)，按 Enter 開始錄製 {record_sec} 秒...")
+    recorded = record_trace(handler, duration_sec=record_sec, reference_force_kg=force_kg)
+    if recorded is not None:
+        file_name = time.strftime("trace_%Y%m%d_%H%M%S") + TRACE_FILE_EXTENSION
+        out_path = os.path.join(output_dir, file_name)
+        save_trace(out_path, recorded)
+        print(f"已儲存 {recorded.voltages.shape[1]} 筆取樣 (峰值 {recorded.peak_voltage():.3f} V) 至 {out_path}")
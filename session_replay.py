@@ -0,0 +1,315 @@
+# RandomGenerate/SPI_v2/session_replay.py
+"""
+遊戲局的確定性錄製與重播。
+
+一局遊戲的結果只取決於:
+    亂數種子、初始情緒值、幾何資訊 (含碰撞遮罩)、每幀經過的時間 (µs) 與該幀收到的跳躍輸入
+SessionRecorder 在遊戲中記錄這些資料，結束時寫成小型二進位檔 (.spr，幀資料以 zlib 壓縮)；
+重播時以相同的種子與幾何建立 GameSimulation，逐幀套用相同的輸入與經過時間，結果必然相同。
+
+重播可以:
+    - 無頭執行 (只跑模擬，驗證結果與錄製時相同)
+    - 以 HdmiGameEngine 逐幀繪製 (可在 SDL dummy 驅動下執行)，取得幀時間分布作為效能回歸基準
+
+命令列用法:
+    python session_replay.py replays/session_20240101_120000_1a2b3c4d.spr --headless
+    python session_replay.py 檔案.spr --render-mode dirty -o report.json --baseline old_report.json
+"""
+import argparse
+import json
+import os
+import random
+import struct
+import time
+import zlib
+
+from collision_masks import mask_from_bytes, mask_to_bytes
+from game_simulation import GameSimulation, GameGeometry
+
+REPLAY_FILE_EXTENSION = '.spr'
+_MAGIC = b'SPIR'
+_VERSION = 3 # 版本 2 加入碰撞遮罩區段 (版本 1 視為只用矩形碰撞)；版本 3 加入幾何的畫面高度 (之前為內部解析度的高)
+_HEADER = struct.Struct('<4sHIiII')       # magic, 版本, 種子, 初始情緒, 內部解析度 (寬, 高)
+_GEOMETRY = struct.Struct('<iiiIIB')      # screen_width, ground_y, player_x, player_w, player_h, 障礙物種類數
+_OBSTACLE = struct.Struct('<iII')         # 高度鍵, 寬, 高
+_GEOMETRY_HEIGHT = struct.Struct('<I')    # 幾何資訊所在的 (邏輯) 畫面高度
+_MASKS = struct.Struct('<I')              # 壓縮後的碰撞遮罩長度 (0 表示沒有遮罩)
+_RESULT = struct.Struct('<iiBII')         # score, final_mileage, 結束原因代碼, 模擬步數, 幀數
+_FRAME = struct.Struct('<IB')             # 經過時間 µs, 輸入數
+_INPUT = struct.Struct('<BH')             # 輸入來源代碼, 強度 x 1000
+
+INPUT_SOURCES = ('keyboard', 'piezo', 'bot')
+END_REASONS = (None, 'collision', 'mileage_zero', 'quit_event')
+
+
+class SessionRecording:
+    """一局的錄製內容。frames 為 [(經過時間 µs, ((來源, 強度), ...)), ...]。"""
+
+    def __init__(self, seed, initial_mileage, geometry, render_size, frames=None, result=None, steps=0):
+        self.seed = seed
+        self.initial_mileage = initial_mileage
+        self.geometry = geometry
+        self.render_size = tuple(render_size)
+        self.frames = frames if frames is not None else []
+        self.result = result
+        self.steps = steps
+
+    @property
+    def duration_ms(self):
+        return sum(dt_us for dt_us, _ in self.frames) / 1000.0
+
+    @property
+    def input_count(self):
+        return sum(len(inputs) for _, inputs in self.frames)
+
+    def to_bytes(self):
+        geometry = self.geometry
+        result = self.result or {}
+        parts = [
+            _HEADER.pack(_MAGIC, _VERSION, self.seed, self.initial_mileage, *self.render_size),
+            _GEOMETRY.pack(geometry.screen_width, geometry.ground_y, geometry.player_x,
+                           geometry.player_w, geometry.player_h, len(geometry.obstacle_height_keys)),
+            _GEOMETRY_HEIGHT.pack(geometry.screen_height)
+        ]
+        for key in geometry.obstacle_height_keys:
+            parts.append(_OBSTACLE.pack(key, *geometry.obstacle_sizes[key]))
+        masks = b''
+        if geometry.player_mask is not None:
+            masks = zlib.compress(b''.join([mask_to_bytes(geometry.player_mask)] +
+                                           [mask_to_bytes(geometry.obstacle_masks[key]) for key in geometry.obstacle_height_keys]), 9)
+        parts += [_MASKS.pack(len(masks)), masks]
+        parts.append(_RESULT.pack(result.get('score', 0), result.get('final_mileage', 0),
+                                  END_REASONS.index(result.get('reason')) if result.get('reason') in END_REASONS else 0,
+                                  self.steps, len(self.frames)))
+        body = bytearray()
+        for dt_us, inputs in self.frames:
+            body += _FRAME.pack(dt_us, len(inputs))
+            for source, strength in inputs:
+                body += _INPUT.pack(INPUT_SOURCES.index(source), min(65535, int(round(strength * 1000))))
+        parts.append(zlib.compress(bytes(body), 9))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, initial_mileage, render_w, render_h = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version not in (1, 2, _VERSION):
+            raise ValueError(f"不是可辨識的重播檔 (magic={magic!r}, 版本={version})")
+        offset = _HEADER.size
+        screen_width, ground_y, player_x, player_w, player_h, kinds = _GEOMETRY.unpack_from(data, offset)
+        offset += _GEOMETRY.size
+        geometry_height = render_h # 版本 3 之前直接在內部解析度上模擬
+        if version >= 3:
+            (geometry_height,) = _GEOMETRY_HEIGHT.unpack_from(data, offset)
+            offset += _GEOMETRY_HEIGHT.size
+        obstacle_sizes = {}
+        for _ in range(kinds):
+            key, width, height = _OBSTACLE.unpack_from(data, offset)
+            obstacle_sizes[key] = (width, height)
+            offset += _OBSTACLE.size
+        player_mask = obstacle_masks = None
+        if version >= 2:
+            (masks_size,) = _MASKS.unpack_from(data, offset)
+            offset += _MASKS.size
+            if masks_size:
+                masks = zlib.decompress(data[offset:offset + masks_size])
+                player_mask, position = mask_from_bytes(masks)
+                obstacle_masks = {}
+                for key in obstacle_sizes:
+                    obstacle_masks[key], position = mask_from_bytes(masks, position)
+            offset += masks_size
+        score, final_mileage, reason_code, steps, frame_count = _RESULT.unpack_from(data, offset)
+        offset += _RESULT.size
+
+        body = zlib.decompress(data[offset:])
+        frames = []
+        position = 0
+        for _ in range(frame_count):
+            dt_us, input_count = _FRAME.unpack_from(body, position)
+            position += _FRAME.size
+            inputs = []
+            for _ in range(input_count):
+                source_code, strength = _INPUT.unpack_from(body, position)
+                position += _INPUT.size
+                inputs.append((INPUT_SOURCES[source_code], strength / 1000.0))
+            frames.append((dt_us, tuple(inputs)))
+
+        geometry = GameGeometry(screen_width, ground_y, player_x, (player_w, player_h), obstacle_sizes,
+                                player_mask, obstacle_masks, geometry_height)
+        result = {'score': score, 'final_mileage': final_mileage, 'reason': END_REASONS[reason_code]}
+        return cls(seed, initial_mileage, geometry, (render_w, render_h), frames, result, steps)
+
+    def save(self, path):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(self.to_bytes())
+        os.replace(temp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class SessionRecorder:
+    """在遊戲中逐幀記錄輸入與經過時間。每幀只附加一個 tuple，不做檔案 I/O。"""
+
+    def __init__(self, seed, initial_mileage, geometry, render_size):
+        self.recording = SessionRecording(seed, initial_mileage, geometry, render_size)
+        self._pending_inputs = []
+
+    def record_input(self, source, strength=1.0):
+        """記錄本幀套用到模擬的跳躍輸入 (在 end_frame 之前呼叫)。"""
+        self._pending_inputs.append((source, strength))
+
+    def end_frame(self, dt_us):
+        """本幀推進模擬 dt_us 微秒；連同本幀的輸入寫入一筆幀記錄。"""
+        self.recording.frames.append((dt_us, tuple(self._pending_inputs)))
+        if self._pending_inputs:
+            self._pending_inputs = []
+
+    def finish(self, result, steps):
+        self.recording.result = dict(result)
+        self.recording.steps = steps
+        return self.recording
+
+    def save_to_directory(self, directory):
+        """寫入 directory/session_<時間>_<種子>.spr，回傳路徑；失敗時回傳 None。"""
+        try:
+            os.makedirs(directory, exist_ok=True)
+            name = f"session_{time.strftime('%Y%m%d_%H%M%S')}_{self.recording.seed:08x}{REPLAY_FILE_EXTENSION}"
+            return self.recording.save(os.path.join(directory, name))
+        except OSError as e:
+            print(f"SessionRecorder 警告: 無法寫入重播檔: {e}")
+            return None
+
+
+def new_session_seed():
+    return random.getrandbits(32)
+
+
+def geometry_matches(a, b):
+    """兩份幾何資訊的模擬結果是否相同：逐一比較數值欄位，遮罩以 mask_to_bytes 比較內容 (Mask 物件本身不能直接比較)。"""
+    fields = ('screen_width', 'screen_height', 'ground_y', 'player_x', 'player_w', 'player_h', 'obstacle_height_keys', 'obstacle_sizes')
+    if any(getattr(a, name) != getattr(b, name) for name in fields):
+        return False
+    if (a.player_mask is None) != (b.player_mask is None):
+        return False
+    if a.player_mask is None:
+        return True
+    return (mask_to_bytes(a.player_mask) == mask_to_bytes(b.player_mask) and
+            all(mask_to_bytes(a.obstacle_masks[key]) == mask_to_bytes(b.obstacle_masks[key]) for key in a.obstacle_height_keys))
+
+
+def results_match(recording, result):
+    """重播結果是否與錄製時相同 (因關閉視窗而中止的局只比較分數與情緒)。"""
+    expected = recording.result or {}
+    same = result['score'] == expected.get('score') and result['final_mileage'] == expected.get('final_mileage')
+    if expected.get('reason') != 'quit_event':
+        same = same and result['reason'] == expected.get('reason')
+    return same
+
+
+def replay_headless(recording, simulation_class=GameSimulation):
+    """
+    不繪圖，以錄製的幀時間與輸入重跑模擬。
+    回傳:
+        dict: {'result', 'steps', 'matches', 'elapsed_ms'}
+    """
+    start = time.perf_counter()
+    sim = simulation_class(recording.geometry, recording.initial_mileage, rng=random.Random(recording.seed))
+    accumulator_ms = 0.0
+    for dt_us, inputs in recording.frames:
+        for _source, strength in inputs:
+            sim.request_jump(strength)
+        # 與 HdmiGameEngine._advance_game 相同的累加方式
+        accumulator_ms += dt_us / 1000.0
+        while accumulator_ms >= simulation_class.STEP_MS and sim.game_active:
+            sim.step()
+            accumulator_ms -= simulation_class.STEP_MS
+    result = sim.result()
+    if recording.result and recording.result.get('reason') == 'quit_event' and sim.game_active:
+        result['reason'] = 'quit_event'
+    return {
+        'result': result,
+        'steps': sim.steps,
+        'matches': results_match(recording, result),
+        'elapsed_ms': (time.perf_counter() - start) * 1000
+    }
+
+
+def replay_rendered(recording, render_mode='dirty', background_style='parallax', realtime=False):
+    """
+    以 HdmiGameEngine 逐幀重播並繪製 (內部解析度與碰撞遮罩設定與錄製時相同)，回傳結果與遊戲幀的時間分布。
+    realtime 為 False 時不等待下一幀，用於效能回歸比較。
+    """
+    from hdmi_game_engine import HdmiGameEngine
+    engine = HdmiGameEngine(*recording.render_size, render_mode=render_mode, background_style=background_style,
+                            profiler_enabled=True, pixel_collision=recording.geometry.player_mask is not None)
+    try:
+        if not realtime:
+            engine.fps = 0 # FramePacer 不等待
+        start = time.perf_counter()
+        result = engine.run_replay(recording)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        return {
+            'result': result,
+            'matches': results_match(recording, result),
+            'elapsed_ms': elapsed_ms,
+            'render_mode': engine.render_mode,
+            'profile': engine.profiler.summary('game').get('game', {})
+        }
+    finally:
+        engine.cleanup()
+
+
+def compare_profiles(baseline, current):
+    """印出兩份重播報告 (replay_rendered 的回傳值) 的幀時間差異。"""
+    base_profile, profile = baseline.get('profile', {}), current.get('profile', {})
+    rows = [('frame', base_profile.get('frame_ms', {}), profile.get('frame_ms', {}))]
+    for phase, values in profile.get('phases', {}).items():
+        rows.append((phase, base_profile.get('phases', {}).get(phase, {}), values))
+    print(f"{'階段':<12}{'基準 p50':>10}{'目前 p50':>10}{'基準 p95':>10}{'目前 p95':>10}{'p95 差異':>10}")
+    for name, base, now in rows:
+        if not base or not now:
+            continue
+        delta = (now['p95'] - base['p95']) / base['p95'] * 100 if base['p95'] else 0.0
+        print(f"{name:<12}{base['p50']:>10.3f}{now['p50']:>10.3f}{base['p95']:>10.3f}{now['p95']:>10.3f}{delta:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重播錄製的遊戲局。")
+    parser.add_argument('replay', help="重播檔 (.spr)")
+    parser.add_argument('--headless', action='store_true', help="只跑模擬，不繪圖")
+    parser.add_argument('--render-mode', default='dirty', choices=('full', 'dirty', 'gpu'))
+    parser.add_argument('--background', default='parallax', choices=('plain', 'parallax'))
+    parser.add_argument('--realtime', action='store_true', help="依 FPS 等待 (預設不等待，以最快速度重播)")
+    parser.add_argument('--dummy', action='store_true', help="使用 SDL dummy 驅動 (不開視窗)")
+    parser.add_argument('-o', '--output', default=None, help="輸出重播報告 JSON")
+    parser.add_argument('--baseline', default=None, help="與先前輸出的報告比較幀時間")
+    args = parser.parse_args()
+
+    recording = SessionRecording.load(args.replay)
+    print(f"SessionReplay: 種子 {recording.seed:08x}，初始情緒 {recording.initial_mileage}，"
+          f"{len(recording.frames)} 幀 ({recording.duration_ms / 1000:.1f} 秒)，{recording.input_count} 次輸入，"
+          f"錄製結果 {recording.result}")
+
+    if args.headless:
+        report = replay_headless(recording)
+    else:
+        if args.dummy:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        report = replay_rendered(recording, args.render_mode, args.background, args.realtime)
+    print(f"重播結果 {report['result']}，{'與錄製相同' if report['matches'] else '與錄製不同！'}，耗時 {report['elapsed_ms']:.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"報告已寫入 {args.output}")
+    if args.baseline and 'profile' in report:
+        with open(args.baseline, encoding='utf-8') as f:
+            compare_profiles(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# RandomGenerate/SPI_v2/strike_window.py
+"""
+自適應測量窗口的判斷邏輯：偵測到拍擊並且訊號回落到基線一段時間後提前結束測量。
+
+此模組只處理 (時間, 電壓) 序列，不接觸硬體，因此可直接套用在 sensor_trace 錄製的波形上
+離線估算測量時間。
+"""
+
+
+class StrikeWindowDetector:
+    """判斷一次測量是否可以提前結束。"""
+
+    END_DECAYED = 'decayed'          # 拍擊後訊號已回落並維持足夠時間
+    END_MAX_DURATION = 'max_duration' # 達到最長測量時間
+
+    def __init__(self, strike_threshold=0.1, release_voltage=0.05, hold_sec=0.3,
+                 min_duration_sec=0.5, max_duration_sec=3.0):
+        """
+        參數:
+            strike_threshold (float): 任一通道超過此電壓即視為發生拍擊。
+            release_voltage (float): 拍擊後所有通道低於此電壓視為回到基線。
+            hold_sec (float): 回到基線需維持的時間 (秒)。
+            min_duration_sec (float): 最短測量時間，未滿前不會提前結束。
+            max_duration_sec (float): 最長測量時間。
+        """
+        self.strike_threshold = strike_threshold
+        self.release_voltage = release_voltage
+        self.hold_sec = hold_sec
+        self.min_duration_sec = min_duration_sec
+        self.max_duration_sec = max_duration_sec
+        self.reset()
+
+    def reset(self):
+        self.peak_voltage = 0.0
+        self.strike_detected = False
+        self.below_since = None
+        self.end_reason = None
+        self.end_time = None
+
+    def update(self, elapsed_sec, voltage):
+        """
+        輸入一筆取樣 (距測量開始的秒數, 本輪所有通道中的最高電壓)。
+
+        回傳:
+            bool: True 表示測量應該結束，原因記錄於 end_reason。
+        """
+        if self.end_reason:
+            return True
+        if voltage > self.peak_voltage:
+            self.peak_voltage = voltage
+
+        if voltage >= self.strike_threshold:
+            self.strike_detected = True
+            self.below_since = None
+        elif self.strike_detected and voltage <= self.release_voltage:
+            if self.below_since is None:
+                self.below_since = elapsed_sec
+            if elapsed_sec - self.below_since >= self.hold_sec and elapsed_sec >= self.min_duration_sec:
+                return self._finish(elapsed_sec, self.END_DECAYED)
+        else:
+            self.below_since = None # 仍在拍擊尾段，重新計算回落時間
+
+        if elapsed_sec >= self.max_duration_sec:
+            return self._finish(elapsed_sec, self.END_MAX_DURATION)
+        return False
+
+    def _finish(self, elapsed_sec, reason):
+        self.end_reason = reason
+        self.end_time = elapsed_sec
+        return True
+
+
+def replay_trace(trace, detector):
+    """
+    在錄製好的 SensorTrace 上執行偵測器。
+
+    回傳:
+        tuple: (窗口內峰值電壓, 實際測量秒數, 結束原因)
+    """
+    detector.reset()
+    per_sample_max = trace.voltages.max(axis=0) if trace.voltages.size else []
+    t0 = float(trace.timestamps[0]) if trace.timestamps.size else 0.0
+    elapsed = 0.0
+    for t, voltage in zip(trace.timestamps, per_sample_max):
+        elapsed = float(t) - t0
+        if detector.update(elapsed, float(voltage)):
+            return detector.peak_voltage, detector.end_time, detector.end_reason
+    return detector.peak_voltage, elapsed, detector.end_reason
+
+
+if __name__ == '__main__':
+    # 以合成波形示範: 0.3 秒時一次拍擊，之後回落
+    detector = StrikeWindowDetector(strike_threshold=0.1, release_voltage=0.05, hold_sec=0.3, min_duration_sec=0.5)
+    t = 0.0
+    while not detector.update(t, 0.8 if 0.3 <= t < 0.35 else (0.2 if 0.35 <= t < 0.4 else 0.01)):
+        t += 0.01
+    print(f"峰值 {detector.peak_voltage:.2f} V，於 {detector.end_time:.2f}s 結束 ({detector.end_reason})")
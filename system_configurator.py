@@ -32,12 +32,28 @@ BUTTON_PIN = 4
 # EmotionCalculator 參數設定
 EMOTION_VOLTAGE_THRESHOLD = 0.05 
 MAX_EMOTION_INDEX = 500      
+FORCE_CALIBRATION_PATH = os.path.join(os.path.dirname(__file__), 'force_calibration.json') # 由 force_calibration.py 產生，不存在時略過
 
 # SensorHandler / ADS1115 設定
 ADC_ADDRESS = 0x48
 PIEZO_CHANNELS = [0, 1, 2, 3] 
 ADC_GAIN = 2/3                
+ADC_DATA_RATE = 860           # 單次轉換每次讀取約 1.2 ms；預設的 128 SPS 約 8 ms，四通道輪詢一輪超過 30 ms
 PIEZO_JUMP_THRESHOLD = 0.1    
+PIEZO_JUMP_STRENGTH_SCALING = True # 遊戲中依拍擊電壓調整跳躍力道 (閾值 0.85 倍 ~ 全力 1.2 倍)
+PIEZO_JUMP_FULL_VOLTAGE = 1.5      # 視為全力拍擊的電壓
+PIEZO_JUMP_CHANNELS = None         # 遊戲中輪詢的通道名稱 (例如 ['A0'])；None 為全部。單一通道時改用連續轉換，取樣延遲約 1.2 ms
+
+# 情緒測量設定 (自適應模式: 拍擊結束並回到基線後提前結束測量)
+MEASUREMENT_DURATION_SEC = 3          # 固定模式下每個通道的偵測時間
+MEASUREMENT_ADAPTIVE = True
+MEASUREMENT_ADAPTIVE_OPTIONS = {
+    'strike_threshold': PIEZO_JUMP_THRESHOLD,
+    'release_voltage': EMOTION_VOLTAGE_THRESHOLD,
+    'hold_sec': 0.3,
+    'min_duration_sec': 0.8,
+    'max_duration_sec': 3.0
+}
 
 # SPI LCD Display (ILI9341) 腳位設定
 LCD_CS_PIN = board.CE0
@@ -48,10 +64,35 @@ LCD_BAUDRATE = 48000000
 LCD_ROTATION = 0
 
 # HDMI Game Engine 設定
-HDMI_SCREEN_WIDTH = 800 
+HDMI_SCREEN_WIDTH = 800 # HDMI_NATIVE_MODE 為 False (或無法取得原生模式) 時的輸出解析度
 HDMI_SCREEN_HEIGHT = 600 
+HDMI_NATIVE_MODE = True # 以螢幕原生解析度輸出 (pygame.display.list_modes)，不切換 HDMI 顯示模式
+HDMI_RENDER_SCALE = 0.5 # 內部繪圖解析度 = 輸出解析度 x 倍率 (1080p 時為 960x540)，每幀放大一次送出
+HDMI_AUTO_RENDER_SCALE = True # 遊戲幀持續超過預算時，下一局自動降低繪圖倍率
+HDMI_MIN_RENDER_SCALE = 0.4
+HDMI_FPS = 60 # 繪圖幀率；遊戲邏輯以固定步長執行，調低 FPS 不會改變遊戲難度
+HDMI_ADAPTIVE_FPS = True # 幀工作時間持續超過預算時自動降低目標幀率 (依 HDMI_FPS_LEVELS)，有餘裕時再升回
+HDMI_FPS_LEVELS = (60, 50, 30)
 PLAYER_IMAGE_PATH = os.path.join(os.path.dirname(__file__), 'player.png')
 OBSTACLE_IMAGE_PATH = os.path.join(os.path.dirname(__file__), 'obstacle.png')
+HDMI_RENDER_MODE = 'dirty' # 'full': 每幀整張重畫; 'dirty': 只重畫變動區域; 'gpu': SDL2 Renderer/Texture 繪製 (無 GPU 時用軟體 Renderer，建立失敗則退回 'full')
+HDMI_BACKGROUND_STYLE = 'parallax' # 'plain': 白底加地面; 'parallax': 分層視差背景 (離開傷心城市的天際線)
+HDMI_PROFILER_ENABLED = True # 記錄逐階段幀時間，遊戲中按 F3 顯示 p50/p95/p99 疊加層
+HDMI_PROFILE_DUMP_DIR = None # 設為資料夾路徑 (例如 os.path.join(os.path.dirname(__file__), 'profiles')) 則每局結束寫入分析結果
+HDMI_PROFILE_KEEP_FILES = 20 # 寫檔時每種分析結果只保留最新的幾個檔案
+HDMI_ASSET_CACHE_DIR = os.path.join(os.path.dirname(__file__), 'asset_cache') # 縮放後圖片的快取；來源圖片或解析度改變時自動重建
+HDMI_REPLAY_DIR = os.path.join(os.path.dirname(__file__), 'replays') # 每局的種子與輸入記錄 (數 KB)，可用 session_replay.py 重播；設為 None 則不記錄
+HDMI_PIXEL_COLLISION = True # 矩形重疊後再以碰撞遮罩判斷，圖片背景區域不算碰撞
+HDMI_PARTICLE_CAPACITY = 4096 # 跳躍與碰撞粒子效果的粒子上限 (NumPy 陣列預先配置)；設為 0 則關閉
+HDMI_CAPTURE_DIR = None # 設為資料夾路徑 (例如 os.path.join(os.path.dirname(__file__), 'captures')) 則在背景錄下每局畫面 (有 ffmpeg 時為 mp4，否則為 PNG 序列)
+HDMI_CAPTURE_SCALE = 0.5 # 錄影解析度相對於內部繪圖解析度的倍率
+HDMI_CAPTURE_FPS = 30
+HDMI_CAPTURE_MIN_SCORE = 100 # 分數低於此值的局不保留錄影
+HDMI_GAME_MODE = 'classic' # 每局的遊戲模式 (*_mode.py 宣告的名稱)：'classic' 單人跳躍、'versus' 雙人對戰
+HDMI_VERSUS_CHANNEL_GROUPS = (('A0', 'A1'), ('A2', 'A3')) # 對戰時 1P / 2P 各自的拍擊通道 (SensorHandler 的通道名稱)
+HDMI_WAVEFORM_VIEW = True # 測量情緒時顯示各通道的即時波形、峰值與情緒指數 (False 為只顯示文字)
+HDMI_WAVEFORM_WINDOW_SEC = 3.0 # 波形畫面顯示最近幾秒的取樣
+HDMI_WAVEFORM_FULL_SCALE_VOLTAGE = 3.0 # 波形上緣對應的電壓 (V)
 
 # 音樂播放設定
 MUSIC_DIRECTORIES = {
@@ -109,7 +150,7 @@ def initialize_systems():
 
         sensor_handler_instance = None
         try:
-            sensor_handler_instance = SensorHandler()
+            sensor_handler_instance = SensorHandler(data_rate=ADC_DATA_RATE)
             if sensor_handler_instance.initialize_ads1115(): 
                 if sensor_handler_instance.setup_adc_channels(channel_pins_config=None):
                     initialized_components['sensor_handler'] = sensor_handler_instance
@@ -125,7 +166,8 @@ def initialize_systems():
         try:
             emotion_calc = EmotionCalculator(
                 min_voltage_threshold=EMOTION_VOLTAGE_THRESHOLD,
-                max_emotion_value=MAX_EMOTION_INDEX
+                max_emotion_value=MAX_EMOTION_INDEX,
+                force_calibration_path=FORCE_CALIBRATION_PATH
             )
             initialized_components['emotion_calculator'] = emotion_calc
             print(f"情緒計算器已初始化 (閾值={EMOTION_VOLTAGE_THRESHOLD}V, 上限={MAX_EMOTION_INDEX})。")
@@ -158,7 +200,34 @@ def initialize_systems():
                 obstacle_img_path=OBSTACLE_IMAGE_PATH,
                 sensor_handler_instance=initialized_components.get('sensor_handler'), 
                 piezo_jump_threshold=PIEZO_JUMP_THRESHOLD,
-                led_controller_instance=initialized_components.get('led_controller')
+                led_controller_instance=initialized_components.get('led_controller'),
+                render_mode=HDMI_RENDER_MODE,
+                background_style=HDMI_BACKGROUND_STYLE,
+                fps=HDMI_FPS,
+                adaptive_fps=HDMI_ADAPTIVE_FPS,
+                fps_levels=HDMI_FPS_LEVELS,
+                profiler_enabled=HDMI_PROFILER_ENABLED,
+                profile_dump_dir=HDMI_PROFILE_DUMP_DIR,
+                profile_keep_files=HDMI_PROFILE_KEEP_FILES,
+                asset_cache_dir=HDMI_ASSET_CACHE_DIR,
+                native_mode=HDMI_NATIVE_MODE,
+                render_scale=HDMI_RENDER_SCALE,
+                auto_render_scale=HDMI_AUTO_RENDER_SCALE,
+                min_render_scale=HDMI_MIN_RENDER_SCALE,
+                replay_dir=HDMI_REPLAY_DIR,
+                piezo_strength_scaling=PIEZO_JUMP_STRENGTH_SCALING,
+                piezo_full_voltage=PIEZO_JUMP_FULL_VOLTAGE,
+                piezo_channels=PIEZO_JUMP_CHANNELS,
+                pixel_collision=HDMI_PIXEL_COLLISION,
+                particle_capacity=HDMI_PARTICLE_CAPACITY,
+                capture_dir=HDMI_CAPTURE_DIR,
+                capture_scale=HDMI_CAPTURE_SCALE,
+                capture_fps=HDMI_CAPTURE_FPS,
+                capture_min_score=HDMI_CAPTURE_MIN_SCORE,
+                versus_channel_groups=HDMI_VERSUS_CHANNEL_GROUPS,
+                waveform_view=HDMI_WAVEFORM_VIEW,
+                waveform_window_sec=HDMI_WAVEFORM_WINDOW_SEC,
+                waveform_full_scale=HDMI_WAVEFORM_FULL_SCALE_VOLTAGE
             )
             if hdmi_game.is_initialized:
                 initialized_components['hdmi_game_engine'] = hdmi_game
@@ -211,6 +280,7 @@ def cleanup_systems(initialized_components):
     if initialized_components.get('led_controller'):
         led_controller = initialized_components['led_controller']
         if led_controller and hasattr(led_controller, 'clear'): # 確保物件存在且有 clear 方法
+            led_controller.stop_effects() # 背景燈效結束後才清除，避免兩個執行緒同時寫入燈條
             led_controller.clear()
             print("LED 控制器已清理。")
     
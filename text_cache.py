@@ -0,0 +1,123 @@
+# RandomGenerate/SPI_v2/text_cache.py
+"""
+HdmiGameEngine 的文字繪製層。
+
+CJK TrueType 字型的 font.render 成本很高，因此:
+1. TextRenderCache: 以 (字型, 文字, 顏色) 為鍵的 LRU 快取，重複出現的文字直接取用已繪製的 Surface。
+2. GlyphAtlas: 預先繪製 0-9 數字與固定標籤 (例如 "價值: ")，變動的數值由快取的字形逐字貼上，
+   不需要每次重新 render 整行文字。
+
+兩者都會統計命中率與估計節省的繪製時間。
+"""
+import time
+from collections import OrderedDict
+import pygame
+
+
+class TextRenderCache:
+    """以 LRU 策略快取 font.render 結果。"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.render_time_sec = 0.0 # 快取未命中時實際花費的繪製時間
+
+    def render(self, font, text, color, antialias=True):
+        """回傳已繪製的文字 Surface (呼叫端不應修改回傳的 Surface)。"""
+        key = (font, text, color, antialias)
+        surface = self._entries.get(key)
+        if surface is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        start = time.perf_counter()
+        surface = font.render(text, antialias, color)
+        self.render_time_sec += time.perf_counter() - start
+        self.misses += 1
+        self._entries[key] = surface
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        avg_render_ms = self.render_time_sec * 1000 / self.misses if self.misses else 0.0
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'avg_render_ms': avg_render_ms,
+            'estimated_saved_ms': self.hits * avg_render_ms
+        }
+
+
+class GlyphAtlas:
+    """單一字型與顏色的數字 / 固定標籤字形表，用於組合 "標籤 + 數字" 的 HUD 文字。"""
+
+    DIGITS = '0123456789-'
+
+    def __init__(self, font, color, labels=(), antialias=True):
+        self.font = font
+        self.color = color
+        self.glyphs = {}
+        self.advances = {}
+        for ch in self.DIGITS:
+            self.glyphs[ch] = font.render(ch, antialias, color)
+            self.advances[ch] = font.size(ch)[0]
+        self.labels = {}
+        for label in labels:
+            self.add_label(label, antialias)
+
+        # 量測一次整行繪製的成本，作為節省時間的估計基準
+        start = time.perf_counter()
+        font.render(f"{labels[0] if labels else ''}12345", antialias, color)
+        self.full_render_ms = (time.perf_counter() - start) * 1000
+        self.composed_lines = 0
+
+    def add_label(self, label, antialias=True):
+        self.labels[label] = (self.font.render(label, antialias, self.color), self.font.size(label)[0])
+
+    def layout(self, label, number, position):
+        """
+        回傳組成 "label + number" 所需的 (Surface, (x, y)) 列表，不做任何 font.render。
+        label 必須已在建構時或經 add_label 登錄。
+        """
+        x, y = position
+        blits = []
+        label_surface, label_advance = self.labels[label]
+        blits.append((label_surface, (x, y)))
+        x += label_advance
+        for ch in str(int(number)):
+            blits.append((self.glyphs[ch], (x, y)))
+            x += self.advances[ch]
+        self.composed_lines += 1
+        return blits
+
+    def get_stats(self):
+        return {
+            'composed_lines': self.composed_lines,
+            'full_render_ms': self.full_render_ms,
+            'estimated_saved_ms': self.composed_lines * self.full_render_ms
+        }
+
+
+if __name__ == '__main__':
+    pygame.init()
+    test_font = pygame.font.Font(None, 32)
+    cache = TextRenderCache(max_entries=4)
+    for i in range(100):
+        cache.render(test_font, f"dots{'.' * (i % 4)}", (0, 0, 0))
+    print("TextRenderCache:", cache.get_stats())
+
+    atlas = GlyphAtlas(test_font, (0, 0, 0), labels=("Score: ",))
+    for score in range(1000):
+        atlas.layout("Score: ", score, (10, 10))
+    print("GlyphAtlas:", atlas.get_stats())
+    pygame.quit()
@@ -0,0 +1,532 @@
+# RandomGenerate/SPI_v2/versus_mode.py
+"""
+雙人對戰模式：畫面分成上下兩條跑道，每條跑道有自己的 GameSimulation、輸入與分數。
+
+第二條跑道的成本遠低於再畫一次單人畫面:
+    - 圖片依跑道高度只縮放一次 (ScaledAssetCache / CollisionMaskCache)，兩條跑道共用同一組 Surface 與遮罩
+    - 背景 (白底或視差背景) 只預繪一份；每條跑道繪製前以自己的捲動量 set_scroll()
+    - 每條跑道以畫面的 subsurface 為畫布、各有一個 DirtyRectRenderer，
+      變動區域收集起來，每幀只呼叫一次 display.update(rects)
+    - 同一階段 (背景、精靈、HUD) 的兩條跑道連續繪製，效能分析器每幀每階段只記錄一次
+每條跑道與單人模式一樣在高度固定的邏輯解析度上模擬 (logical_screen_size)，繪圖時以 RenderMapping 換算到跑道，
+因此跑道較矮不會改變跳躍、速度與碰撞的相對尺寸，難度與單人模式相同。
+
+輸入: 鍵盤 上方跑道 SPACE / W、下方跑道 UP / ENTER；
+拍擊由 PiezoInputThread 依 channel_groups 分組偵測，事件的 group 就是跑道索引。
+任一跑道情緒歸零即獲勝；否則兩條跑道都碰撞後以分數高者獲勝。
+"""
+import random
+import time
+
+import pygame
+
+from dirty_renderer import DirtyRectRenderer
+from game_modes import GameMode
+from game_simulation import GameGeometry, GameSimulation, RenderMapping, logical_screen_size
+from hdmi_scenes import GameOverScene, Scene
+from parallax_background import ParallaxBackground
+from piezo_input import PIEZO_STRIKE_EVENT, jump_strength_for_amplitude
+from session_replay import new_session_seed
+
+GAME_MODE = {'name': 'versus', 'title': '雙人對戰', 'class': 'VersusGameMode', 'order': 20,
+             'description': '上下兩條跑道，先讓情緒歸零或分數較高者獲勝'}
+
+LANE_COUNT = 2
+LANE_KEYS = ((pygame.K_SPACE, pygame.K_w), (pygame.K_UP, pygame.K_RETURN))
+LANE_LABELS = ("1P", "2P")
+LANE_COLORS = ((200, 60, 60), (40, 90, 200))
+
+
+class LaneAssets:
+    """兩條跑道共用的圖片、遮罩、幾何資訊與背景。以 for_engine() 取得，同一跑道尺寸只建立一次。"""
+
+    _cache = {}
+    SCALE_FACTOR = 1.5 # 與 HdmiGameEngine._load_game_assets 相同
+
+    @classmethod
+    def for_engine(cls, engine, lane_size):
+        key = (tuple(lane_size), engine.player_img_path, engine.obstacle_img_path, engine.background_style, engine.pixel_collision)
+        assets = cls._cache.get(key)
+        if assets is None:
+            assets = cls._cache[key] = cls(engine, lane_size)
+        return assets
+
+    def __init__(self, engine, lane_size):
+        start = time.perf_counter()
+        self.width, self.height = lane_size
+        self.player_image, self.obstacle_images = self._load_images(engine, lane_size)
+        # 模擬在邏輯解析度上進行 (高度與單人模式相同)，幾何與碰撞遮罩使用邏輯尺寸的圖片
+        logical_width, logical_height = logical_screen_size(lane_size)
+        logical_player, logical_obstacles = self._load_images(engine, (logical_width, logical_height))
+        player_mask = obstacle_masks = None
+        if engine.pixel_collision:
+            player_mask = engine.collision_mask_cache.mask_for(engine.player_img_path, logical_player)
+            obstacle_masks = {key: engine.collision_mask_cache.mask_for(engine.obstacle_img_path, image)
+                              for key, image in logical_obstacles.items()}
+        self.ground_y = self.height - int(self.height * 0.15)
+        self.geometry = GameGeometry(
+            screen_width=logical_width,
+            ground_y=logical_height - int(logical_height * 0.15),
+            player_x=int(logical_width * 0.1),
+            player_size=logical_player.get_size(),
+            obstacle_sizes={key: image.get_size() for key, image in logical_obstacles.items()},
+            player_mask=player_mask,
+            obstacle_masks=obstacle_masks,
+            screen_height=logical_height
+        )
+        self.obstacle_y = {key: self.ground_y - image.get_height() for key, image in self.obstacle_images.items()}
+
+        self.parallax_background = None
+        if engine.background_style == engine.BACKGROUND_PARALLAX:
+            self.parallax_background = ParallaxBackground.for_resolution(lane_size, self.ground_y, engine.GROUND_COLOR)
+            self.background = self.parallax_background.base_surface
+        else:
+            self.background = pygame.Surface(lane_size).convert()
+            self.background.fill(engine.WHITE)
+            pygame.draw.rect(self.background, engine.GROUND_COLOR, (0, self.ground_y, self.width, self.height - self.ground_y))
+        print(f"LaneAssets: 已建立 {self.width}x{self.height} 跑道資源，{(time.perf_counter() - start) * 1000:.1f} ms。")
+
+    def _load_images(self, engine, size):
+        """依 size 的高度縮放玩家與障礙物圖片 (無法載入時縮小單人模式的圖片)。"""
+        scale_factor = self.SCALE_FACTOR
+        height = size[1]
+        player_h = int(height * 0.13 * scale_factor)
+        try:
+            player_image = engine.asset_cache.load_scaled(engine.player_img_path, [player_h], size, scale_factor)[0]
+        except Exception as e:
+            print(f"警告：無法載入跑道的玩家圖片 '{engine.player_img_path}': {e}。改為縮小單人模式的圖片。")
+            player_image = _scale_to_height(engine.player_image, player_h)
+        obstacle_heights = {50: int(height * 0.07 * scale_factor), 75: int(height * 0.12 * scale_factor)}
+        try:
+            scaled = engine.asset_cache.load_scaled(engine.obstacle_img_path, list(obstacle_heights.values()), size, scale_factor)
+            obstacle_images = dict(zip(obstacle_heights.keys(), scaled))
+        except Exception as e:
+            print(f"警告：無法載入跑道的障礙物圖片 '{engine.obstacle_img_path}': {e}。改為縮小單人模式的圖片。")
+            obstacle_images = {key: _scale_to_height(engine.obstacle_images_scaled[key], h) for key, h in obstacle_heights.items()}
+        return player_image, obstacle_images
+
+
+def lane_size(engine):
+    """目前內部解析度下每條跑道的 (寬, 高)。"""
+    screen_width, screen_height = engine.screen.get_size()
+    return (screen_width, screen_height // LANE_COUNT)
+
+
+def _scale_to_height(surface, target_h):
+    width, height = surface.get_size()
+    return pygame.transform.smoothscale(surface, (max(1, int(width * target_h / height)), target_h))
+
+
+class _LaneDisplay:
+    """
+    跑道 DirtyRectRenderer 的送出介面：把跑道座標的區域平移到整個畫面並暫存，
+    等所有跑道都畫完後由 VersusScene 一次送出。
+    """
+
+    def __init__(self, lane_rect, pending_rects):
+        self.lane_rect = lane_rect
+        self.pending_rects = pending_rects
+
+    def flip(self):
+        self.pending_rects.append(self.lane_rect.copy())
+
+    def update(self, rects):
+        top = self.lane_rect.top
+        self.pending_rects.extend(rect.move(0, top) for rect in rects)
+
+
+class VersusLane:
+    """一條跑道：獨立的模擬、固定步長累加器與 dirty-rect 繪圖器；圖片與背景來自共用的 LaneAssets。"""
+
+    def __init__(self, index, assets, screen, top, initial_mileage, seed, pending_rects):
+        self.index = index
+        self.assets = assets
+        self.rect = pygame.Rect(0, top, assets.width, assets.height)
+        self.surface = screen.subsurface(self.rect)
+        self.simulation = GameSimulation(assets.geometry, initial_mileage, rng=random.Random(seed))
+        self.mapping = RenderMapping(assets.geometry, assets.height, assets.ground_y)
+        self.accumulator_ms = 0.0
+        self.alpha = 0.0
+        self.renderer = DirtyRectRenderer(self.surface, assets.background, _LaneDisplay(self.rect, pending_rects))
+        self.player_rect = assets.player_image.get_rect()
+        self.player_rect.x = self.mapping.player_x
+
+    @property
+    def active(self):
+        return self.simulation.game_active
+
+    def advance(self, dt_ms):
+        """以固定步長推進本跑道，回傳是否至少執行了一步。"""
+        sim = self.simulation
+        self.accumulator_ms += dt_ms
+        stepped = False
+        while self.accumulator_ms >= GameSimulation.STEP_MS and sim.game_active:
+            sim.step()
+            self.accumulator_ms -= GameSimulation.STEP_MS
+            stepped = True
+        self.alpha = self.accumulator_ms / GameSimulation.STEP_MS if sim.game_active else 1.0
+        return stepped
+
+    def collect_sprites(self):
+        """本幀要繪製的 (Surface, 跑道內位置) 列表。"""
+        sim = self.simulation
+        assets = self.assets
+        alpha = self.alpha
+        mapping = self.mapping
+        self.player_rect.bottom = mapping.player_bottom(sim, alpha)
+        sprites = [(assets.player_image, self.player_rect)]
+        pool = sim.obstacles
+        for index in range(pool.count):
+            slot = pool.slot(index)
+            height_key = pool.height_key[slot]
+            sprites.append((assets.obstacle_images[height_key], (mapping.obstacle_x(sim, slot, alpha), assets.obstacle_y[height_key])))
+        return sprites
+
+    def collect_hud(self, engine):
+        """跑道標籤、分數與情緒 (由 HUD 字形表組合)，以及出局提示。"""
+        sim = self.simulation
+        line_h = engine.font_small.get_linesize()
+        y = int(self.assets.height * 0.03)
+        label = engine.text_cache.render(engine.font_medium, LANE_LABELS[self.index], LANE_COLORS[self.index])
+        blits = [(label, (self.assets.width - label.get_width() - 10, y))]
+        blits += engine.hud_atlas.layout(engine.HUD_MILEAGE_LABEL, sim.current_mileage, (10, y))
+        blits += engine.hud_atlas.layout(engine.HUD_SCORE_LABEL, sim.score, (10, y + line_h))
+        if not sim.game_active and sim.game_over_reason == "collision":
+            out = engine.text_cache.render(engine.font_large, "出局", LANE_COLORS[self.index])
+            blits.append((out, (self.assets.width // 2 - out.get_width() // 2, self.assets.height // 2 - out.get_height() // 2)))
+        return blits
+
+    def result(self):
+        return self.simulation.result()
+
+
+class VersusScene(Scene):
+    """雙人對戰進行中：兩條跑道各自推進，依繪圖模式一起繪製，每幀送出一次畫面。"""
+
+    name = 'versus'
+
+    def __init__(self, engine, initial_mileage):
+        super().__init__(engine)
+        self.initial_mileage = initial_mileage
+        self.lanes = []
+        self.pending_rects = []
+        self.needs_full_present = True
+        self.ended = False
+        self.reported = False
+        self.winner = None
+
+    def on_enter(self):
+        engine = self.engine
+        screen_width, screen_height = engine.screen.get_size()
+        lane_h = lane_size(engine)[1]
+        assets = LaneAssets.for_engine(engine, (screen_width, lane_h))
+        seed = new_session_seed() # 兩條跑道同一種子：開局的障礙物相同，之後依各自的得分而不同
+        # 畫面高度為奇數時最後一條跑道貼齊底部，中間多出的一列在整張重畫時填成地面色
+        tops = [index * lane_h for index in range(LANE_COUNT - 1)] + [screen_height - lane_h]
+        self.lanes = [VersusLane(index, assets, engine.screen, top, self.initial_mileage, seed, self.pending_rects)
+                      for index, top in enumerate(tops)]
+        self._sync_engine(self.lanes[0])
+        engine.game_active = True
+        engine.latency_tracer.reset()
+        engine.frame_pacer.restart()
+        engine.render_stats = {'frames': 0, 'pixels_pushed': 0, 'last_frame_pixels': 0}
+        if engine.piezo_input:
+            engine.piezo_input.set_channel_groups(engine.versus_channel_groups)
+            engine.piezo_input.resume()
+        engine._set_game_leds()
+        pygame.event.clear()
+        print(f"開始 HDMI 雙人對戰，初始情緒: {self.initial_mileage}，跑道 {screen_width}x{lane_h}。")
+
+    def on_exit(self):
+        self._report()
+
+    def _report(self):
+        if self.reported:
+            return
+        self.reported = True
+        engine = self.engine
+        if engine.piezo_input:
+            engine.piezo_input.pause()
+            engine.piezo_input.set_channel_groups(None)
+        for lane in self.lanes:
+            result = lane.result()
+            print(f"HDMI 對戰 {LANE_LABELS[lane.index]}: 價值 {result['score']}，剩餘情緒 {result['final_mileage']}，"
+                  f"{lane.simulation.jumps} 次跳躍 (原因: {result['reason'] or '未結束'})。")
+        render_stats = engine.get_render_stats()
+        print(f"HdmiGameEngine: 對戰 {render_stats['frames']} 幀，平均每幀推送 {render_stats['avg_pixels_per_frame']:.0f} 像素 "
+              f"({render_stats['avg_screen_fraction'] * 100:.1f}% 畫面)。")
+        summary = engine.profiler.summary(self.name).get(self.name) if engine.profiler.enabled else None
+        if summary:
+            frame = summary['frame_ms']
+            print(f"HdmiGameEngine: 對戰幀時間 p50 {frame['p50']:.2f} / p95 {frame['p95']:.2f} / p99 {frame['p99']:.2f} ms，"
+                  f"掉幀 {summary['dropped_frames']}/{summary['frames']}。")
+
+    def invalidate(self):
+        for lane in self.lanes:
+            lane.renderer.invalidate()
+        self.needs_full_present = True
+
+    def _sync_engine(self, lane):
+        """HUD 以外 (結束流程、main.py 的結果顯示) 仍讀取引擎的 score / current_mileage，以代表的跑道同步。"""
+        engine = self.engine
+        engine.score = lane.simulation.score
+        engine.current_mileage = lane.simulation.current_mileage
+        engine.game_over_reason = lane.simulation.game_over_reason
+
+    def result(self):
+        """{'score', 'final_mileage', 'reason': 勝者 (平手時為 1P) 的結果, 'winner': 跑道索引或 None, 'lanes': [各跑道結果]}"""
+        lanes = [lane.result() for lane in self.lanes]
+        representative = lanes[self.winner if self.winner is not None else 0]
+        return dict(representative, winner=self.winner, lanes=lanes)
+
+    def handle_event(self, event):
+        engine = self.engine
+        if event.type == pygame.QUIT:
+            self.ended = True
+            self._report()
+            engine._finish_game_flow(dict(self.result(), reason='quit_event'))
+        elif self.ended:
+            return
+        elif event.type == pygame.KEYDOWN:
+            for lane in self.lanes:
+                if event.key in LANE_KEYS[lane.index]:
+                    self._jump(lane, 'keyboard', 1.0, getattr(event, 'sample_time', self.manager.last_pump_time))
+        elif event.type == PIEZO_STRIKE_EVENT:
+            group = getattr(event, 'group', None)
+            if group is None or group >= len(self.lanes):
+                return # 未分組的拍擊無法判斷是哪位玩家
+            strength = 1.0
+            if engine.piezo_strength_scaling:
+                strength = jump_strength_for_amplitude(event.amplitude, engine.piezo_jump_threshold, engine.piezo_full_voltage)
+            self._jump(self.lanes[group], 'piezo', strength, event.sample_time)
+
+    def _jump(self, lane, source, strength, source_time):
+        if not lane.active:
+            return
+        if source_time is not None:
+            self.engine.latency_tracer.input_consumed(source, source_time)
+        lane.simulation.request_jump(round(strength, 3))
+
+    def update(self, dt_ms):
+        super().update(dt_ms)
+        engine = self.engine
+        if self.ended:
+            if engine.game_result is None:
+                self.manager.change(VersusResultScene(engine, self.initial_mileage, self.result()))
+            return
+        stepped = False
+        for lane in self.lanes:
+            stepped = lane.advance(dt_ms) or stepped
+        if stepped:
+            engine.latency_tracer.simulation_stepped()
+        finished = [lane for lane in self.lanes if lane.simulation.game_over_reason == "mileage_zero"]
+        if finished or not any(lane.active for lane in self.lanes):
+            self.ended = True # 最後一幀仍照常繪製，下一幀才換到結果畫面
+            if len(finished) == 1:
+                self.winner = finished[0].index
+            else:
+                contenders = finished or self.lanes
+                best = max(lane.simulation.score for lane in contenders)
+                leaders = [lane for lane in contenders if lane.simulation.score == best]
+                self.winner = leaders[0].index if len(leaders) == 1 else None
+            engine.game_active = False
+            self._sync_engine(self.lanes[self.winner if self.winner is not None else 0])
+        else:
+            self._sync_engine(max(self.lanes, key=lambda lane: lane.simulation.score))
+
+    def draw(self):
+        if self.engine.game_result is None:
+            self._draw_frame()
+
+    def _draw_frame(self):
+        engine = self.engine
+        profiler = engine.profiler
+        lanes = self.lanes
+        parallax = lanes[0].assets.parallax_background
+        if engine.gpu_presenter:
+            presenter = engine.gpu_presenter
+            presenter.begin_frame()
+            for lane in lanes:
+                if parallax:
+                    parallax.set_scroll(lane.mapping.scroll(lane.simulation, lane.alpha))
+                    presenter.draw_parallax(parallax, lane.rect.top)
+                else:
+                    presenter.draw(lane.assets.background, lane.rect.topleft)
+            profiler.mark('background')
+            for lane in lanes:
+                top = lane.rect.top
+                for image, position in lane.collect_sprites():
+                    presenter.draw(image, (position[0], position[1] + top))
+            profiler.mark('sprites')
+            for lane in lanes:
+                top = lane.rect.top
+                for image, position in lane.collect_hud(engine):
+                    presenter.draw(image, (position[0], position[1] + top))
+            profiler.mark('hud')
+            overlay_start = time.perf_counter()
+            overlay = profiler.overlay_surface(engine.profiler_font, scene=self.name)
+            if overlay:
+                presenter.draw(overlay, profiler.overlay_position(engine.screen_width, overlay))
+                profiler.mark_overlay(overlay_start)
+            presenter.present()
+            pixels = engine.screen_width * engine.screen_height
+        elif engine.render_mode == engine.RENDER_MODE_DIRTY:
+            for lane in lanes:
+                lane.renderer.begin_frame()
+                if parallax:
+                    parallax.set_scroll(lane.mapping.scroll(lane.simulation, lane.alpha))
+                    for band_rect in parallax.draw_layers(lane.surface):
+                        lane.renderer.mark_dirty(band_rect)
+            profiler.mark('background')
+            for lane in lanes:
+                renderer = lane.renderer
+                for image, position in lane.collect_sprites():
+                    renderer.draw(image, position)
+            profiler.mark('sprites')
+            for lane in lanes:
+                renderer = lane.renderer
+                for image, position in lane.collect_hud(engine):
+                    renderer.draw(image, position)
+            profiler.mark('hud')
+            overlay_rect = profiler.draw_overlay(engine.screen, engine.profiler_font, scene=self.name)
+            if overlay_rect:
+                lanes[0].renderer.mark_dirty(overlay_rect) # 疊加層在右上角，屬於上方跑道
+            del self.pending_rects[:]
+            pixels = sum(lane.renderer.present() for lane in lanes)
+            if self.needs_full_present:
+                self._present_full()
+            elif self.pending_rects:
+                engine.display.update(self.pending_rects)
+        else:
+            for lane in lanes:
+                lane.surface.blit(lane.assets.background, (0, 0))
+                if parallax:
+                    parallax.set_scroll(lane.mapping.scroll(lane.simulation, lane.alpha))
+                    parallax.draw_layers(lane.surface)
+            profiler.mark('background')
+            for lane in lanes:
+                lane.surface.blits(lane.collect_sprites(), doreturn=False)
+            profiler.mark('sprites')
+            for lane in lanes:
+                lane.surface.blits(lane.collect_hud(engine), doreturn=False)
+            profiler.mark('hud')
+            profiler.draw_overlay(engine.screen, engine.profiler_font, scene=self.name)
+            self._present_full()
+            pixels = engine.screen.get_width() * engine.screen.get_height()
+        engine.latency_tracer.frame_presented()
+        profiler.mark('present')
+        engine.render_stats['frames'] += 1
+        engine.render_stats['pixels_pushed'] += pixels
+        engine.render_stats['last_frame_pixels'] = pixels
+
+    def _present_full(self):
+        """整張送出；跑道之間因畫面高度為奇數而多出的一列在此填滿。"""
+        engine = self.engine
+        if self.needs_full_present:
+            gap_top = self.lanes[0].rect.bottom
+            gap_h = self.lanes[-1].rect.top - gap_top
+            if gap_h > 0:
+                engine.screen.fill(engine.GROUND_COLOR, (0, gap_top, engine.screen_width, gap_h))
+            self.needs_full_present = engine.render_mode != engine.RENDER_MODE_DIRTY
+        engine.display.flip()
+
+
+class VersusResultScene(GameOverScene):
+    """對戰結果：勝者與兩條跑道的分數；按 Q 後與單人結束畫面相同地返回主選單。"""
+
+    name = 'versus_over'
+
+    def __init__(self, engine, initial_mileage, result):
+        super().__init__(engine, initial_mileage)
+        self.versus_result = result
+
+    def result(self):
+        return self.versus_result
+
+    def draw_content(self):
+        if self.returning_since_ms is not None:
+            super().draw_content()
+            return
+        engine = self.engine
+        winner = self.versus_result['winner']
+        if winner is None:
+            title_rendered = engine.text_cache.render(engine.font_large, "平手", engine.BLACK)
+        else:
+            title_rendered = engine.text_cache.render(engine.font_large, f"{LANE_LABELS[winner]} 獲勝", LANE_COLORS[winner])
+        pad = int(engine.screen_height * 0.05)
+        text_y = int(engine.screen_height * 0.2)
+        self.blit_centered(title_rendered, text_y)
+        text_y += title_rendered.get_height() + pad
+        for index, lane_result in enumerate(self.versus_result['lanes']):
+            line = engine.text_cache.render(engine.font_medium,
+                                            f"{LANE_LABELS[index]}  獲得價值: {lane_result['score']}  剩餘情緒: {lane_result['final_mileage']}",
+                                            LANE_COLORS[index])
+            self.blit_centered(line, text_y)
+            text_y += line.get_height() + pad
+        instr_rendered = engine.text_cache.render(engine.font_small, "按 Q 鍵返回主選單", (80, 80, 80))
+        self.blit_centered(instr_rendered, text_y + pad)
+
+
+class VersusGameMode(GameMode):
+    """雙人對戰模式：setup 時先建立 (或取出快取的) 跑道資源，開局時不再縮放圖片。"""
+
+    def setup(self, engine):
+        LaneAssets.for_engine(engine, lane_size(engine))
+
+    def start(self, engine, initial_mileage):
+        engine.start_versus(initial_mileage)
+
+
+def benchmark_versus(frames=600, screen_size=(800, 600), render_mode='dirty', background_style='parallax', seed=1):
+    """
+    以 SDL dummy 驅動比較單人 GameScene 與雙人 VersusScene 每幀的工作時間 (update + draw，不含幀間隔等待)。
+    兩者都由 ReactiveBotPolicy 自動跳躍，結束時立即重新開始。
+    回傳:
+        dict: {'single': {'mean_ms', 'p50_ms', 'p95_ms'}, 'versus': {...}, 'ratio': 雙人 / 單人 平均}
+    """
+    import os
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from hdmi_game_engine import HdmiGameEngine
+    from hdmi_scenes import GameScene
+    from headless_simulation import ReactiveBotPolicy
+
+    engine = HdmiGameEngine(*screen_size, render_mode=render_mode, background_style=background_style)
+    rng = random.Random(seed)
+    dt_ms = GameSimulation.STEP_MS
+
+    def measure(make_scene, simulations):
+        scene = make_scene()
+        engine.scene_manager.change(scene)
+        policies = [ReactiveBotPolicy(rng) for _ in simulations(scene)]
+        times = []
+        for _ in range(frames):
+            if scene.ended:
+                scene = make_scene()
+                engine.scene_manager.change(scene)
+            for policy, sim in zip(policies, simulations(scene)):
+                if sim.game_active and policy.decide(sim):
+                    sim.request_jump()
+            start = time.perf_counter()
+            scene.update(dt_ms)
+            scene.draw()
+            times.append((time.perf_counter() - start) * 1000)
+        times.sort()
+        return {'mean_ms': sum(times) / len(times), 'p50_ms': times[len(times) // 2], 'p95_ms': times[int(len(times) * 0.95)]}
+
+    try:
+        single = measure(lambda: GameScene(engine, 10 ** 6), lambda scene: [engine.simulation])
+        versus = measure(lambda: VersusScene(engine, 10 ** 6), lambda scene: [lane.simulation for lane in scene.lanes])
+    finally:
+        engine.scene_manager.current.on_exit()
+        engine.cleanup()
+    return {'single': single, 'versus': versus, 'ratio': versus['mean_ms'] / single['mean_ms']}
+
+
+if __name__ == '__main__':
+    import sys
+    for mode in (sys.argv[1:] or ['dirty', 'full']):
+        report = benchmark_versus(render_mode=mode)
+        print(f"\n'{mode}' 每幀工作時間 (ms): 單人 平均 {report['single']['mean_ms']:.3f} / p95 {report['single']['p95_ms']:.3f}，"
+              f"雙人 平均 {report['versus']['mean_ms']:.3f} / p95 {report['versus']['p95_ms']:.3f}，"
+              f"雙人 / 單人 = {report['ratio']:.2f}x")
+    pygame.quit()
@@ -0,0 +1,272 @@
+# RandomGenerate/SPI_v2/video_capture.py
+"""
+遊戲畫面的背景錄影。
+
+在遊戲迴圈內直接編碼會拖垮幀率，因此 VideoCapture 只在遊戲執行緒做一件事：
+把送出的畫面 (可縮小) 複製到固定數量、重複使用的緩衝 Surface 中，交給背景的編碼執行緒。
+    - 緩衝區用完 (編碼跟不上) 時直接丟棄該幀並計數，遊戲執行緒永遠不等待
+    - 有 ffmpeg 時以管線送入原始像素編碼成 .mp4 (寫入管線時會釋放 GIL)；
+      沒有 ffmpeg 時改存成 PNG 圖片序列 (frame_000001.png ...)，之後可再自行合成。
+      PNG 以 zlib 自行壓縮 (壓縮期間釋放 GIL)；pygame.image.save 編碼時持有 GIL，會讓遊戲執行緒停頓十幾 ms
+    - 依遊戲時間以固定的錄影幀率取樣，重播 (不等待 clock.tick) 錄出的影片速度也正確
+
+每局一個 VideoCapture；stop() 不等待編碼完成，剩餘的幀由編碼執行緒寫完後自行結束。
+"""
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+import time
+import zlib
+
+import pygame
+
+CAPTURE_ENCODER_FFMPEG = 'ffmpeg'
+CAPTURE_ENCODER_IMAGES = 'images'
+
+
+def ffmpeg_available():
+    return shutil.which('ffmpeg') is not None
+
+
+def _ffmpeg_pixel_format(surface):
+    """緩衝 Surface 的記憶體排列對應的 ffmpeg rawvideo 像素格式；無法直接對應時回傳 None (改用 tobytes 轉換)。"""
+    if surface.get_bytesize() != 4 or surface.get_pitch() != surface.get_width() * 4:
+        return None
+    shifts = surface.get_shifts()[:3]
+    if shifts == (16, 8, 0):
+        return 'bgr0' # 小端序 XRGB8888: 記憶體中為 B, G, R, X
+    if shifts == (0, 8, 16):
+        return 'rgb0'
+    return None
+
+
+class _FfmpegEncoder:
+    """把原始像素寫入 ffmpeg 的標準輸入，編碼成 H.264 mp4。"""
+
+    name = CAPTURE_ENCODER_FFMPEG
+
+    def __init__(self, output_base, frame_size, fps, sample_surface):
+        self.path = output_base + '.mp4'
+        self.pixel_format = _ffmpeg_pixel_format(sample_surface)
+        command = ['ffmpeg', '-loglevel', 'error', '-y',
+                   '-f', 'rawvideo', '-pix_fmt', self.pixel_format or 'rgb24',
+                   '-s', f'{frame_size[0]}x{frame_size[1]}', '-framerate', str(fps), '-i', '-',
+                   '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+                   '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', self.path]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+
+    def write(self, surface):
+        if self.pixel_format:
+            self.process.stdin.write(surface.get_buffer()) # 直接寫出像素記憶體，不另外複製
+        else:
+            self.process.stdin.write(pygame.image.tobytes(surface, 'RGB'))
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def write_png(path, surface, compress_level=1):
+    """把 Surface 寫成 RGB PNG (每列濾波 0)。"""
+    width, height = surface.get_size()
+    pixels = pygame.image.tobytes(surface, 'RGB')
+    stride = width * 3
+    rows = b''.join(b'\x00' + pixels[y * stride:(y + 1) * stride] for y in range(height))
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n'
+                + _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+                + _png_chunk(b'IDAT', zlib.compress(rows, compress_level))
+                + _png_chunk(b'IEND', b''))
+
+
+class _ImageSequenceEncoder:
+    """沒有 ffmpeg 時把每幀存成一張 PNG。"""
+
+    name = CAPTURE_ENCODER_IMAGES
+
+    def __init__(self, output_base):
+        self.path = output_base
+        self.index = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def write(self, surface):
+        self.index += 1
+        write_png(os.path.join(self.path, f'frame_{self.index:06d}.png'), surface)
+
+    def close(self):
+        pass
+
+
+class VideoCapture:
+    """一段錄影：固定大小的緩衝池 + 背景編碼執行緒。"""
+
+    def __init__(self, output_base, source_surface, scale=0.5, fps=30, pool_size=4, encoder=None):
+        """
+        參數:
+            output_base (str): 輸出路徑 (不含副檔名)；ffmpeg 產生 output_base.mp4，圖片序列產生 output_base/ 資料夾。
+            source_surface (pygame.Surface): 要錄製的畫面 (決定來源大小與像素格式)。
+            scale (float): 錄影解析度相對於來源的倍率 (0~1)。
+            fps (int): 錄影幀率；依遊戲時間取樣，與繪圖幀率無關。
+            pool_size (int): 可重複使用的緩衝 Surface 數量，也就是最多能累積多少幀等待編碼。
+            encoder (str, optional): 'ffmpeg' 或 'images'；None 表示有 ffmpeg 時用 ffmpeg。
+        """
+        width, height = source_surface.get_size()
+        self.frame_size = (max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2))
+        self.fps = fps
+        self.frame_interval_ms = 1000.0 / fps
+        # 緩衝與來源同像素格式，複製時不需要轉換
+        self._free = queue.Queue()
+        for _ in range(pool_size):
+            self._free.put(pygame.Surface(self.frame_size, 0, source_surface))
+        self._ready = queue.Queue()
+        if encoder is None:
+            encoder = CAPTURE_ENCODER_FFMPEG if ffmpeg_available() else CAPTURE_ENCODER_IMAGES
+        sample = self._free.queue[0]
+        if encoder == CAPTURE_ENCODER_FFMPEG:
+            self.encoder = _FfmpegEncoder(output_base, self.frame_size, fps, sample)
+        else:
+            self.encoder = _ImageSequenceEncoder(output_base)
+        self.path = self.encoder.path
+        self.keep = True
+        self.stopped = False
+        self.error = None
+        self._time_until_next_ms = 0.0
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.frames_encoded = 0
+        self.copy_time_sec = 0.0
+        self.max_copy_ms = 0.0
+        self._thread = threading.Thread(target=self._run, name='VideoCaptureEncoder', daemon=True)
+        self._thread.start()
+
+    def offer(self, surface, dt_ms):
+        """
+        遊戲執行緒每幀呼叫 (dt_ms 為本幀經過的遊戲時間)：到了錄影幀的時間就複製一幀交給編碼執行緒。
+        回傳 True 表示本幀被錄下。
+        """
+        if self.stopped:
+            return False
+        self._time_until_next_ms -= dt_ms
+        if self._time_until_next_ms > 0:
+            return False
+        # 落後超過一幀時不補錄，從現在重新起算
+        self._time_until_next_ms = max(0.0, self._time_until_next_ms + self.frame_interval_ms)
+        start = time.perf_counter()
+        try:
+            buffer = self._free.get_nowait()
+        except queue.Empty:
+            self.frames_dropped += 1 # 編碼跟不上：丟棄，不等待
+            return False
+        if buffer.get_size() == surface.get_size():
+            buffer.blit(surface, (0, 0))
+        else:
+            pygame.transform.scale(surface, self.frame_size, buffer) # 最近鄰縮小，直接寫入緩衝
+        self._ready.put(buffer)
+        self.frames_captured += 1
+        elapsed = time.perf_counter() - start
+        self.copy_time_sec += elapsed
+        if elapsed * 1000 > self.max_copy_ms:
+            self.max_copy_ms = elapsed * 1000
+        return True
+
+    def _run(self):
+        while True:
+            buffer = self._ready.get()
+            if buffer is None:
+                break
+            if self.error is None:
+                try:
+                    self.encoder.write(buffer)
+                    self.frames_encoded += 1
+                except (OSError, ValueError, pygame.error) as e:
+                    self.error = e # 例如 ffmpeg 意外結束；之後的幀直接回收
+                    print(f"VideoCapture 警告: 編碼失敗 ({e})，停止寫入 {self.path}。")
+            self._free.put(buffer)
+        try:
+            self.encoder.close()
+        except (OSError, ValueError) as e:
+            self.error = self.error or e
+        if not self.keep:
+            if os.path.isdir(self.path):
+                shutil.rmtree(self.path, ignore_errors=True)
+            elif os.path.exists(self.path):
+                os.remove(self.path)
+
+    def stop(self, keep=True):
+        """結束錄影；keep 為 False 時編碼完成後刪除輸出。不等待編碼執行緒。"""
+        if self.stopped:
+            return
+        self.stopped = True
+        self.keep = keep
+        self._ready.put(None)
+
+    def wait(self, timeout=None):
+        """等待編碼執行緒寫完所有幀 (程式結束或測試時使用)。"""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def get_stats(self):
+        return {
+            'path': self.path,
+            'encoder': self.encoder.name,
+            'frame_size': self.frame_size,
+            'captured': self.frames_captured,
+            'dropped': self.frames_dropped,
+            'encoded': self.frames_encoded,
+            'avg_copy_ms': self.copy_time_sec / self.frames_captured * 1000 if self.frames_captured else 0.0,
+            'max_copy_ms': self.max_copy_ms
+        }
+
+
+def run_capture_benchmark(duration_sec=5.0, screen_size=(800, 600), render_mode='dirty', scale=0.5, fps=30,
+                          output_dir='captures_benchmark'):
+    """
+    以 SDL dummy 驅動跑一段有錄影的遊戲 (機器人自動跳躍)，回傳錄影統計與遊戲幀時間。
+    """
+    import random
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from hdmi_game_engine import HdmiGameEngine
+    from hdmi_scenes import GameScene
+    from headless_simulation import ReactiveBotPolicy
+
+    engine = HdmiGameEngine(*screen_size, render_mode=render_mode, background_style='parallax', profiler_enabled=True,
+                            capture_dir=output_dir, capture_scale=scale, capture_fps=fps)
+    policy = ReactiveBotPolicy(random.Random(1))
+    captures = []
+    try:
+        engine.scene_manager.change(GameScene(engine, 10 ** 6))
+        end_time = time.perf_counter() + duration_sec
+        while time.perf_counter() < end_time:
+            if engine.video_capture and engine.video_capture not in captures:
+                captures.append(engine.video_capture)
+            if not engine.game_active:
+                engine.scene_manager.change(GameScene(engine, 10 ** 6))
+            elif policy.decide(engine.simulation):
+                engine.request_player_jump('bot')
+            engine.tick()
+        profile = engine.profiler.summary('game').get('game', {})
+    finally:
+        engine.cleanup()
+    for capture in captures:
+        capture.wait()
+    stats = [capture.get_stats() for capture in captures]
+    return {'captures': stats, 'frame_ms': profile.get('frame_ms'),
+            'captured': sum(s['captured'] for s in stats), 'dropped': sum(s['dropped'] for s in stats),
+            'avg_copy_ms': max((s['avg_copy_ms'] for s in stats), default=0.0),
+            'max_copy_ms': max((s['max_copy_ms'] for s in stats), default=0.0)}
+
+
+if __name__ == '__main__':
+    report = run_capture_benchmark()
+    print(f"\n錄影: {report['captured']} 幀，丟棄 {report['dropped']} 幀，遊戲執行緒複製每幀平均 "
+          f"{report['avg_copy_ms']:.3f} ms / 最大 {report['max_copy_ms']:.3f} ms；遊戲幀時間 {report['frame_ms']}")
+    for capture_stats in report['captures']:
+        print(f"  {capture_stats['path']} ({capture_stats['encoder']}, {capture_stats['frame_size'][0]}x{capture_stats['frame_size'][1]})")
+    pygame.quit()
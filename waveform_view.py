@@ -0,0 +1,363 @@
+# RandomGenerate/SPI_v2/waveform_view.py
+"""
+測量情緒時的即時波形 (示波器) 畫面。
+
+測量在背景執行緒進行，SensorHandler 把每筆取樣 push 到 WaveformBuffer
+(每個通道一個預先配置的 NumPy 環形緩衝區，寫入端只做兩次陣列指定，不配置記憶體)。
+WaveformScene 每幀取出最近 window_sec 秒的取樣並繪製:
+    - 取樣 → 像素的抽取 (decimation) 全部是陣列運算：依時間算出像素欄，
+      以 reduceat 取得每欄的最高 / 最低點，沒有取樣的欄線性內插，再延伸到相鄰欄讓波形連續
+    - 每個通道的波形以一個布林遮罩經 pygame.surfarray 直接寫入像素，不逐點呼叫 draw
+    - 峰值標記、目前為止的最高電壓與換算後的情緒指數 (GlyphAtlas 組合數字，不每幀 font.render)
+因此每幀成本只與畫面寬度有關，與 ADC 取樣率無關 (四個通道 x 860 SPS 與更高取樣率的成本相同)。
+"""
+import threading
+import time
+
+import numpy as np
+import pygame
+
+from hdmi_scenes import MeasuringScene
+from text_cache import GlyphAtlas
+
+CHANNEL_COLORS = ((220, 60, 60), (40, 120, 220), (30, 160, 80), (230, 140, 20))
+PEAK_LABEL = "峰值 mV "
+EMOTION_LABEL = "情緒指數: "
+
+
+class WaveformBuffer:
+    """各通道最近取樣的環形緩衝區。單一寫入執行緒 (測量) 與單一讀取執行緒 (繪圖)，不需要鎖。"""
+
+    def __init__(self, channel_names, capacity=8192):
+        """
+        參數:
+            channel_names (list[str]): 通道名稱，順序對應 push 的通道索引 (與 SensorHandler.adc_channels 相同)。
+            capacity (int): 每個通道保留的取樣數，需大於一個顯示窗口內的取樣數。
+        """
+        self.channel_names = list(channel_names)
+        self.capacity = capacity
+        channels = len(self.channel_names)
+        self.times = np.zeros((channels, capacity), dtype=np.float64)
+        self.values = np.zeros((channels, capacity), dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        """開始新的測量：清除取樣與峰值。"""
+        channels = len(self.channel_names)
+        self._positions = [0] * channels
+        self.counts = [0] * channels
+        self.peaks = [0.0] * channels # 本次測量各通道的最高電壓
+
+    def push(self, channel, timestamp, voltage):
+        """寫入一筆取樣 (timestamp 為 time.perf_counter())。"""
+        position = self._positions[channel]
+        self.times[channel, position] = timestamp
+        self.values[channel, position] = voltage
+        self._positions[channel] = position + 1 if position + 1 < self.capacity else 0
+        self.counts[channel] += 1 # 最後才更新計數，讀取端不會讀到尚未寫完的取樣
+        if voltage > self.peaks[channel]:
+            self.peaks[channel] = voltage
+
+    def window(self, channel, start_time):
+        """回傳 start_time 之後的 (時間, 電壓) 陣列 (依時間排序)。"""
+        count = self.counts[channel]
+        if not count:
+            return self.times[channel, :0], self.values[channel, :0]
+        position = self._positions[channel]
+        if count < self.capacity:
+            times = self.times[channel, :position]
+            values = self.values[channel, :position]
+        else:
+            times = np.concatenate((self.times[channel, position:], self.times[channel, :position]))
+            values = np.concatenate((self.values[channel, position:], self.values[channel, :position]))
+        first = int(np.searchsorted(times, start_time))
+        return times[first:], values[first:]
+
+    def total_samples(self):
+        return sum(self.counts)
+
+
+def decimate_envelope(timestamps, voltages, start_time, window_sec, width, height, full_scale):
+    """
+    把取樣抽取成每個像素欄的垂直範圍。
+    回傳:
+        (first_column, top, bottom) 或 None (沒有取樣)：top / bottom 為從 first_column 起連續各欄的像素列 (含)，
+        已包含與前一欄相連所需的延伸；y 向下，full_scale 電壓在第 0 列。
+    """
+    if timestamps.size == 0:
+        return None
+    columns = ((timestamps - start_time) * (width / window_sec)).astype(np.int32)
+    np.clip(columns, 0, width - 1, out=columns)
+    rows = ((1.0 - np.clip(voltages / full_scale, 0.0, 1.0)) * (height - 1)).astype(np.int32)
+    starts = np.flatnonzero(np.diff(columns, prepend=-1)) # 時間已排序，同一欄的取樣相鄰
+    occupied = columns[starts]
+    top = np.minimum.reduceat(rows, starts)
+    bottom = np.maximum.reduceat(rows, starts)
+    first_column = int(occupied[0])
+    span = int(occupied[-1]) - first_column + 1
+    if span != occupied.size:
+        # 取樣比像素欄稀疏：沒有取樣的欄以相鄰取樣的中點線性內插
+        middle = np.interp(np.arange(first_column, first_column + span), occupied, (top + bottom) * 0.5).astype(np.int32)
+        full_top, full_bottom = middle, middle.copy()
+        full_top[occupied - first_column] = top
+        full_bottom[occupied - first_column] = bottom
+        top, bottom = full_top, full_bottom
+    # 與前一欄的範圍相接，陡峭的上升緣也畫成連續的線
+    connected_top = top.copy()
+    connected_bottom = bottom.copy()
+    np.minimum(top[1:], bottom[:-1], out=connected_top[1:])
+    np.maximum(bottom[1:], top[:-1], out=connected_bottom[1:])
+    return first_column, connected_top, connected_bottom
+
+
+class WaveformScene(MeasuringScene):
+    """測量情緒畫面的示波器版本：每個通道一條捲動波形、峰值標記與即時情緒指數。"""
+
+    GRID_COLOR = (225, 225, 232)
+    STRIP_COLOR = (248, 248, 252)
+    RUNNING_PEAK_COLOR = (150, 150, 160)
+    GRID_INTERVAL_SEC = 0.5
+
+    def __init__(self, engine, duration, buffer, window_sec=3.0, full_scale=3.0, emotion_calculator=None):
+        """
+        參數:
+            buffer (WaveformBuffer): 測量執行緒寫入的取樣。
+            window_sec (float): 顯示最近幾秒的波形。
+            full_scale (float): 波形上緣對應的電壓。
+            emotion_calculator (EmotionCalculator, optional): 提供時以目前最高電壓換算並顯示情緒指數。
+        """
+        super().__init__(engine, duration)
+        self.buffer = buffer
+        self.window_sec = window_sec
+        self.full_scale = full_scale
+        self.emotion_calculator = emotion_calculator
+
+    def on_enter(self):
+        super().on_enter()
+        engine = self.engine
+        width, height = engine.screen.get_size()
+        channels = max(1, len(self.buffer.channel_names))
+        self.header_rect = pygame.Rect(0, 0, width, int(height * 0.18))
+        self.plot_rect = pygame.Rect(int(width * 0.08), int(height * 0.2), int(width * 0.89), int(height * 0.76))
+        gap = max(4, height // 100)
+        self.strip_height = (self.plot_rect.height - gap * (channels - 1)) // channels
+        self.strip_tops = [index * (self.strip_height + gap) for index in range(channels)] # 相對於 plot_rect
+        # 波形畫在 32 位元的繪圖面上 (surfarray.pixels2d 需要)，每幀一次貼到畫面
+        self.plot_surface = pygame.Surface(self.plot_rect.size, 0, 32)
+        self.plot_background = self._build_plot_background()
+        self.channel_colors = [self.plot_surface.map_rgb(CHANNEL_COLORS[index % len(CHANNEL_COLORS)]) for index in range(channels)]
+        self.peak_atlas = GlyphAtlas(engine.font_small, (60, 60, 60), labels=(PEAK_LABEL,))
+        self.emotion_atlas = GlyphAtlas(engine.font_large, engine.BLACK, labels=(EMOTION_LABEL,))
+        self._rows = np.arange(self.strip_height, dtype=np.int32)
+        self.static_drawn = False
+
+    def _build_plot_background(self):
+        """預先繪製各通道的底色、時間格線與半量程線 (每幀只需一次 blit 還原)。"""
+        background = pygame.Surface(self.plot_rect.size, 0, 32)
+        background.fill(self.engine.WHITE)
+        width = self.plot_rect.width
+        for top in self.strip_tops:
+            strip = pygame.Rect(0, top, width, self.strip_height)
+            background.fill(self.STRIP_COLOR, strip)
+            grid_count = int(self.window_sec / self.GRID_INTERVAL_SEC)
+            for index in range(1, grid_count):
+                x = int(width * index * self.GRID_INTERVAL_SEC / self.window_sec)
+                background.fill(self.GRID_COLOR, (x, top, 1, self.strip_height))
+            background.fill(self.GRID_COLOR, (0, top + self.strip_height // 2, width, 1))
+        return background
+
+    def invalidate(self):
+        self.static_drawn = False
+
+    def draw(self):
+        engine = self.engine
+        profiler = engine.profiler
+        full = not self.static_drawn # 動畫點只在標題區更新，不需要整張重畫
+        if full:
+            engine.screen.fill(engine.WHITE)
+            self._draw_channel_labels()
+        else:
+            engine.screen.fill(engine.WHITE, self.header_rect)
+        profiler.mark('background')
+        now = time.perf_counter()
+        self._draw_waveforms(now)
+        profiler.mark('sprites')
+        self._draw_header()
+        profiler.mark('hud')
+        overlay_rect = profiler.draw_overlay(engine.screen, engine.profiler_font, scene=self.name)
+        if full or engine.gpu_presenter:
+            engine.present_screen()
+        else:
+            rects = [self.header_rect, self.plot_rect]
+            if overlay_rect:
+                rects.append(overlay_rect)
+            engine.display.update(rects)
+        profiler.mark('present')
+        self.static_drawn = True
+
+    def _draw_channel_labels(self):
+        engine = self.engine
+        for index, name in enumerate(self.buffer.channel_names):
+            label = engine.text_cache.render(engine.font_small, name, CHANNEL_COLORS[index % len(CHANNEL_COLORS)])
+            y = self.plot_rect.top + self.strip_tops[index] + self.strip_height // 2 - label.get_height() // 2
+            engine.screen.blit(label, (self.plot_rect.left // 2 - label.get_width() // 2, y))
+
+    def _draw_waveforms(self, now):
+        surface = self.plot_surface
+        surface.blit(self.plot_background, (0, 0))
+        width = self.plot_rect.width
+        height = self.strip_height
+        start_time = now - self.window_sec
+        markers = []
+        pixels = pygame.surfarray.pixels2d(surface)
+        try:
+            for index in range(len(self.buffer.channel_names)):
+                timestamps, voltages = self.buffer.window(index, start_time)
+                envelope = decimate_envelope(timestamps, voltages, start_time, self.window_sec, width, height, self.full_scale)
+                if envelope is None:
+                    continue
+                first_column, top, bottom = envelope
+                mask = (self._rows >= top[:, None]) & (self._rows <= bottom[:, None]) # (欄, 列)
+                strip_top = self.strip_tops[index]
+                pixels[first_column:first_column + top.size, strip_top:strip_top + height][mask] = self.channel_colors[index]
+                peak_index = int(np.argmax(voltages))
+                markers.append((index, timestamps[peak_index], float(voltages[peak_index])))
+        finally:
+            del pixels # 釋放 Surface 的鎖定
+        for index, peak_time, peak_voltage in markers:
+            self._draw_peak_marker(surface, index, peak_time - start_time, peak_voltage)
+        self.engine.screen.blit(surface, self.plot_rect)
+
+    def _voltage_to_row(self, voltage):
+        return int((1.0 - min(1.0, max(0.0, voltage / self.full_scale))) * (self.strip_height - 1))
+
+    def _draw_peak_marker(self, surface, index, peak_offset_sec, peak_voltage):
+        """窗口內峰值的三角標記與數值 (mV)，以及本次測量目前為止最高電壓的水平線。"""
+        strip_top = self.strip_tops[index]
+        width = self.plot_rect.width
+        running_peak = self.buffer.peaks[index]
+        surface.fill(self.RUNNING_PEAK_COLOR, (0, strip_top + self._voltage_to_row(running_peak), width, 1))
+        x = int(peak_offset_sec * width / self.window_sec)
+        y = strip_top + self._voltage_to_row(peak_voltage)
+        size = max(4, self.strip_height // 16)
+        color = CHANNEL_COLORS[index % len(CHANNEL_COLORS)]
+        pygame.draw.polygon(surface, color, ((x - size, y - size * 2), (x + size, y - size * 2), (x, y - 1)))
+        blits = self.peak_atlas.layout(PEAK_LABEL, round(peak_voltage * 1000), (0, 0))
+        label_width = blits[-1][1][0] + blits[-1][0].get_width()
+        label_x = width - label_width - 6
+        surface.blits([(glyph, (label_x + gx, strip_top + 4 + gy)) for glyph, (gx, gy) in blits], doreturn=False)
+
+    def _draw_header(self):
+        engine = self.engine
+        title = engine.text_cache.render(engine.font_medium, "正在偵測您的負面情緒" + "." * self.animation_dots, engine.BLACK)
+        hint = engine.text_cache.render(engine.font_small, f"請在 {self.duration} 秒內盡情釋放！", (50, 50, 50))
+        width, height = engine.screen.get_size()
+        y = int(height * 0.03)
+        engine.screen.blit(title, (int(width * 0.04), y))
+        engine.screen.blit(hint, (int(width * 0.04), y + title.get_height() + 4))
+        if self.emotion_calculator is not None:
+            emotion = self.emotion_calculator.calculate_negative_emotion_index(max(self.buffer.peaks, default=0.0))
+            blits = self.emotion_atlas.layout(EMOTION_LABEL, emotion, (0, 0))
+            label_width = blits[-1][1][0] + blits[-1][0].get_width()
+            x = width - label_width - int(width * 0.04)
+            engine.screen.blits([(glyph, (x + gx, y + gy)) for glyph, (gx, gy) in blits], doreturn=False)
+
+
+class _SyntheticStrikes:
+    """基準測試用：以固定取樣率在背景執行緒寫入含拍擊衰減振盪的合成波形。"""
+
+    def __init__(self, buffer, sample_rate, seed=1):
+        self.buffer = buffer
+        self.sample_rate = sample_rate
+        self.rng = np.random.default_rng(seed)
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        channels = len(self.buffer.channel_names)
+        start = time.perf_counter()
+        strike_times = np.zeros(channels)
+        strike_amplitudes = np.zeros(channels)
+        while not self._stop.wait(0.002):
+            now = time.perf_counter()
+            due = int((now - start) * self.sample_rate)
+            for sample in range(self.samples, due): # 補上這段時間應有的取樣 (與真實 ADC 相同的每筆 push)
+                t = start + sample / self.sample_rate
+                for channel in range(channels):
+                    if self.rng.random() < 1.5 / self.sample_rate: # 平均每通道每秒 1.5 次拍擊
+                        strike_times[channel] = t
+                        strike_amplitudes[channel] = self.rng.uniform(0.3, 2.8)
+                    age = t - strike_times[channel]
+                    voltage = abs(strike_amplitudes[channel] * np.exp(-age * 12.0) * np.sin(age * 90.0)) + self.rng.random() * 0.02
+                    self.buffer.push(channel, t, float(voltage))
+            self.samples = max(self.samples, due)
+
+
+def benchmark_waveform(frames=600, screen_size=(800, 600), channels=4, sample_rate=860, window_sec=3.0, render_mode='dirty'):
+    """
+    以 SDL dummy 驅動量測 WaveformScene 每幀的繪製時間 (ms)；合成取樣以 sample_rate (每通道 SPS) 在背景寫入。
+    另量測逐點 pygame.draw.lines (不抽取) 畫同樣窗口所需的時間作為比較。
+    回傳:
+        dict: {'mean_ms', 'p95_ms', 'max_ms', 'lines_mean_ms', 'samples_per_frame', 'window_samples'}
+    """
+    import os
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from hdmi_game_engine import HdmiGameEngine
+
+    engine = HdmiGameEngine(*screen_size, render_mode=render_mode)
+    buffer = WaveformBuffer([f'A{index}' for index in range(channels)], capacity=max(8192, int(sample_rate * window_sec * 2)))
+    feeder = _SyntheticStrikes(buffer, sample_rate)
+    times = []
+    lines_times = []
+    try:
+        scene = WaveformScene(engine, 3, buffer, window_sec=window_sec)
+        engine.scene_manager.change(scene)
+        feeder.start()
+        time.sleep(window_sec) # 先填滿一個窗口
+        frame_sec = 1.0 / 60
+        for _ in range(frames):
+            frame_start = time.perf_counter()
+            scene.update(frame_sec * 1000)
+            scene.draw()
+            times.append((time.perf_counter() - frame_start) * 1000)
+            remaining = frame_sec - (time.perf_counter() - frame_start)
+            if remaining > 0:
+                time.sleep(remaining)
+        samples_before = feeder.samples
+        now = time.perf_counter()
+        width, height = scene.plot_rect.width, scene.strip_height
+        window_samples = 0
+        for _ in range(30):
+            lines_start = time.perf_counter()
+            scene.plot_surface.blit(scene.plot_background, (0, 0))
+            for index in range(channels):
+                timestamps, voltages = buffer.window(index, now - window_sec)
+                window_samples = timestamps.size
+                xs = (timestamps - (now - window_sec)) * (width / window_sec)
+                ys = scene.strip_tops[index] + (1.0 - np.clip(voltages / scene.full_scale, 0.0, 1.0)) * (height - 1)
+                if timestamps.size > 1:
+                    pygame.draw.lines(scene.plot_surface, CHANNEL_COLORS[index], False, np.column_stack((xs, ys)).tolist())
+            lines_times.append((time.perf_counter() - lines_start) * 1000)
+    finally:
+        feeder.stop()
+        engine.cleanup()
+    times.sort()
+    return {'mean_ms': sum(times) / len(times), 'p95_ms': times[int(len(times) * 0.95)], 'max_ms': times[-1],
+            'lines_mean_ms': sum(lines_times) / len(lines_times),
+            'samples_per_frame': samples_before * channels / (frames + window_sec * 60), 'window_samples': window_samples}
+
+
+if __name__ == '__main__':
+    for rate in (860, 3300):
+        report = benchmark_waveform(sample_rate=rate)
+        print(f"\n4 通道 x {rate} SPS (每通道窗口 {report['window_samples']} 筆): 每幀繪製 平均 {report['mean_ms']:.2f} / "
+              f"p95 {report['p95_ms']:.2f} / 最大 {report['max_ms']:.2f} ms；逐點 draw.lines 平均 {report['lines_mean_ms']:.2f} ms")
+    pygame.quit()